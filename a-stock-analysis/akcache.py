@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""
+AKShare 请求级缓存
+给 akshare 模块上的数据接口套一层记忆化：键 = (接口名, 参数, 交易日)。
+同一进程内 morning / night 等多个阶段重复请求同一份行情时直接复用，并统计命中与节省的时间；
+save / load 把响应落到当天的检查点目录，失败重跑时不必再请求一遍
+"""
+
+import copy
+import functools
+import inspect
+import os
+import pickle
+import threading
+import time
+from datetime import date, timedelta
+
+try:
+    import akshare
+    AKSHARE_AVAILABLE = True
+except ImportError:
+    akshare = None
+    AKSHARE_AVAILABLE = False
+
+
+_local = threading.local()
+# 等待同键进行中请求的上限（秒），超过后自行请求
+PENDING_WAIT = 60.0
+
+
+def current_call() -> str:
+    """当前线程正在执行的 akshare 接口名（未在缓存包装内时为空），用于按数据源统计流量"""
+    return getattr(_local, "name", "")
+
+
+def trading_date(today: date = None) -> str:
+    """当前所属交易日（周末回退到周五；节假日不做处理）"""
+    today = today or date.today()
+    while today.weekday() >= 5:
+        today -= timedelta(days=1)
+    return today.isoformat()
+
+
+def _copy(value):
+    """返回副本，避免某个阶段原地修改 DataFrame 污染缓存"""
+    if hasattr(value, "copy"):
+        try:
+            return value.copy()
+        except TypeError:
+            pass
+    try:
+        return copy.deepcopy(value)
+    except Exception:
+        return value
+
+
+class AkCache:
+    """进程内共享的 AKShare 响应缓存"""
+
+    def __init__(self, day: str = None):
+        self.day = day or trading_date()
+        self.entries = {}
+        self.pending = {}
+        self.lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "errors": 0, "saved": 0.0, "fetch_time": 0.0}
+        self.per_func = {}
+        self.installed = {}
+
+    def key(self, name: str, args: tuple, kwargs: dict):
+        try:
+            return name, repr(args), repr(sorted(kwargs.items())), self.day
+        except Exception:
+            return None
+
+    def _claim(self, key):
+        """返回 (命中值, 需要等待的事件)；两者都为 None 时本线程负责发起请求"""
+        while True:
+            with self.lock:
+                hit = self.entries.get(key)
+                if hit is not None:
+                    return hit, None
+                event = self.pending.get(key)
+                if event is None:
+                    self.pending[key] = threading.Event()
+                    return None, None
+            # 同一个键只请求一次：并发的重复请求等待进行中的那次完成；
+            # 等待有上限，发起者被调用方放弃（如 fetch 超时）时不会把其他人一直挂住
+            if not event.wait(PENDING_WAIT):
+                return None, event
+
+    def call(self, name: str, func, args: tuple, kwargs: dict):
+        key = self.key(name, args, kwargs)
+        if key is None:
+            return func(*args, **kwargs)
+        hit, stale = self._claim(key)
+        with self.lock:
+            counter = self.per_func.setdefault(name, {"hits": 0, "misses": 0, "seconds": 0.0})
+        if hit is not None:
+            value, elapsed = hit
+            with self.lock:
+                self.stats["hits"] += 1
+                self.stats["saved"] += elapsed
+                counter["hits"] += 1
+            return _copy(value)
+        # 不持有任何锁执行请求，调用方放弃等待时也不会留下被占住的锁
+        start = time.perf_counter()
+        outer, _local.name = current_call(), name
+        try:
+            value = func(*args, **kwargs)
+        except Exception:
+            with self.lock:
+                self.stats["errors"] += 1
+            raise
+        finally:
+            _local.name = outer
+            if stale is None:
+                with self.lock:
+                    self.pending.pop(key).set()
+        elapsed = time.perf_counter() - start
+        with self.lock:
+            self.entries[key] = (value, elapsed)
+            self.stats["misses"] += 1
+            self.stats["fetch_time"] += elapsed
+            counter["misses"] += 1
+            counter["seconds"] += elapsed
+        return _copy(value)
+
+    def save(self, path: str) -> int:
+        """把已缓存的响应写到磁盘（无法 pickle 的跳过），返回写入条数"""
+        with self.lock:
+            entries = dict(self.entries)
+        saved = {}
+        for key, entry in entries.items():
+            try:
+                pickle.dumps(entry, protocol=pickle.HIGHEST_PROTOCOL)
+            except Exception:
+                continue
+            saved[key] = entry
+        with open(f"{path}.tmp", "wb") as f:
+            pickle.dump(saved, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(f"{path}.tmp", path)
+        return len(saved)
+
+    def load(self, path: str) -> int:
+        """载入 save 写下的同一交易日响应，返回载入条数；文件缺失或损坏时返回 0"""
+        try:
+            with open(path, "rb") as f:
+                saved = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return 0
+        with self.lock:
+            for key, entry in saved.items():
+                if key[-1] == self.day:
+                    self.entries.setdefault(key, entry)
+        return len(saved)
+
+    def wrap(self, name: str, func):
+        @functools.wraps(func)
+        def cached(*args, **kwargs):
+            return self.call(name, func, args, kwargs)
+
+        cached.__akcache_original__ = func
+        return cached
+
+    def install(self, module=None) -> int:
+        """替换模块上所有公开函数，返回替换数量；需在导入 pipeline 之前调用"""
+        module = module or akshare
+        if module is None:
+            return 0
+        for name, func in list(vars(module).items()):
+            if name.startswith("_") or not inspect.isfunction(func) or hasattr(func, "__akcache_original__"):
+                continue
+            setattr(module, name, self.wrap(name, func))
+            self.installed[name] = (module, func)
+        return len(self.installed)
+
+    def uninstall(self) -> None:
+        for name, (module, func) in self.installed.items():
+            setattr(module, name, func)
+        self.installed.clear()
+
+    def summary(self) -> str:
+        s = self.stats
+        calls = s["hits"] + s["misses"]
+        lines = [f"akcache: {calls} 次请求，命中 {s['hits']}，实际请求 {s['misses']}"
+                 f"（耗时 {s['fetch_time']:.1f}s），节省约 {s['saved']:.1f}s"]
+        shared = sorted(((n, c) for n, c in self.per_func.items() if c["hits"]),
+                        key=lambda x: -x[1]["seconds"])
+        for name, c in shared[:10]:
+            lines.append(f"  {name}: 命中 {c['hits']} / 请求 {c['misses']}，单次 {c['seconds'] / c['misses']:.2f}s"
+                         if c["misses"] else f"  {name}: 命中 {c['hits']}")
+        return "\n".join(lines)
+
+
+_cache = None
+
+
+def get_cache() -> AkCache:
+    """进程级单例（跨交易日时自动换新）"""
+    global _cache
+    if _cache is None or _cache.day != trading_date():
+        if _cache is not None:
+            _cache.uninstall()
+        _cache = AkCache()
+    return _cache
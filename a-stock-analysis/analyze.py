@@ -1,24 +1,136 @@
 #!/usr/bin/env python3
-"""A股统一入口：morning / night。"""
+"""A股统一入口：morning / night / report / intraday。
+
+默认在当前进程内执行 pipeline（只导入一次 pandas/AKShare，各阶段共享 AKShare 请求缓存），
+--isolated 时退回为每个阶段一个子进程。
+"""
 
 import argparse
 import os
+import runpy
 import subprocess
 import sys
+import time
+import traceback
 from datetime import datetime
 
+import akcache
+import fetch
+import intraday
+import profiling
+import stages
+
+try:
+    import market_store
+    STORE_AVAILABLE = True
+except ImportError:
+    market_store = None
+    STORE_AVAILABLE = False
+
 WORKSPACE = os.path.expanduser("~/.openclaw/workspace")
 PIPELINE = os.path.join(WORKSPACE, "ashare_ai", "pipeline.py")
 
+ISOLATED = False
+FORCED = set()
+
 
 def run_command(command: list) -> int:
     process = subprocess.run(command, cwd=WORKSPACE)
     return process.returncode
 
 
+def run_inprocess(stage: str) -> int:
+    """以 __main__ 身份在当前进程执行 pipeline.py <stage>，返回退出码"""
+    cache = akcache.get_cache()
+    cache.install()
+    saved_argv, saved_cwd, saved_path = sys.argv[:], os.getcwd(), sys.path[:]
+    sys.argv = [PIPELINE, stage]
+    sys.path.insert(0, os.path.dirname(PIPELINE))
+    try:
+        os.chdir(WORKSPACE)
+        runpy.run_path(PIPELINE, run_name="__main__")
+        return 0
+    except SystemExit as e:
+        if e.code is None:
+            return 0
+        if isinstance(e.code, int):
+            return e.code
+        print(e.code, file=sys.stderr)
+        return 1
+    except Exception:
+        traceback.print_exc()
+        return 1
+    finally:
+        sys.argv, sys.path[:] = saved_argv, saved_path
+        os.chdir(saved_cwd)
+
+
+def run_stage(stage: str) -> int:
+    if ISOLATED:
+        return run_command([sys.executable, PIPELINE, stage])
+    return run_inprocess(stage)
+
+
+def run_fetch() -> None:
+    """并发预取各数据源写入 akcache；失败的源由 pipeline 自己再请求"""
+    with profiling.stage("fetch"):
+        print(fetch.format_report(fetch.fetch_all()))
+
+
+def update_store() -> None:
+    """把最新交易日追加到本地列式行情库；失败不影响后续分析"""
+    if not STORE_AVAILABLE:
+        print("Warning: numpy 不可用，跳过行情库更新", file=sys.stderr)
+        return
+    if not ISOLATED:
+        akcache.get_cache().install()  # 与 pipeline 共享同一份快照请求
+    try:
+        with profiling.stage("store"):
+            print(f"行情库: {market_store.update()}")
+    except Exception as e:
+        print(f"Warning: 行情库更新失败: {e}", file=sys.stderr)
+
+
+def cache_path() -> str:
+    """当天当前时段的 akcache 落盘文件；盘中与 fetch 检查点一样按 15 分钟分段，不复用旧快照"""
+    return stages.Checkpoints().artifact(f"akcache-{stages.fetch_key()}", "pkl")
+
+
+def restore_cache() -> None:
+    """载入上次运行已拿到的响应：night 失败重跑时，预取和 morning 请求过的数据直接命中"""
+    loaded = akcache.get_cache().load(cache_path())
+    if loaded:
+        print(f"akcache: 载入检查点中的 {loaded} 条响应")
+
+
+def persist_cache() -> None:
+    try:
+        akcache.get_cache().save(cache_path())
+    except OSError as e:
+        print(f"Warning: akcache 落盘失败: {e}", file=sys.stderr)
+
+
+def run_checkpointed(stage: str) -> int:
+    """当天已成功且 pipeline.py 未变时跳过；--from-stage 指定的阶段及之后强制重跑"""
+    ckpt = stages.Checkpoints()
+    input_hash = stages.digest(stage, stages.file_digest(PIPELINE))
+    if stage not in FORCED and ckpt.load(stage, input_hash):
+        print(f"{stage} 今日已完成（{ckpt.meta(stage)['finished']}），跳过")
+        return 0
+    start = time.perf_counter()
+    with profiling.stage(stage) as record:
+        code = run_stage(stage)
+        record["exit_code"] = code
+    if not ISOLATED:
+        persist_cache()  # 失败时也保存，重跑只需补请求没拿到的数据
+    if code == 0:
+        ckpt.mark(stage, input_hash, time.perf_counter() - start)
+    return code
+
+
 def run_morning() -> int:
     print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] 调用盘前推演流程")
-    code = run_command([sys.executable, PIPELINE, "morning"])
+    code = run_checkpointed("morning")
     if code != 0:
         print("morning 推演失败")
         return code
@@ -28,7 +140,7 @@ def run_morning() -> int:
 
 def run_night() -> int:
     print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] 调用盘后复盘流程")
-    code = run_command([sys.executable, PIPELINE, "night"])
+    code = run_checkpointed("night")
     if code != 0:
         print("night 复盘失败")
         return code
@@ -36,20 +148,85 @@ def run_night() -> int:
     return 0
 
 
+def run_report(from_stage: str = None) -> int:
+    print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] 运行分阶段流水线")
+    ok, result = stages.run(from_stage)
+    if not ok:
+        print(f"report 失败: {result}")
+        return 1
+    print(f"report 完成: {result}")
+    return 0
+
+
+def run_intraday() -> int:
+    if not akcache.AKSHARE_AVAILABLE:
+        print("Error: akshare 未安装")
+        return 1
+    print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] 盘中增量排名（每 {intraday.INTERVAL}s）")
+    with profiling.stage("intraday"):
+        result = intraday.run(intraday.live_snapshots(intraday.INTERVAL))
+    print(f"intraday 结束: {result['ticks']} 轮，推送 {result['pushed']} 条")
+    return 0
+
+
 def main() -> int:
     parser = argparse.ArgumentParser(description="A股分析统一入口")
-    parser.add_argument("mode", choices=["morning", "night", "full"], nargs="?", default="full")
+    parser.add_argument("mode", choices=["morning", "night", "full", "report", "intraday"], nargs="?", default="full")
+    parser.add_argument("--isolated", action="store_true", help="每个阶段单独起子进程运行（不共享缓存）")
+    parser.add_argument("--no-store", action="store_true", help="不更新本地行情库")
+    parser.add_argument("--no-fetch", action="store_true", help="不做并发预取")
+    parser.add_argument("--from-stage", choices=["morning", "night"] + stages.STAGES,
+                        help="忽略该阶段及之后的检查点，强制重跑")
+    parser.add_argument("--profile", action="store_true", help="对各阶段做 cProfile，保存最慢阶段的 pstats")
     args = parser.parse_args()
 
-    if args.mode == "morning":
-        return run_morning()
-    if args.mode == "night":
-        return run_night()
+    profiler = profiling.start(args.mode, cprofile=args.profile)
+    try:
+        code = run_mode(args)
+    finally:
+        profiling.stop()
+    report_path, report = profiler.save(code)
+    print(profiling.format_report(report))
+    print(f"耗时报告: {report_path}")
+    return code
 
-    code = run_morning()
-    if code != 0:
+
+def run_mode(args) -> int:
+    global ISOLATED
+    ISOLATED = args.isolated
+    if args.from_stage in ("morning", "night"):
+        FORCED.update(["morning", "night"][["morning", "night"].index(args.from_stage):])
+
+    if args.mode == "intraday":
+        return run_intraday()
+    if args.mode == "report":
+        from_stage = args.from_stage if args.from_stage in stages.STAGES else None
+        code = run_report(from_stage)
+        print(akcache.get_cache().summary())
         return code
-    return run_night()
+
+    # 子进程模式下各阶段不共享缓存，预取与落盘都没有意义
+    if not ISOLATED:
+        restore_cache()
+        if not args.no_fetch:
+            run_fetch()
+    if not args.no_store:
+        update_store()
+    if not ISOLATED:
+        persist_cache()
+
+    if args.mode == "morning":
+        code = run_morning()
+    elif args.mode == "night":
+        code = run_night()
+    else:
+        code = run_morning()
+        if code == 0:
+            code = run_night()
+
+    if not ISOLATED:
+        print(akcache.get_cache().summary())
+    return code
 
 
 if __name__ == "__main__":
@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+推荐规则回测
+在行情库的整段历史上一次性计算指标和 rank.py 的规则矩阵，不按日期循环：
+每条规则、三维验证（研报+情绪+资金）、多维验证以及综合得分前 K 名：T 日收盘后给出信号、
+T+1 日收盘买入，统计之后 1/5/10 日收益、胜率、相对全市场等权的超额收益，
+以及逐日等权持有一天的组合净值与最大回撤。
+T+1 日停牌或收盘涨停封板买不进的信号不计入。
+研报没有历史数据，组合规则按去掉研报后的口径回测，输出中注明实际口径
+
+用法:
+    python3 backtest.py [--start 2024-01-01] [--end 2024-12-31] [--top 20] [--json out.json]
+    python3 backtest.py --bench [--years 3] [--symbols 5000]    # 合成数据
+"""
+
+import argparse
+import json
+import sys
+import time
+import warnings
+
+import numpy as np
+
+import indicators
+import rank
+
+HORIZONS = (1, 5, 10)
+TOP_K = 20
+TRADING_DAYS = 250
+
+
+def forward_returns(close, horizon: int, lag: int = 1):
+    """T 日信号、T+lag 日收盘买入、再持有 horizon 天的收益；末尾不足的天为 NaN"""
+    close = np.asarray(close, dtype="f8")
+    out = np.full(close.shape, np.nan)
+    n = close.shape[0] - horizon - lag
+    if n > 0:
+        with np.errstate(divide="ignore", invalid="ignore"):
+            out[:n] = close[lag + horizon:] / close[lag:lag + n] - 1
+    return out
+
+
+def shift_up(mask, lag: int = 1):
+    """把 T+lag 日的布尔矩阵对齐到 T 日"""
+    out = np.zeros(mask.shape, dtype=bool)
+    out[:-lag] = mask[lag:]
+    return out
+
+
+def top_k_mask(score, k: int):
+    """每天得分前 k 且得分为正的位置"""
+    mask = np.zeros(score.shape, dtype=bool)
+    k = min(k, score.shape[1])
+    if k <= 0:
+        return mask
+    idx = np.argpartition(-score, k - 1, axis=1)[:, :k]
+    rows = np.arange(score.shape[0])[:, None]
+    mask[rows, idx] = True
+    return mask & (score > 0) & np.isfinite(score)
+
+
+def max_drawdown(equity) -> float:
+    if not len(equity):
+        return 0.0
+    peak = np.maximum.accumulate(equity)
+    return float((equity / peak - 1).min())
+
+
+def evaluate(mask, fwd: dict, market: dict, next_ret) -> dict:
+    """单条规则：信号数、各持有期平均收益 / 胜率 / 超额，以及持有一天的组合回撤"""
+    n_signals = int(mask.sum())
+    result = {"signals": n_signals, "days_with_signal": int(mask.any(axis=1).sum())}
+    for h, r in fwd.items():
+        valid = mask & ~np.isnan(r)
+        picked = r[valid]
+        result[f"ret_{h}d"] = float(picked.mean()) if picked.size else None
+        result[f"hit_{h}d"] = float((picked > 0).mean()) if picked.size else None
+        # 超额：每个信号减去当天全市场等权收益
+        excess = (r - market[h][:, None])[valid]
+        result[f"excess_{h}d"] = float(excess.mean()) if excess.size else None
+
+    valid = mask & ~np.isnan(next_ret)
+    count = valid.sum(axis=1)
+    with np.errstate(invalid="ignore"):
+        daily = np.where(count > 0, np.where(valid, next_ret, 0).sum(axis=1) / np.maximum(count, 1), 0.0)
+    equity = np.cumprod(1 + daily)
+    years = len(daily) / TRADING_DAYS
+    result["total_return"] = float(equity[-1] - 1) if len(equity) else 0.0
+    # 不足一年时年化没有意义
+    result["annual_return"] = float(equity[-1] ** (1 / years) - 1) if years >= 1 else None
+    result["max_drawdown"] = max_drawdown(equity)
+    return result
+
+
+def run_backtest(data: dict, codes: list, names: list = None, top: int = TOP_K,
+                 horizons: tuple = HORIZONS) -> dict:
+    timings = {}
+    t = time.perf_counter()
+    ind = indicators.compute(data, codes, names)
+    timings["indicators"] = time.perf_counter() - t
+
+    t = time.perf_counter()
+    sig = rank.signals(data, ind)
+    ok = rank.tradable(data, names)
+    score = rank.score(sig, ok)
+    # 次日能否买入：未停牌且收盘未封涨停
+    entry = shift_up(ok & ~ind["limit_up"])
+    rules = {name: m & ok & entry for name, m in sig.items() if m.any()}
+    # 没有历史的维度（研报）从组合规则中去掉，按实际口径回测并在结果里写明
+    reduced = {}
+    three = tuple(name for name in rank.THREE_WAY if name in rules)
+    if three:
+        rules["三维验证"] = rank.three_way(sig, three) & ok & entry
+        if three != rank.THREE_WAY:
+            reduced["三维验证"] = f"{'+'.join(rank.THREE_WAY)} 同时满足 → 实际按 {'+'.join(three)} 同时满足"
+    core = tuple(name for name in rank.CORE_RULES if name in rules)
+    if len(core) >= 2:
+        rules["多维验证"] = rank.validated(sig, rules=core) & ok & entry
+        if core != rank.CORE_RULES:
+            reduced["多维验证"] = (f"{'/'.join(rank.CORE_RULES)} 中至少两项 → 实际按 "
+                               f"{'/'.join(core)} 中至少两项")
+    rules[f"综合前{top}"] = top_k_mask(score, top) & entry
+    timings["rules"] = time.perf_counter() - t
+
+    t = time.perf_counter()
+    fwd = {h: forward_returns(data["close"], h) for h in horizons}
+    next_ret = fwd[1] if 1 in fwd else forward_returns(data["close"], 1)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)  # 全部停牌的日子均值为 NaN
+        market = {h: np.nanmean(np.where(entry, r, np.nan), axis=1) for h, r in fwd.items()}
+    results = {name: evaluate(mask, fwd, market, next_ret) for name, mask in rules.items()}
+    baseline = evaluate(entry, fwd, market, next_ret)
+    timings["evaluate"] = time.perf_counter() - t
+    skipped = [name for name in rank.WEIGHTS if name not in rules]
+    return {"rules": results, "baseline": baseline, "skipped": skipped, "reduced": reduced, "timings": timings,
+            "days": int(data["close"].shape[0]), "symbols": int(data["close"].shape[1])}
+
+
+def _pct(value, sign: bool = True) -> str:
+    if value is None:
+        return "-"
+    return f"{value * 100:+.2f}%" if sign else f"{value * 100:.2f}%"
+
+
+def format_results(bt: dict, horizons: tuple = HORIZONS) -> str:
+    lines = [f"回测 {bt['days']} 个交易日 × {bt['symbols']} 只股票"]
+    header = f"{'规则':<10}{'信号数':>9}" + "".join(f"{f'{h}日收益':>10}{f'{h}日胜率':>9}" for h in horizons)
+    header += f"{'5日超额':>9}{'累计':>9}{'年化':>9}{'最大回撤':>9}"
+    lines.append(header)
+    rows = list(bt["rules"].items()) + [("全市场", bt["baseline"])]
+    for name, r in rows:
+        cells = "".join(f"{_pct(r[f'ret_{h}d']):>12}{_pct(r[f'hit_{h}d'], False):>11}" for h in horizons)
+        excess = r.get("excess_5d") if 5 in horizons else None
+        lines.append(f"{name:<10}{r['signals']:>11}{cells}{_pct(excess):>11}"
+                     f"{_pct(r['total_return']):>11}{_pct(r['annual_return']):>11}{_pct(r['max_drawdown']):>11}")
+    if bt["skipped"]:
+        lines.append(f"无历史数据、未回测的规则: {', '.join(bt['skipped'])}")
+    for name, text in bt.get("reduced", {}).items():
+        lines.append(f"{name} 口径缩减（缺少历史数据）: {text}")
+    lines.append("耗时: " + "，".join(f"{k} {v:.2f}s" for k, v in bt["timings"].items()))
+    return "\n".join(lines)
+
+
+def load_store(start: str = None, end: str = None) -> tuple:
+    import market_store
+
+    store = market_store.MarketStore()
+    lo = next((i for i, d in enumerate(store.dates) if not start or d >= start), store.n_days)
+    hi = max((i + 1 for i, d in enumerate(store.dates) if not end or d <= end), default=0)
+    data = {name: np.asarray(arr[lo:hi]) for name, arr in indicators.load_from_store(store).items()}
+    return data, store.codes, [s["name"] for s in store.symbols], store.dates[lo:hi]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="A股推荐规则回测")
+    parser.add_argument("--start", help="起始日期 YYYY-MM-DD")
+    parser.add_argument("--end", help="结束日期 YYYY-MM-DD")
+    parser.add_argument("--top", type=int, default=TOP_K, help="综合得分每天取前 K 名")
+    parser.add_argument("--horizons", default=",".join(map(str, HORIZONS)), help="持有天数，逗号分隔")
+    parser.add_argument("--json", help="结果另存为 JSON")
+    parser.add_argument("--bench", action="store_true", help="用合成数据测速")
+    parser.add_argument("--years", type=float, default=3)
+    parser.add_argument("--symbols", type=int, default=5000)
+    args = parser.parse_args()
+
+    horizons = tuple(int(h) for h in args.horizons.split(","))
+    t = time.perf_counter()
+    if args.bench:
+        data, codes, names, _ = indicators.synthetic_market(int(args.years * TRADING_DAYS), args.symbols)
+        span = f"合成数据 {args.years:g} 年"
+    else:
+        data, codes, names, dates = load_store(args.start, args.end)
+        if len(dates) <= max(horizons):
+            print(f"Error: 行情库只有 {len(dates)} 个交易日，不足以回测")
+            return 1
+        span = f"{dates[0]} ~ {dates[-1]}"
+    load_time = time.perf_counter() - t
+
+    bt = run_backtest(data, codes, names, args.top, horizons)
+    bt["timings"] = {"load": load_time, **bt["timings"]}
+    print(f"[{span}]")
+    print(format_results(bt, horizons))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"span": span, **bt}, f, ensure_ascii=False, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+并发数据拉取阶段
+盘前 / 盘后需要的行情、概念与行业资金流、涨停池、机构评级互不依赖，
+在 pipeline 之前用线程池并发请求：每个数据源单独超时与重试，同一主机限制并发数，
+某个源失败只记录警告，不影响其他源。请求经过 akcache，随后各阶段直接命中缓存
+
+用法:
+    python3 fetch.py [--sources spot,zt_pool] [--timeout 30] [--retries 2] [--host-limit 2]
+"""
+
+import argparse
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import akcache
+
+# 名称 → (akshare 接口, 参数, 主机, 超时秒数)
+SOURCES = {
+    "spot": ("stock_zh_a_spot_em", {}, "push2.eastmoney.com", 40),
+    "stock_flow": ("stock_individual_fund_flow_rank", {"indicator": "今日"}, "push2.eastmoney.com", 30),
+    "concept_flow": ("stock_sector_fund_flow_rank", {"indicator": "今日", "sector_type": "概念资金流"},
+                     "push2.eastmoney.com", 20),
+    "industry_flow": ("stock_sector_fund_flow_rank", {"indicator": "今日", "sector_type": "行业资金流"},
+                      "push2.eastmoney.com", 20),
+    "zt_pool": ("stock_zt_pool_em", None, "push2ex.eastmoney.com", 20),
+    "research": ("stock_institute_recommend", {"symbol": "最新投资评级"}, "stock.finance.sina.com.cn", 30),
+}
+RETRIES = 2
+HOST_LIMIT = 2
+BACKOFF = 1.0
+
+
+class FetchTimeout(Exception):
+    pass
+
+
+def source_kwargs(name: str) -> dict:
+    kwargs = SOURCES[name][1]
+    if kwargs is None:  # 涨停池按交易日请求
+        kwargs = {"date": akcache.trading_date().replace("-", "")}
+    return kwargs
+
+
+class Call:
+    """在守护线程中执行的一次请求。线程无法强制结束，超时后只是放弃等待，
+    主机信号量由线程自己在请求真正结束时释放，被放弃的请求仍计入主机并发数"""
+
+    def __init__(self, func, kwargs: dict, sem):
+        self.box = {}
+        self.sem = sem
+        self.worker = threading.Thread(target=self._target, args=(func, kwargs), daemon=True)
+
+    def _target(self, func, kwargs):
+        try:
+            self.box["value"] = func(**kwargs)
+        except BaseException as e:
+            self.box["error"] = e
+        finally:
+            self.sem.release()
+
+    def start(self) -> "Call":
+        self.sem.acquire()
+        self.worker.start()
+        return self
+
+    def wait(self, timeout: float):
+        self.worker.join(timeout)
+        if self.worker.is_alive():
+            raise FetchTimeout(f"超过 {timeout:.0f}s 未返回")
+        if "error" in self.box:
+            raise self.box["error"]
+        return self.box["value"]
+
+
+class Fetcher:
+    def __init__(self, timeout: float = None, retries: int = RETRIES, host_limit: int = HOST_LIMIT):
+        self.timeout = timeout
+        self.retries = retries
+        self.host_limit = host_limit
+        self.semaphores = {}
+        self.lock = threading.Lock()
+        self.t0 = time.perf_counter()
+
+    def _semaphore(self, host: str):
+        with self.lock:
+            return self.semaphores.setdefault(host, threading.BoundedSemaphore(self.host_limit))
+
+    def fetch_one(self, name: str) -> dict:
+        func_name, _, host, default_timeout = SOURCES[name]
+        kwargs = source_kwargs(name)
+        timeout = self.timeout or default_timeout
+        result = {"source": name, "ok": False, "data": None, "error": "", "attempts": 0,
+                  "queued": 0.0, "elapsed": 0.0, "finished": 0.0}
+        func = getattr(akcache.akshare, func_name, None) if akcache.AKSHARE_AVAILABLE else None
+        if func is None:
+            result["error"] = f"akshare 不可用或缺少接口 {func_name}"
+            return result
+
+        sem = self._semaphore(host)
+        start = time.perf_counter()
+        call = None
+        for attempt in range(self.retries + 1):
+            result["attempts"] = attempt + 1
+            # 上一次超时的请求还在进行时继续等它，不再排队发出同样的请求
+            if call is None or not call.worker.is_alive():
+                wait_start = time.perf_counter()
+                call = Call(func, kwargs, sem).start()
+                result["queued"] += time.perf_counter() - wait_start
+            try:
+                result["data"] = call.wait(timeout)
+                result["ok"] = True
+                result["error"] = ""
+            except Exception as e:
+                result["error"] = f"{type(e).__name__}: {e}"
+            if result["ok"]:
+                break
+            if attempt < self.retries:
+                time.sleep(BACKOFF * 2 ** attempt)
+        result["elapsed"] = time.perf_counter() - start
+        result["finished"] = time.perf_counter() - self.t0
+        return result
+
+    def run(self, names: list) -> dict:
+        with ThreadPoolExecutor(max_workers=len(names) or 1, thread_name_prefix="fetch") as pool:
+            results = list(pool.map(self.fetch_one, names))
+        return {r["source"]: r for r in results}
+
+
+def fetch_all(names: list = None, timeout: float = None, retries: int = RETRIES,
+              host_limit: int = HOST_LIMIT) -> dict:
+    """并发拉取所有数据源，返回 {source: result}；结果同时写入 akcache"""
+    akcache.get_cache().install()
+    return Fetcher(timeout, retries, host_limit).run(list(names or SOURCES))
+
+
+def format_report(results: dict) -> str:
+    ok = sum(r["ok"] for r in results.values())
+    wall = max((r["finished"] for r in results.values()), default=0.0)
+    lines = [f"fetch: {ok}/{len(results)} 个数据源成功，总耗时 {wall:.1f}s"]
+    for r in sorted(results.values(), key=lambda r: -r["finished"]):
+        state = "ok" if r["ok"] else f"失败（{r['error']}）"
+        extra = f"，重试 {r['attempts'] - 1} 次" if r["attempts"] > 1 else ""
+        queued = f"，排队 {r['queued']:.1f}s" if r["queued"] >= 0.05 else ""
+        lines.append(f"  {r['source']:<14} {r['elapsed']:5.1f}s{queued}{extra}  {state}")
+    if results:
+        slowest = max(results.values(), key=lambda r: r["finished"])
+        lines.append(f"  关键路径: {slowest['source']}")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="并发拉取 A股数据源")
+    parser.add_argument("--sources", help=f"逗号分隔，默认全部: {','.join(SOURCES)}")
+    parser.add_argument("--timeout", type=float, help="每个源的单次超时（秒），默认按源设置")
+    parser.add_argument("--retries", type=int, default=RETRIES)
+    parser.add_argument("--host-limit", type=int, default=HOST_LIMIT, help="同一主机的最大并发请求数")
+    args = parser.parse_args()
+
+    names = args.sources.split(",") if args.sources else list(SOURCES)
+    unknown = [n for n in names if n not in SOURCES]
+    if unknown:
+        print(f"Error: 未知数据源 {', '.join(unknown)}")
+        return 1
+    results = fetch_all(names, args.timeout, args.retries, args.host_limit)
+    print(format_report(results))
+    return 0 if any(r["ok"] for r in results.values()) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+"""
+全市场向量化指标
+所有函数直接作用在 market_store 的 (交易日 × 股票) 数组上，不按股票循环：
+均线 / 量比用累加和做滑动窗口，涨跌停按板块涨跌幅限制判定，连板数用累加和复位，
+板块汇总用 bincount 按分组下标归约
+
+用法:
+    python3 indicators.py summary            # 用本地行情库计算最新交易日
+    python3 indicators.py --bench            # 合成 250 天 × 5000 只股票基准测试
+"""
+
+import argparse
+import sys
+import time
+
+import numpy as np
+
+MA_WINDOWS = (5, 10, 20, 60)
+VOLUME_RATIO_WINDOW = 5
+EPS = 0.005  # 价格以分为单位，行情库中为 float32，比较时容忍半分
+
+
+def moving_average(x, window: int):
+    """沿交易日方向的简单均线；窗口内有缺失值或不足 window 天时为 NaN"""
+    x = np.asarray(x, dtype="f8")
+    valid = ~np.isnan(x)
+    cs = np.zeros((x.shape[0] + 1,) + x.shape[1:])
+    np.cumsum(np.where(valid, x, 0.0), axis=0, out=cs[1:])
+    cnt = np.zeros(cs.shape, dtype=np.int32)
+    np.cumsum(valid, axis=0, out=cnt[1:])
+    out = np.full(x.shape, np.nan)
+    if x.shape[0] >= window:
+        total = cs[window:] - cs[:-window]
+        full = (cnt[window:] - cnt[:-window]) == window
+        out[window - 1:] = np.where(full, total / window, np.nan)
+    return out
+
+
+def volume_ratio(volume, window: int = VOLUME_RATIO_WINDOW):
+    """量比：当日成交量 / 前 window 日平均成交量"""
+    volume = np.asarray(volume, dtype="f8")
+    prev = np.full(volume.shape, np.nan)
+    prev[1:] = moving_average(volume, window)[:-1]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(prev > 0, volume / prev, np.nan)
+
+
+def limit_pct(codes: list, names: list = None):
+    """各股票涨跌幅限制：科创板 / 创业板 20%，北交所 30%，主板 ST 5%，其余 10%"""
+    codes = np.asarray(codes, dtype="U6")
+    pct = np.full(len(codes), 0.10)
+    if names is not None:
+        st = np.char.find(np.char.upper(np.asarray(names, dtype="U16")), "ST") >= 0
+        pct[st] = 0.05
+    pct[np.isin(codes.astype("U3"), ("688", "689", "300", "301"))] = 0.20
+    pct[np.isin(codes.astype("U1"), ("4", "8")) | (codes.astype("U2") == "92")] = 0.30
+    return pct
+
+
+def limit_prices(pre_close, pct):
+    """涨停价 / 跌停价，按交易所规则四舍五入到分"""
+    pre_close = np.asarray(pre_close, dtype="f8")
+    up = np.floor(pre_close * (1 + pct) * 100 + 0.5) / 100
+    down = np.floor(pre_close * (1 - pct) * 100 + 0.5) / 100
+    return up, down
+
+
+def limit_flags(close, pre_close, high, pct) -> dict:
+    """涨停 / 跌停 / 炸板（盘中触及涨停但未封住）布尔矩阵"""
+    up, down = limit_prices(pre_close, pct)
+    close = np.asarray(close, dtype="f8")
+    high = np.asarray(high, dtype="f8")
+    with np.errstate(invalid="ignore"):
+        limit_up = close >= up - EPS
+        return {
+            "limit_up": limit_up,
+            "limit_down": close <= down + EPS,
+            "broken": (high >= up - EPS) & ~limit_up,
+        }
+
+
+def streak(flags):
+    """连续为真的天数（沿交易日方向），如连板数"""
+    flags = np.asarray(flags, dtype=bool)
+    c = np.cumsum(flags, axis=0, dtype=np.int32)
+    reset = np.where(flags, 0, c)
+    return c - np.maximum.accumulate(reset, axis=0)
+
+
+def group_index(codes: list, sectors: dict) -> tuple:
+    """{code: 板块名} → (每只股票的板块下标，无板块为 -1；板块名列表)"""
+    labels = sorted(set(sectors.values()))
+    pos = {name: i for i, name in enumerate(labels)}
+    ids = np.fromiter((pos.get(sectors.get(c), -1) for c in codes), dtype=np.int64, count=len(codes))
+    return ids, labels
+
+
+def group_reduce(values, ids, n_groups: int) -> tuple:
+    """按分组求和与有效计数；values 可为 (N,) 或 (T, N)，NaN 与 -1 分组忽略"""
+    values = np.asarray(values, dtype="f8")
+    rows = values.reshape(-1, values.shape[-1])
+    ok = (ids >= 0)[None, :] & ~np.isnan(rows)
+    flat = (ids[None, :] + np.arange(rows.shape[0])[:, None] * n_groups)[ok]
+    size = rows.shape[0] * n_groups
+    total = np.bincount(flat, weights=rows[ok], minlength=size).reshape(rows.shape[0], n_groups)
+    count = np.bincount(flat, minlength=size).reshape(rows.shape[0], n_groups)
+    shape = values.shape[:-1] + (n_groups,)
+    return total.reshape(shape), count.reshape(shape)
+
+
+def sector_stats(day: dict, ids, labels: list) -> list:
+    """单日板块汇总：平均涨幅、成交额、主力净流入、涨停数、上涨占比"""
+    n = len(labels)
+    pct_sum, members = group_reduce(day["pct_chg"], ids, n)
+    amount, _ = group_reduce(day["amount"], ids, n)
+    main_net, _ = group_reduce(day["main_net"], ids, n)
+    limit_up, _ = group_reduce(day["limit_up"].astype("f8"), ids, n)
+    with np.errstate(invalid="ignore"):
+        rising, _ = group_reduce((day["pct_chg"] > 0).astype("f8"), ids, n)
+    stats = []
+    for i, name in enumerate(labels):
+        if not members[i]:
+            continue
+        stats.append({
+            "sector": name,
+            "members": int(members[i]),
+            "avg_pct": round(pct_sum[i] / members[i], 2),
+            "amount": float(amount[i]),
+            "main_net": float(main_net[i]),
+            "limit_up": int(limit_up[i]),
+            "up_ratio": round(rising[i] / members[i], 3),
+        })
+    return stats
+
+
+def compute(data: dict, codes: list, names: list = None) -> dict:
+    """全部指标：data 为 {field: (T, N) 数组}，至少含 close / pre_close / high / volume"""
+    out = {f"ma{w}": moving_average(data["close"], w) for w in MA_WINDOWS}
+    out["volume_ratio"] = volume_ratio(data["volume"])
+    out.update(limit_flags(data["close"], data["pre_close"], data["high"], limit_pct(codes, names)))
+    out["up_streak"] = streak(out["limit_up"])
+    out["down_streak"] = streak(out["limit_down"])
+    return out
+
+
+def latest(data: dict, ind: dict, row: int = -1) -> dict:
+    """取某一天的横截面，供排序 / 板块汇总使用"""
+    day = {k: np.asarray(v[row]) for k, v in data.items()}
+    day.update({k: v[row] for k, v in ind.items()})
+    return day
+
+
+def load_from_store(store, days: int = 0, end: int = None) -> dict:
+    """从行情库取截至第 end 行（不含，默认到最新）的最近 days 天（0 为全部）的数组"""
+    end = store.n_days if end is None else end
+    start = max(end - days, 0) if days else 0
+    return {name: store.field(name)[start:end] for name in
+            ("close", "pre_close", "high", "low", "pct_chg", "volume", "amount", "main_net")}
+
+
+def synthetic_market(days: int = 250, symbols: int = 5000, groups: int = 90, seed: int = 7) -> tuple:
+    rng = np.random.default_rng(seed)
+    codes = [f"{c:06d}" for c in np.concatenate([
+        rng.choice(np.arange(600000, 606000), symbols // 2, replace=False),
+        rng.choice(np.arange(300000, 302000), symbols // 4, replace=False),
+        rng.choice(np.arange(1, 3000), symbols - symbols // 2 - symbols // 4, replace=False)])]
+    names = [("ST" if i % 50 == 0 else "") + f"股票{i}" for i in range(symbols)]
+    pct = limit_pct(codes, names)
+    ret = np.clip(rng.normal(0.0005, 0.03, (days, symbols)), -pct, pct)
+    ret[rng.random((days, symbols)) < 0.015] = np.inf  # 约 1.5% 的样本封涨停
+    close = np.empty((days, symbols))
+    pre_close = np.empty((days, symbols))
+    prev = np.full(symbols, 10.0)
+    for t in range(days):
+        up, _ = limit_prices(prev, pct)
+        pre_close[t] = prev
+        close[t] = np.where(np.isinf(ret[t]), up, np.floor(prev * (1 + ret[t]) * 100 + 0.5) / 100)
+        prev = close[t]
+    data = {
+        "close": close,
+        "pre_close": pre_close,
+        "high": np.maximum(close, pre_close) * (1 + rng.random((days, symbols)) * 0.02),
+        "low": np.minimum(close, pre_close) * (1 - rng.random((days, symbols)) * 0.02),
+        "pct_chg": (close / pre_close - 1) * 100,
+        "volume": rng.lognormal(10, 1, (days, symbols)),
+        "amount": rng.lognormal(18, 1, (days, symbols)),
+        "main_net": rng.normal(0, 1e7, (days, symbols)),
+    }
+    data["close"][rng.random((days, symbols)) < 0.002] = np.nan  # 停牌
+    sectors = {c: f"板块{rng.integers(groups)}" for c in codes}
+    return data, codes, names, sectors
+
+
+def run_bench(days: int, symbols: int, repeat: int) -> None:
+    data, codes, names, sectors = synthetic_market(days, symbols)
+    ids, labels = group_index(codes, sectors)
+    timings = {}
+
+    def timed(name, func):
+        best = float("inf")
+        for _ in range(repeat):
+            start = time.perf_counter()
+            result = func()
+            best = min(best, time.perf_counter() - start)
+        timings[name] = best
+        return result
+
+    timed("ma x4", lambda: [moving_average(data["close"], w) for w in MA_WINDOWS])
+    timed("volume_ratio", lambda: volume_ratio(data["volume"]))
+    flags = timed("limit_flags", lambda: limit_flags(data["close"], data["pre_close"], data["high"],
+                                                     limit_pct(codes, names)))
+    timed("streak x2", lambda: (streak(flags["limit_up"]), streak(flags["limit_down"])))
+    timed("sector (all days)", lambda: group_reduce(data["amount"], ids, len(labels)))
+    ind = timed("compute", lambda: compute(data, codes, names))
+    timed("sector_stats", lambda: sector_stats(latest(data, ind), ids, labels))
+
+    print(f"{days} 天 × {symbols} 只股票，{len(labels)} 个板块，取 {repeat} 次最好成绩")
+    for name, seconds in timings.items():
+        print(f"  {name:<18} {seconds * 1000:8.1f} ms")
+    total = timings["compute"] + timings["sector_stats"]
+    print(f"  {'compute + sectors':<18} {total * 1000:8.1f} ms")
+    print(f"  最新一天涨停 {int(ind['limit_up'][-1].sum())} 只，最高 {int(ind['up_streak'].max())} 连板")
+
+
+def run_summary(top: int) -> int:
+    import market_store
+
+    store = market_store.MarketStore()
+    if store.n_days == 0:
+        print("Error: 行情库为空，先运行 market_store.py update")
+        return 1
+    data = load_from_store(store, days=max(MA_WINDOWS) + 1)
+    codes, names = store.codes, [s["name"] for s in store.symbols]
+    ind = compute(data, codes, names)
+    day = latest(data, ind)
+    print(f"{store.dates[-1]}: 涨停 {int(day['limit_up'].sum())}，跌停 {int(day['limit_down'].sum())}，"
+          f"炸板 {int(day['broken'].sum())}")
+    for i in np.argsort(-day["up_streak"], kind="stable")[:top]:
+        if day["up_streak"][i] > 1:
+            print(f"  {codes[i]} {names[i]} {day['up_streak'][i]} 连板")
+    sectors = market_store.load_sectors(store)
+    if sectors:
+        ids, labels = group_index(codes, sectors)
+        stats = sorted(sector_stats(day, ids, labels), key=lambda s: -s["main_net"])
+        for s in stats[:top]:
+            print(f"  {s['sector']}: 涨幅 {s['avg_pct']}%，主力 {s['main_net'] / 1e8:.2f} 亿，涨停 {s['limit_up']}")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="A股全市场向量化指标")
+    parser.add_argument("command", nargs="?", choices=["summary"], default="summary")
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--bench", action="store_true", help="合成数据基准测试")
+    parser.add_argument("--days", type=int, default=250)
+    parser.add_argument("--symbols", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    if args.bench:
+        run_bench(args.days, args.symbols, args.repeat)
+        return 0
+    return run_summary(args.top)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
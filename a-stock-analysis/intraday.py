@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+"""
+盘中增量模式
+按固定间隔拉取全市场快照与行业 / 概念资金流，和上一次快照逐项比较，
+只把变化的项更新进有序排名（bisect 维护的有序列表），然后比较前 N 名，
+只推送名次变化超过阈值、新进或跌出前 N 的条目。
+除了一次字典比较外，每一轮排名维护的开销只与变化的项数有关
+
+用法:
+    python3 intraday.py [--interval 60] [--top 10] [--threshold 3] [--record snaps.jsonl.gz]
+    python3 intraday.py --replay snaps.jsonl.gz [--speed 0]     # 离线回放录制的快照
+"""
+
+import argparse
+import gzip
+import json
+import sys
+import time
+from bisect import bisect_left, insort
+from datetime import datetime
+
+import akcache
+
+INTERVAL = 60
+TOP_N = 10
+THRESHOLD = 3
+LUNCH_BREAK = ((11, 30), (13, 0))
+CLOSE = (15, 0)
+
+# 排名 → (快照表, 取值列)
+RANKINGS = {
+    "行业资金": ("industry", 0),
+    "行业强度": ("industry", 1),
+    "概念资金": ("concept", 0),
+    "概念强度": ("concept", 1),
+    "个股强度": ("spot", 0),
+}
+
+
+class Ranking:
+    """按值从大到小排列的增量排名：更新单项为 O(log n) 查找 + 一次列表移动"""
+
+    def __init__(self):
+        self.values = {}
+        self.order = []  # (-value, key) 升序
+
+    def __len__(self):
+        return len(self.order)
+
+    def remove(self, key) -> None:
+        if key in self.values:
+            i = bisect_left(self.order, (-self.values.pop(key), key))
+            del self.order[i]
+
+    def set(self, key, value: float) -> None:
+        if self.values.get(key) == value:
+            return
+        self.remove(key)
+        self.values[key] = value
+        insort(self.order, (-value, key))
+
+    def rank(self, key) -> int:
+        return bisect_left(self.order, (-self.values[key], key))
+
+    def top(self, n: int) -> list:
+        return [key for _, key in self.order[:n]]
+
+
+def diff(prev: dict, cur: dict) -> tuple:
+    """两次快照同一张表的差异：(新增或变化的 {key: row}, 消失的 key 集合)"""
+    changed = {k: v for k, v in cur.items() if prev.get(k) != v}
+    removed = prev.keys() - cur.keys()
+    return changed, removed
+
+
+class IntradayTracker:
+    def __init__(self, top: int = TOP_N, threshold: int = THRESHOLD):
+        self.top_n = top
+        self.threshold = threshold
+        self.snapshot = {}
+        self.rankings = {name: Ranking() for name in RANKINGS}
+        self.leaders = {name: [] for name in RANKINGS}
+        self.names = {}
+        self.ticks = 0
+
+    def tick(self, snapshot: dict) -> tuple:
+        """应用一次快照，返回 (推送事件列表, 本轮统计)"""
+        start = time.perf_counter()
+        self.names.update(snapshot.get("names", {}))
+        changed_count = {}
+        for table in ("spot", "industry", "concept"):
+            cur = snapshot.get(table)
+            if cur is None:  # 这一轮该数据源失败，保留上一次的排名
+                continue
+            changed, removed = diff(self.snapshot.get(table, {}), cur)
+            changed_count[table] = len(changed) + len(removed)
+            for name, (t, col) in RANKINGS.items():
+                if t != table:
+                    continue
+                ranking = self.rankings[name]
+                for key in removed:
+                    ranking.remove(key)
+                for key, row in changed.items():
+                    if row[col] is None:
+                        ranking.remove(key)
+                    else:
+                        ranking.set(key, row[col])
+            self.snapshot[table] = cur
+
+        events = []
+        for name, ranking in self.rankings.items():
+            new = ranking.top(self.top_n)
+            old = self.leaders[name]
+            if self.ticks and new != old:
+                events.extend(self._rank_events(name, old, new))
+            self.leaders[name] = new
+        self.ticks += 1
+        return events, {"changed": changed_count, "elapsed": time.perf_counter() - start}
+
+    def _rank_events(self, name: str, old: list, new: list) -> list:
+        table, col = RANKINGS[name]
+        old_pos = {k: i for i, k in enumerate(old)}
+        new_pos = {k: i for i, k in enumerate(new)}
+        events = []
+        for key in dict.fromkeys(old + new):
+            before, after = old_pos.get(key), new_pos.get(key)
+            if before is not None and after is not None and abs(before - after) < self.threshold:
+                continue
+            row = self.snapshot[table].get(key)
+            events.append({
+                "ranking": name,
+                "key": key,
+                "label": self.names.get(key, key),
+                "old": None if before is None else before + 1,
+                "new": None if after is None else after + 1,
+                "value": None if row is None else row[col],
+            })
+        return events
+
+
+def format_event(e: dict) -> str:
+    if e["old"] is None:
+        move = f"新进第 {e['new']}"
+    elif e["new"] is None:
+        move = f"跌出前列（原第 {e['old']}）"
+    else:
+        arrow = "↑" if e["new"] < e["old"] else "↓"
+        move = f"{arrow} {e['old']}→{e['new']}"
+    if e["value"] is None:
+        value = ""
+    elif e["ranking"].endswith("资金"):
+        value = f"（主力 {e['value'] / 1e8:.2f} 亿）"
+    else:
+        value = f"（{e['value']:+.2f}%）"
+    return f"{e['ranking']}: {e['label']} {move}{value}"
+
+
+def _number(value):
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+    return None if value != value else round(value, 4)
+
+
+def _rows(frame, key: str, columns: list) -> dict:
+    if frame is None or key not in getattr(frame, "columns", ()):
+        return None
+    cols = [frame[c].tolist() if c in frame.columns else [None] * len(frame) for c in columns]
+    return {str(k): [_number(v) for v in vals] for k, *vals in zip(frame[key].tolist(), *cols)}
+
+
+def _raw(name: str):
+    """绕过 akcache：盘中每一轮都要最新数据"""
+    func = getattr(akcache.akshare, name)
+    return getattr(func, "__akcache_original__", func)
+
+
+def fetch_snapshot() -> dict:
+    """拉取一次快照；某个数据源失败时该表为 None"""
+    snap = {"ts": datetime.now().isoformat(timespec="seconds")}
+    sources = {
+        "spot": (lambda: _raw("stock_zh_a_spot_em")(), "代码", ["涨跌幅", "最新价", "成交额"]),
+        "industry": (lambda: _raw("stock_sector_fund_flow_rank")(indicator="今日", sector_type="行业资金流"),
+                     "名称", ["今日主力净流入-净额", "今日涨跌幅"]),
+        "concept": (lambda: _raw("stock_sector_fund_flow_rank")(indicator="今日", sector_type="概念资金流"),
+                    "名称", ["今日主力净流入-净额", "今日涨跌幅"]),
+    }
+    for table, (call, key, columns) in sources.items():
+        try:
+            frame = call()
+        except Exception as e:
+            print(f"Warning: {table} 获取失败: {e}", file=sys.stderr)
+            snap[table] = None
+            continue
+        snap[table] = _rows(frame, key, columns)
+        if table == "spot" and snap[table] is not None and "名称" in frame.columns:
+            snap["names"] = dict(zip(frame[key].astype(str), frame["名称"].astype(str)))
+    return snap
+
+
+def trading_now(now: datetime) -> bool:
+    hm = (now.hour, now.minute)
+    return now.weekday() < 5 and (9, 30) <= hm < CLOSE and not LUNCH_BREAK[0] <= hm < LUNCH_BREAK[1]
+
+
+def live_snapshots(interval: float, record: str = None, until: tuple = CLOSE):
+    """交易时段内按间隔产出快照，午休时等待，收盘后结束"""
+    out = gzip.open(record, "at", encoding="utf-8") if record else None
+    names_written = False
+    try:
+        while True:
+            now = datetime.now()
+            if (now.hour, now.minute) >= until or now.weekday() >= 5:
+                return
+            if not trading_now(now):
+                time.sleep(min(interval, 60))
+                continue
+            start = time.monotonic()
+            snap = fetch_snapshot()
+            if out:
+                # 名称只在第一条记录里保存，减小录制文件
+                line = snap if not names_written else {k: v for k, v in snap.items() if k != "names"}
+                out.write(json.dumps(line, ensure_ascii=False) + "\n")
+                out.flush()
+                names_written = names_written or "names" in snap
+            yield snap
+            time.sleep(max(0.0, interval - (time.monotonic() - start)))
+    finally:
+        if out:
+            out.close()
+
+
+def replay_snapshots(path: str, speed: float = 0.0):
+    """回放录制文件；speed > 0 时按录制时间间隔 / speed 等待"""
+    opener = gzip.open if path.endswith(".gz") else open
+    last = None
+    with opener(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            snap = json.loads(line)
+            ts = datetime.fromisoformat(snap["ts"])
+            if speed > 0 and last is not None:
+                time.sleep(max(0.0, (ts - last).total_seconds() / speed))
+            last = ts
+            yield snap
+
+
+def run(snapshots, top: int = TOP_N, threshold: int = THRESHOLD, verbose: bool = False) -> dict:
+    tracker = IntradayTracker(top, threshold)
+    pushed = 0
+    total = 0.0
+    for snap in snapshots:
+        events, stats = tracker.tick(snap)
+        total += stats["elapsed"]
+        if verbose:
+            changed = "，".join(f"{k} {v}" for k, v in stats["changed"].items())
+            print(f"[{snap['ts']}] 变化: {changed}，更新 {stats['elapsed'] * 1000:.1f}ms", file=sys.stderr)
+        if events:
+            pushed += len(events)
+            print(f"[{snap['ts']}] 排名变化")
+            for e in events:
+                print(f"  {format_event(e)}")
+            sys.stdout.flush()
+    return {"ticks": tracker.ticks, "pushed": pushed, "update_time": total}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="A股盘中增量排名")
+    parser.add_argument("--interval", type=float, default=INTERVAL, help="轮询间隔（秒）")
+    parser.add_argument("--top", type=int, default=TOP_N, help="关注前 N 名")
+    parser.add_argument("--threshold", type=int, default=THRESHOLD, help="名次变化至少多少位才推送")
+    parser.add_argument("--until", default="15:00", help="结束时间 HH:MM")
+    parser.add_argument("--record", help="把每次快照追加写入该文件（.jsonl.gz）")
+    parser.add_argument("--replay", help="回放录制文件，不访问网络")
+    parser.add_argument("--speed", type=float, default=0.0, help="回放速度倍数，0 为不等待")
+    parser.add_argument("--verbose", action="store_true", help="打印每轮变化项数与更新耗时")
+    args = parser.parse_args()
+
+    if args.replay:
+        snapshots = replay_snapshots(args.replay, args.speed)
+    else:
+        if not akcache.AKSHARE_AVAILABLE:
+            print("Error: akshare 未安装")
+            return 1
+        hour, minute = (int(x) for x in args.until.split(":"))
+        snapshots = live_snapshots(args.interval, args.record, (hour, minute))
+    try:
+        result = run(snapshots, args.top, args.threshold, args.verbose)
+    except KeyboardInterrupt:
+        return 130
+    print(f"intraday: {result['ticks']} 轮，推送 {result['pushed']} 条，"
+          f"排名更新共 {result['update_time'] * 1000:.0f}ms", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,515 @@
+#!/usr/bin/env python3
+"""
+本地列式行情库
+每个字段一个 NumPy memmap 文件，布局为 (交易日 × 股票)，按天追加：
+每次运行只拉取最新一个交易日的全市场快照与个股资金流写入新的一行，
+分析阶段直接以内存映射数组读取历史，不再重复请求网络
+
+目录结构（默认 ~/.openclaw/workspace/ashare_data/store）:
+    meta.json      行数 / 容量
+    dates.json     已存交易日（与行对应）
+    symbols.json   [{"code", "name"}]（与列对应，新股追加在末尾）
+    <field>.bin    float32/float64，形状 (cap_days, cap_symbols)
+    sectors.json   {code: 行业板块}（成分变化慢，单独按需刷新）
+    calendar.json  交易日历（新浪，按周刷新）
+
+节假日东方财富仍返回上一交易日的快照，写入前先对照交易日历，并检查快照是否与库中最后一天相同。
+漏跑的交易日用 backfill 从个股日线历史补回（插入到对应位置）
+"""
+
+import argparse
+import json
+import os
+import sys
+from bisect import bisect_left
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+
+import numpy as np
+
+STORE_DIR = os.path.expanduser(os.environ.get("ASHARE_STORE_DIR", "~/.openclaw/workspace/ashare_data/store"))
+
+# 字段 → (东方财富列名, dtype)
+SPOT_FIELDS = {
+    "open": ("今开", "f4"),
+    "high": ("最高", "f4"),
+    "low": ("最低", "f4"),
+    "close": ("最新价", "f4"),
+    "pre_close": ("昨收", "f4"),
+    "pct_chg": ("涨跌幅", "f4"),
+    "volume": ("成交量", "f8"),
+    "amount": ("成交额", "f8"),
+    "turnover": ("换手率", "f4"),
+    "volume_ratio": ("量比", "f4"),
+    "float_cap": ("流通市值", "f8"),
+}
+FLOW_FIELDS = {
+    "main_net": ("今日主力净流入-净额", "f8"),
+    "main_ratio": ("今日主力净流入-净占比", "f4"),
+}
+FIELDS = {name: dtype for name, (_, dtype) in {**SPOT_FIELDS, **FLOW_FIELDS}.items()}
+
+# 日线历史（stock_zh_a_hist）列名；不含量比、流通市值与资金流，回填的这几个字段为 NaN
+HIST_FIELDS = {
+    "open": "开盘",
+    "high": "最高",
+    "low": "最低",
+    "close": "收盘",
+    "pct_chg": "涨跌幅",
+    "volume": "成交量",
+    "amount": "成交额",
+    "turnover": "换手率",
+}
+
+DAY_BLOCK = 256
+SYMBOL_BLOCK = 1024
+CALENDAR_MAX_AGE = 7
+BACKFILL_WORKERS = 8
+
+
+def trade_calendar(root: str = STORE_DIR) -> set:
+    """交易日集合（YYYY-MM-DD），缓存在 calendar.json；获取失败且无缓存时返回空集合"""
+    path = os.path.join(root, "calendar.json")
+    cached = _load_json(path, {})
+    today = date.today()
+    fetched = cached.get("fetched", "")
+    days = cached.get("days", [])
+    if days and fetched >= (today - timedelta(days=CALENDAR_MAX_AGE)).isoformat() and days[-1] >= today.isoformat():
+        return set(days)
+    try:
+        import akshare as ak
+
+        frame = ak.tool_trade_date_hist_sina()
+        days = sorted(str(d)[:10] for d in frame["trade_date"])
+    except Exception as e:
+        print(f"Warning: 交易日历获取失败，{'沿用缓存' if days else '按工作日判断'}: {e}", file=sys.stderr)
+        return set(days)
+    os.makedirs(root, exist_ok=True)
+    _dump_json(path, {"fetched": today.isoformat(), "days": days})
+    return set(days)
+
+
+def is_trading_day(day: date, calendar: set) -> bool:
+    """calendar 为空时退化为工作日判断"""
+    return day.isoformat() in calendar if calendar else day.weekday() < 5
+
+
+def bar_date(now: datetime = None, calendar: set = None):
+    """当前快照对应的完整日线日期：收盘后为当天，开盘前与休市日为上一交易日，盘中返回 None"""
+    now = now or datetime.now()
+    calendar = trade_calendar() if calendar is None else calendar
+    day = now.date()
+    if is_trading_day(day, calendar) and now.hour >= 15:
+        return day.isoformat()
+    if is_trading_day(day, calendar) and (now.hour, now.minute) >= (9, 15):
+        return None
+    day -= timedelta(days=1)
+    while not is_trading_day(day, calendar):
+        day -= timedelta(days=1)
+    return day.isoformat()
+
+
+def _load_json(path: str, default):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return default
+
+
+def _dump_json(path: str, data) -> None:
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp, path)
+
+
+def _round_up(n: int, block: int) -> int:
+    return max(block, -(-n // block) * block)
+
+
+class MarketStore:
+    def __init__(self, root: str = STORE_DIR):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+        self.meta = _load_json(self._path("meta.json"), {"n_days": 0, "cap_days": 0, "cap_symbols": 0})
+        self.dates = _load_json(self._path("dates.json"), [])
+        self.symbols = _load_json(self._path("symbols.json"), [])
+        self.code_index = {s["code"]: i for i, s in enumerate(self.symbols)}
+        self._views = {}
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.root, name)
+
+    @property
+    def n_days(self) -> int:
+        return self.meta["n_days"]
+
+    @property
+    def n_symbols(self) -> int:
+        return len(self.symbols)
+
+    @property
+    def codes(self) -> list:
+        return [s["code"] for s in self.symbols]
+
+    def _memmap(self, field: str, mode: str = "r"):
+        return np.memmap(self._path(f"{field}.bin"), dtype=FIELDS[field], mode=mode,
+                         shape=(self.meta["cap_days"], self.meta["cap_symbols"]))
+
+    def field(self, name: str):
+        """只读视图，形状 (n_days, n_symbols)；缺失值为 NaN"""
+        if name not in FIELDS:
+            raise KeyError(f"unknown field: {name}")
+        if self.n_days == 0:
+            return np.empty((0, self.n_symbols), dtype=FIELDS[name])
+        if name not in self._views:
+            self._views[name] = self._memmap(name)
+        return self._views[name][:self.n_days, :self.n_symbols]
+
+    def series(self, name: str, code: str):
+        return self.field(name)[:, self.code_index[code]]
+
+    def _ensure_capacity(self, n_days: int, n_symbols: int) -> None:
+        cap_days, cap_symbols = self.meta["cap_days"], self.meta["cap_symbols"]
+        new_days = cap_days if n_days <= cap_days else _round_up(n_days, DAY_BLOCK)
+        new_symbols = cap_symbols if n_symbols <= cap_symbols else _round_up(n_symbols + SYMBOL_BLOCK // 2,
+                                                                              SYMBOL_BLOCK)
+        if (new_days, new_symbols) == (cap_days, cap_symbols):
+            return
+        self._views.clear()
+        for field, dtype in FIELDS.items():
+            path = self._path(f"{field}.bin")
+            if new_symbols == cap_symbols and os.path.exists(path):
+                # 行优先布局：只增加天数时直接在文件尾部扩展
+                old_bytes = cap_days * cap_symbols * np.dtype(dtype).itemsize
+                with open(path, "r+b") as f:
+                    f.truncate(new_days * new_symbols * np.dtype(dtype).itemsize)
+                np.memmap(path, dtype=dtype, mode="r+", offset=old_bytes,
+                          shape=(new_days - cap_days, new_symbols))[:] = np.nan
+                continue
+            # 股票数超出容量（少见）：按新列数重排
+            tmp = f"{path}.tmp"
+            grown = np.memmap(tmp, dtype=dtype, mode="w+", shape=(new_days, new_symbols))
+            grown[:] = np.nan
+            if cap_days and os.path.exists(path):
+                grown[:cap_days, :cap_symbols] = np.memmap(path, dtype=dtype, mode="r",
+                                                           shape=(cap_days, cap_symbols))
+            grown.flush()
+            del grown
+            os.replace(tmp, path)
+        self.meta.update(cap_days=new_days, cap_symbols=new_symbols)
+        _dump_json(self._path("meta.json"), self.meta)
+
+    def _shift_rows(self, start: int, step: int) -> None:
+        """把 start 起到末尾的各行整体移动 step 行（插入为 +1，删除为 -1）"""
+        n = self.n_days
+        for field in FIELDS:
+            mm = self._memmap(field, "r+")
+            mm[start + step:n + step] = mm[start:n]
+            if step < 0:
+                mm[n + step:n] = np.nan
+            mm.flush()
+            del mm
+
+    def append_day(self, day: str, codes: list, names: list, values: dict) -> int:
+        """写入一个交易日：values 为 {field: 与 codes 对齐的数组}；已存在的日期覆盖该行，
+        早于最后一天的新日期插入到对应位置（回填）。返回行号"""
+        insert = day not in self.dates and bool(self.dates) and day < self.dates[-1]
+        row = self.dates.index(day) if day in self.dates else bisect_left(self.dates, day)
+
+        for code, name in zip(codes, names):
+            if code not in self.code_index:
+                self.code_index[code] = len(self.symbols)
+                self.symbols.append({"code": code, "name": name})
+            elif name:
+                self.symbols[self.code_index[code]]["name"] = name
+        self._ensure_capacity(self.n_days + (day not in self.dates), len(self.symbols))
+        self._views.clear()
+        if insert:
+            self._shift_rows(row, 1)
+
+        cols = np.fromiter((self.code_index[c] for c in codes), dtype=np.int64, count=len(codes))
+        for field in FIELDS:
+            mm = self._memmap(field, "r+")
+            line = np.full(self.meta["cap_symbols"], np.nan, dtype=FIELDS[field])
+            if field in values:
+                line[cols] = np.asarray(values[field], dtype=FIELDS[field])
+            mm[row] = line
+            mm.flush()
+            del mm
+
+        # 数据写完后再更新元数据，中途失败时读者看不到半行
+        if day not in self.dates:
+            self.dates.insert(row, day)
+            self.meta["n_days"] += 1
+        _dump_json(self._path("symbols.json"), self.symbols)
+        _dump_json(self._path("dates.json"), self.dates)
+        _dump_json(self._path("meta.json"), self.meta)
+        return row
+
+    def remove_days(self, days: list) -> int:
+        """删除若干交易日的行（如误写入的休市日），返回删除行数"""
+        removed = 0
+        self._views.clear()
+        for day in sorted(set(days) & set(self.dates), reverse=True):
+            row = self.dates.index(day)
+            self._shift_rows(row + 1, -1)
+            del self.dates[row]
+            self.meta["n_days"] -= 1
+            removed += 1
+        if removed:
+            _dump_json(self._path("dates.json"), self.dates)
+            _dump_json(self._path("meta.json"), self.meta)
+        return removed
+
+    def is_repeat(self, codes: list, values: dict) -> bool:
+        """快照的成交量 / 成交额与库中最后一天完全相同（休市日接口返回的是上一交易日的数据）"""
+        if not self.n_days:
+            return False
+        pos = [(i, self.code_index[c]) for i, c in enumerate(codes) if c in self.code_index]
+        if not pos:
+            return False
+        src, cols = (np.array(x) for x in zip(*pos))
+        compared = False
+        for field in ("volume", "amount"):
+            if field not in values:
+                continue
+            new = np.asarray(values[field], dtype=FIELDS[field])[src]
+            last = self.field(field)[-1, cols]
+            ok = ~np.isnan(new) & ~np.isnan(last)
+            if not ok.any() or not np.array_equal(new[ok], last[ok]):
+                return False
+            compared = True
+        return compared
+
+    def info(self) -> str:
+        size = sum(os.path.getsize(self._path(f"{f}.bin")) for f in FIELDS
+                   if os.path.exists(self._path(f"{f}.bin")))
+        span = f"{self.dates[0]} ~ {self.dates[-1]}" if self.dates else "-"
+        return (f"{self.root}: {self.n_days} 个交易日（{span}），{self.n_symbols} 只股票，"
+                f"{len(FIELDS)} 个字段，{size / 1e6:.1f}MB")
+
+
+def _numeric(df, column: str):
+    import pandas as pd
+
+    if column not in df.columns:
+        return None
+    return pd.to_numeric(df[column], errors="coerce").to_numpy(dtype="f8")
+
+
+def frames_to_values(spot, flow=None) -> tuple:
+    """东方财富快照 / 资金流 DataFrame → (codes, names, {field: array})"""
+    codes = spot["代码"].astype(str).tolist()
+    names = spot["名称"].astype(str).tolist() if "名称" in spot.columns else [""] * len(codes)
+    values = {}
+    for field, (column, _) in SPOT_FIELDS.items():
+        arr = _numeric(spot, column)
+        if arr is not None:
+            values[field] = arr
+    if flow is not None and len(flow):
+        pos = {c: i for i, c in enumerate(codes)}
+        idx = np.array([pos.get(str(c), -1) for c in flow["代码"]])
+        ok = idx >= 0
+        for field, (column, _) in FLOW_FIELDS.items():
+            arr = _numeric(flow, column)
+            if arr is not None:
+                line = np.full(len(codes), np.nan)
+                line[idx[ok]] = arr[ok]
+                values[field] = line
+    return codes, names, values
+
+
+def missing_days(store: MarketStore, calendar: set, start: str = None, end: str = None) -> list:
+    """[start, end] 内日历上有、库里没有的交易日（默认为库中首尾之间）"""
+    if not calendar or not store.dates:
+        return []
+    start, end = start or store.dates[0], end or store.dates[-1]
+    have = set(store.dates)
+    return sorted(d for d in calendar if start <= d <= end and d not in have)
+
+
+def _skip_reason(store: MarketStore, day: str, force: bool, calendar: set) -> str:
+    if day is None:
+        return "盘中快照不是完整日线，跳过写入"
+    if not is_trading_day(date.fromisoformat(day), calendar):
+        return f"{day} 不是交易日，跳过写入"
+    if day in store.dates and not force:
+        return f"{day} 已在库中，跳过"
+    return ""
+
+
+def append_snapshot(store: MarketStore, spot, flow=None, day: str = None, force: bool = False,
+                    calendar: set = None) -> str:
+    """把全市场快照写成 day 的日线；休市日、与上一交易日完全相同的快照不写入"""
+    calendar = trade_calendar(store.root) if calendar is None else calendar
+    day = day or bar_date(calendar=calendar)
+    skip = _skip_reason(store, day, force, calendar)
+    if skip:
+        return skip
+    codes, names, values = frames_to_values(spot, flow)
+    if day not in store.dates and store.dates and day > store.dates[-1] and store.is_repeat(codes, values):
+        return f"{day} 的快照与 {store.dates[-1]} 完全相同（休市或数据未更新），跳过写入"
+    prev = store.dates[-1] if store.dates else None
+    row = store.append_day(day, codes, names, values)
+    msg = f"{day} 已写入第 {row} 行（{len(codes)} 只股票，{len(values)} 个字段）"
+    gap = missing_days(store, calendar, prev, day) if prev else []
+    if gap:
+        msg += f"；缺少 {len(gap)} 个交易日（{gap[0]} ~ {gap[-1]}），可运行 market_store.py backfill 补回"
+    return msg
+
+
+def update(store: MarketStore = None, day: str = None, force: bool = False) -> str:
+    """拉取并追加最新交易日，返回结果说明（已存在 / 盘中 / 休市时跳过）"""
+    import akshare as ak
+
+    store = store or MarketStore()
+    calendar = trade_calendar(store.root)
+    day = day or bar_date(calendar=calendar)
+    skip = _skip_reason(store, day, force, calendar)
+    if skip:
+        return skip
+    spot = ak.stock_zh_a_spot_em()
+    try:
+        flow = ak.stock_individual_fund_flow_rank(indicator="今日")
+    except Exception as e:
+        print(f"Warning: 个股资金流获取失败，仅写入行情: {e}", file=sys.stderr)
+        flow = None
+    return append_snapshot(store, spot, flow, day, force, calendar)
+
+
+def _history(code: str, start: str, end: str):
+    import akshare as ak
+
+    try:
+        return ak.stock_zh_a_hist(symbol=code, period="daily", start_date=start.replace("-", ""),
+                                  end_date=end.replace("-", ""), adjust="")
+    except Exception as e:
+        print(f"Warning: {code} 日线获取失败: {e}", file=sys.stderr)
+        return None
+
+
+def backfill(store: MarketStore = None, start: str = None, end: str = None,
+             workers: int = BACKFILL_WORKERS) -> str:
+    """从个股日线历史补回缺失的交易日（每只股票一次请求）"""
+    import pandas as pd
+
+    store = store or MarketStore()
+    calendar = trade_calendar(store.root)
+    if not calendar:
+        return "没有交易日历，无法判断缺失的交易日"
+    days = missing_days(store, calendar, start, end)
+    if not days:
+        return "没有缺失的交易日"
+    codes = store.codes
+    row_of = {d: i for i, d in enumerate(days)}
+    values = {f: np.full((len(days), len(codes)), np.nan) for f in [*HIST_FIELDS, "pre_close"]}
+    failed = 0
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for col, frame in enumerate(pool.map(lambda c: _history(c, days[0], days[-1]), codes)):
+            if frame is None or not len(frame):
+                failed += frame is None
+                continue
+            rows = np.array([row_of.get(str(d)[:10], -1) for d in frame["日期"]])
+            ok = rows >= 0
+            for field, column in HIST_FIELDS.items():
+                if column in frame.columns:
+                    values[field][rows[ok], col] = pd.to_numeric(frame[column], errors="coerce").to_numpy()[ok]
+            if "涨跌额" in frame.columns:
+                change = pd.to_numeric(frame["涨跌额"], errors="coerce").to_numpy()[ok]
+                values["pre_close"][rows[ok], col] = values["close"][rows[ok], col] - change
+
+    written = []
+    for i, day in enumerate(days):
+        if np.isnan(values["close"][i]).all():
+            continue
+        store.append_day(day, codes, [""] * len(codes), {f: v[i] for f, v in values.items()})
+        written.append(day)
+    msg = f"回填 {len(written)} / {len(days)} 个交易日"
+    if failed:
+        msg += f"，{failed} 只股票获取失败"
+    return msg
+
+
+def prune(store: MarketStore = None) -> str:
+    """删除库中不在交易日历上的日期（此前误写入的休市日）"""
+    store = store or MarketStore()
+    calendar = trade_calendar(store.root)
+    if not calendar:
+        return "没有交易日历，无法判断休市日"
+    bad = [d for d in store.dates if d not in calendar]
+    store.remove_days(bad)
+    return f"删除 {len(bad)} 个休市日: {', '.join(bad)}" if bad else "库中没有休市日"
+
+
+def load_sectors(store: MarketStore = None) -> dict:
+    store = store or MarketStore()
+    return _load_json(store._path("sectors.json"), {}).get("industry", {})
+
+
+def update_sectors(store: MarketStore = None) -> str:
+    """刷新行业板块成分（约 90 个板块各一次请求，建议每周运行）"""
+    import akshare as ak
+
+    store = store or MarketStore()
+    mapping = {}
+    failed = 0
+    for name in ak.stock_board_industry_name_em()["板块名称"].astype(str):
+        try:
+            cons = ak.stock_board_industry_cons_em(symbol=name)
+        except Exception as e:
+            print(f"Warning: {name} 成分获取失败: {e}", file=sys.stderr)
+            failed += 1
+            continue
+        for code in cons["代码"].astype(str):
+            mapping[code] = name
+    _dump_json(store._path("sectors.json"), {"updated": datetime.now().date().isoformat(), "industry": mapping})
+    return f"{len(set(mapping.values()))} 个行业板块，{len(mapping)} 只股票" + (f"，{failed} 个失败" if failed else "")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="A股本地列式行情库")
+    parser.add_argument("--root", default=STORE_DIR)
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("update", help="追加最新交易日")
+    p.add_argument("--day", help="日线日期 YYYY-MM-DD（默认按当前时间推断）")
+    p.add_argument("--force", action="store_true", help="覆盖已存在的日期")
+    p = sub.add_parser("backfill", help="从日线历史补回缺失的交易日")
+    p.add_argument("--start", help="起始日期（默认库中第一天）")
+    p.add_argument("--end", help="结束日期（默认库中最后一天）")
+    p.add_argument("--workers", type=int, default=BACKFILL_WORKERS)
+    sub.add_parser("prune", help="删除误写入的休市日")
+    sub.add_parser("info")
+    sub.add_parser("sectors", help="刷新行业板块成分")
+    p = sub.add_parser("show", help="查看单只股票最近几天")
+    p.add_argument("code")
+    p.add_argument("--fields", default="close,pct_chg,volume,main_net")
+    p.add_argument("--days", type=int, default=10)
+    args = parser.parse_args()
+
+    store = MarketStore(args.root)
+    if args.command == "update":
+        print(update(store, args.day, args.force))
+    elif args.command == "backfill":
+        print(backfill(store, args.start, args.end, args.workers))
+    elif args.command == "prune":
+        print(prune(store))
+    elif args.command == "sectors":
+        print(update_sectors(store))
+    elif args.command == "info":
+        print(store.info())
+    else:
+        if args.code not in store.code_index:
+            print(f"Error: 库中没有 {args.code}")
+            return 1
+        fields = args.fields.split(",")
+        print("date        " + "".join(f"{f:>16}" for f in fields))
+        for row in range(max(store.n_days - args.days, 0), store.n_days):
+            print(f"{store.dates[row]}  " + "".join(
+                f"{store.field(f)[row, store.code_index[args.code]]:>16.2f}" for f in fields))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+"""
+运行耗时与资源统计
+analyze.py 的每个阶段记录墙钟时间、CPU 时间和结束时的峰值内存；
+替换 requests.Session.send 统计每个数据源（akshare 接口名，否则按主机）的请求数、字节数与耗时。
+每次运行写一份 JSON 报告到 ~/.openclaw/workspace/ashare_data/profiles/，
+--profile 时对各阶段做 cProfile（包括阶段内新起的线程，结束时合并），只保存最慢阶段的 pstats
+
+用法:
+    python3 profiling.py history [--days 14]     # 最近几天各次运行的耗时趋势
+    python3 profiling.py show [report.json]      # 查看某次报告（默认最新）
+"""
+
+import argparse
+import contextlib
+import cProfile
+import glob
+import io
+import json
+import os
+import pstats
+import resource
+import sys
+import threading
+import time
+from datetime import datetime
+from urllib.parse import urlsplit
+
+import akcache
+
+PROFILE_DIR = os.path.expanduser(os.environ.get("ASHARE_PROFILE_DIR", "~/.openclaw/workspace/ashare_data/profiles"))
+PSTATS_TOP = 25
+
+
+def peak_rss_mb() -> float:
+    # Linux 上 ru_maxrss 单位为 KB，macOS 为字节
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+class Profiler:
+    def __init__(self, mode: str, cprofile: bool = False):
+        self.mode = mode
+        self.cprofile = cprofile
+        self.started = datetime.now()
+        self.t0 = time.perf_counter()
+        self.cpu0 = time.process_time()
+        self.stages = []
+        self.sources = {}
+        self.profiles = {}
+        self.lock = threading.Lock()
+        self.patched = None
+
+    def _thread_hook(self, workers: list):
+        """threading.setprofile 的钩子：阶段内新起的线程（fetch 线程池、超时守护线程）各自开一个
+        cProfile，第一次回调时用它替换本钩子"""
+        def hook(frame, event, arg):
+            prof = cProfile.Profile()
+            with self.lock:
+                workers.append((threading.current_thread(), prof))
+            prof.enable()
+        return hook
+
+    @staticmethod
+    def _merge(prof, workers: list, record: dict) -> pstats.Stats:
+        """合并主线程与已结束工作线程的统计；阶段结束时仍在运行的线程数据不完整，只计数"""
+        stats = pstats.Stats(prof)
+        running = [p for thread, p in workers if thread.is_alive()]
+        for thread, p in workers:
+            if not thread.is_alive():
+                stats.add(p)
+        record["threads"] = len(workers) - len(running)
+        if running:
+            record["threads_running"] = len(running)
+        return stats
+
+    @contextlib.contextmanager
+    def stage(self, name: str):
+        record = {"name": name, "ok": False}
+        prof = cProfile.Profile() if self.cprofile else None
+        workers = []
+        wall, cpu = time.perf_counter(), time.process_time()
+        if prof:
+            previous = threading.getprofile()
+            threading.setprofile(self._thread_hook(workers))
+            prof.enable()
+        try:
+            yield record
+            record["ok"] = True
+        finally:
+            if prof:
+                prof.disable()
+                threading.setprofile(previous)
+                self.profiles[name] = self._merge(prof, workers, record)
+            record["wall"] = round(time.perf_counter() - wall, 3)
+            record["cpu"] = round(time.process_time() - cpu, 3)
+            record["peak_rss_mb"] = round(peak_rss_mb(), 1)
+            self.stages.append(record)
+
+    def record_request(self, source: str, sent: int, received: int, seconds: float, status: int) -> None:
+        with self.lock:
+            s = self.sources.setdefault(source, {"requests": 0, "bytes_sent": 0, "bytes": 0,
+                                                  "seconds": 0.0, "errors": 0})
+            s["requests"] += 1
+            s["bytes_sent"] += sent
+            s["bytes"] += received
+            s["seconds"] += seconds
+            if status == 0 or status >= 400:
+                s["errors"] += 1
+
+    def patch_requests(self) -> bool:
+        """包装 requests.Session.send；akshare 未安装 requests 时返回 False"""
+        try:
+            import requests
+        except ImportError:
+            return False
+        original = requests.Session.send
+        profiler = self
+
+        def send(session, request, **kwargs):
+            source = akcache.current_call() or urlsplit(request.url).netloc
+            body = request.body or b""
+            start = time.perf_counter()
+            try:
+                resp = original(session, request, **kwargs)
+            except Exception:
+                profiler.record_request(source, len(body), 0, time.perf_counter() - start, 0)
+                raise
+            if kwargs.get("stream"):
+                received = int(resp.headers.get("Content-Length") or 0)
+            else:
+                received = len(resp.content)
+            profiler.record_request(source, len(body), received, time.perf_counter() - start, resp.status_code)
+            return resp
+
+        requests.Session.send = send
+        self.patched = (requests.Session, original)
+        return True
+
+    def unpatch(self) -> None:
+        if self.patched:
+            cls, original = self.patched
+            cls.send = original
+            self.patched = None
+
+    def report(self, exit_code: int = 0) -> dict:
+        return {
+            "mode": self.mode,
+            "started": self.started.isoformat(timespec="seconds"),
+            "exit_code": exit_code,
+            "wall": round(time.perf_counter() - self.t0, 3),
+            "cpu": round(time.process_time() - self.cpu0, 3),
+            "peak_rss_mb": round(peak_rss_mb(), 1),
+            "stages": self.stages,
+            "sources": {k: {**v, "seconds": round(v["seconds"], 3)} for k, v in self.sources.items()},
+        }
+
+    def dump_slowest(self, prefix: str) -> str:
+        """保存最慢阶段的 pstats，返回文件路径（未开启 --profile 时为空）"""
+        if not self.profiles:
+            return ""
+        slowest = max((s for s in self.stages if s["name"] in self.profiles), key=lambda s: s["wall"])
+        path = f"{prefix}.{slowest['name']}.pstats"
+        self.profiles[slowest["name"]].dump_stats(path)
+        return path
+
+    def save(self, exit_code: int = 0, root: str = PROFILE_DIR) -> tuple:
+        """写 JSON 报告（及 pstats），返回 (报告路径, 报告内容)"""
+        os.makedirs(root, exist_ok=True)
+        prefix = os.path.join(root, f"{self.started.strftime('%Y%m%d-%H%M%S')}-{self.mode}")
+        data = self.report(exit_code)
+        data["pstats"] = self.dump_slowest(prefix)
+        with open(f"{prefix}.json", "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        return f"{prefix}.json", data
+
+
+_current = None
+
+
+def start(mode: str, cprofile: bool = False) -> Profiler:
+    global _current
+    _current = Profiler(mode, cprofile)
+    _current.patch_requests()
+    return _current
+
+
+def stop() -> None:
+    global _current
+    if _current is not None:
+        _current.unpatch()
+    _current = None
+
+
+def stage(name: str):
+    """当前运行的阶段计时；未启用统计时为空上下文"""
+    return _current.stage(name) if _current is not None else contextlib.nullcontext({})
+
+
+def format_report(data: dict) -> str:
+    lines = [f"profile {data['mode']}: 墙钟 {data['wall']:.1f}s，CPU {data['cpu']:.1f}s，"
+             f"峰值内存 {data['peak_rss_mb']:.0f}MB"]
+    for s in data["stages"]:
+        state = "" if s["ok"] else "  失败"
+        lines.append(f"  {s['name']:<10} {s['wall']:7.2f}s  cpu {s['cpu']:6.2f}s  rss {s['peak_rss_mb']:6.0f}MB{state}")
+    for name, s in sorted(data["sources"].items(), key=lambda x: -x[1]["seconds"]):
+        errors = f"，失败 {s['errors']}" if s["errors"] else ""
+        lines.append(f"  [{name}] {s['requests']} 次请求，{s['bytes'] / 1024:.0f}KB，{s['seconds']:.1f}s{errors}")
+    if data.get("pstats"):
+        lines.append(f"  pstats: {data['pstats']}")
+        threads = [f"{s['name']} {s['threads']} 个" + (f"（另有 {s['threads_running']} 个阶段结束时仍在运行，未计入）"
+                                                       if s.get("threads_running") else "")
+                   for s in data["stages"] if s.get("threads") or s.get("threads_running")]
+        lines.append("  工作线程: " + ("，".join(threads) if threads else "无")
+                     + "；阶段开始前已存在的线程不在统计内")
+    return "\n".join(lines)
+
+
+def format_pstats(path: str, top: int = PSTATS_TOP) -> str:
+    out = io.StringIO()
+    pstats.Stats(path, stream=out).sort_stats("cumulative").print_stats(top)
+    return out.getvalue()
+
+
+def load_reports(root: str = PROFILE_DIR, limit: int = 0) -> list:
+    reports = []
+    for path in sorted(glob.glob(os.path.join(root, "*.json"))):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                reports.append(json.load(f))
+        except (OSError, ValueError):
+            continue
+    return reports[-limit:] if limit else reports
+
+
+def format_history(reports: list) -> str:
+    """每次运行一行，列出各阶段耗时；最后一行与前几次的中位数比较"""
+    if not reports:
+        return "没有运行记录"
+    names = []
+    for r in reports:
+        for s in r["stages"]:
+            if s["name"] not in names:
+                names.append(s["name"])
+    lines = ["started              mode      total  " + "".join(f"{n:>9}" for n in names) + "   rss"]
+    for r in reports:
+        per = {s["name"]: s["wall"] for s in r["stages"]}
+        cells = "".join(f"{per[n]:9.1f}" if n in per else f"{'-':>9}" for n in names)
+        flag = "" if r["exit_code"] == 0 else "  ✗"
+        lines.append(f"{r['started']:<20} {r['mode']:<8} {r['wall']:6.1f}  {cells} {r['peak_rss_mb']:5.0f}{flag}")
+
+    last, earlier = reports[-1], [r for r in reports[:-1] if r["mode"] == reports[-1]["mode"]]
+    if earlier:
+        def median(values):
+            values = sorted(values)
+            return values[len(values) // 2] if values else None
+
+        notes = []
+        for s in last["stages"]:
+            base = median([x["wall"] for r in earlier for x in r["stages"] if x["name"] == s["name"]])
+            if base and s["wall"] > base * 1.5 and s["wall"] - base > 1:
+                notes.append(f"{s['name']} {s['wall']:.1f}s（中位数 {base:.1f}s）")
+        if notes:
+            lines.append("最近一次明显变慢: " + "，".join(notes))
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="A股分析运行耗时报告")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("history", help="最近几天各次运行的耗时趋势")
+    p.add_argument("--days", type=int, default=14, help="最近几天")
+    p.add_argument("--mode", help="只看某个模式")
+    p = sub.add_parser("show", help="查看某次报告")
+    p.add_argument("report", nargs="?")
+    args = parser.parse_args()
+
+    if args.command == "history":
+        reports = load_reports()
+        if args.mode:
+            reports = [r for r in reports if r["mode"] == args.mode]
+        days = sorted({r["started"][:10] for r in reports})[-args.days:]
+        print(format_history([r for r in reports if r["started"][:10] in days]))
+        return 0
+    path = args.report or (sorted(glob.glob(os.path.join(PROFILE_DIR, "*.json"))) or [""])[-1]
+    if not path:
+        print("没有运行记录")
+        return 1
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    print(format_report(data))
+    if data.get("pstats") and os.path.exists(data["pstats"]):
+        print(format_pstats(data["pstats"]))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+综合推荐排序规则
+规则全部写成 (交易日 × 股票) 数组上的向量运算：盘后排序只取最后一行，
+回测直接在整段历史上一次算完，两边共用同一套规则
+
+维度（对应 SKILL.md 的研报 / 资金 / 技术面 / 情绪面）:
+    资金  主力净流入占成交额比例
+    研报  当日机构评级覆盖（只有最新一天有数据）
+    趋势  收盘 > MA5 > MA10 > MA20
+    放量  量比处于温和放量区间
+    情绪  涨停或连板
+"""
+
+import numpy as np
+
+WEIGHTS = {"资金": 0.35, "研报": 0.25, "趋势": 0.2, "放量": 0.1, "情绪": 0.1}
+MAIN_RATIO_MIN = 0.05
+VOLUME_RATIO_RANGE = (1.5, 5.0)
+# 至少同时满足这几个维度中的两个才算“多维验证”
+CORE_RULES = ("资金", "研报", "趋势")
+# SKILL.md 综合推荐的“三维验证”：研报 + 情绪 + 资金同时满足
+THREE_WAY = ("研报", "情绪", "资金")
+
+
+def signals(data: dict, ind: dict, research=None) -> dict:
+    """各规则的布尔矩阵；research 为 (N,) 布尔向量，按最新一天广播"""
+    close = np.asarray(data["close"], dtype="f8")
+    with np.errstate(divide="ignore", invalid="ignore"):
+        main_ratio = np.asarray(data["main_net"], dtype="f8") / np.asarray(data["amount"], dtype="f8")
+        lo, hi = VOLUME_RATIO_RANGE
+        sig = {
+            "资金": main_ratio >= MAIN_RATIO_MIN,
+            "趋势": (close > ind["ma5"]) & (ind["ma5"] > ind["ma10"]) & (ind["ma10"] > ind["ma20"]),
+            "放量": (ind["volume_ratio"] >= lo) & (ind["volume_ratio"] <= hi),
+            "情绪": ind["up_streak"] >= 1,
+        }
+    sig["研报"] = np.zeros(close.shape, dtype=bool)
+    if research is not None:
+        sig["研报"][-1] = research
+    return sig
+
+
+def tradable(data: dict, names: list = None):
+    """可参与排序：未停牌、非 ST"""
+    ok = ~np.isnan(np.asarray(data["close"], dtype="f8"))
+    if names is not None:
+        st = np.char.find(np.char.upper(np.asarray(names, dtype="U16")), "ST") >= 0
+        ok &= ~st
+    return ok
+
+
+def score(sig: dict, ok, weights: dict = None):
+    """加权得分矩阵，不可交易的位置为 -inf"""
+    weights = weights or WEIGHTS
+    total = np.zeros(ok.shape)
+    for name, w in weights.items():
+        if name in sig:
+            total += w * sig[name]
+    return np.where(ok, total, -np.inf)
+
+
+def validated(sig: dict, min_rules: int = 2, rules: tuple = CORE_RULES):
+    return sum(sig[name].astype(np.int8) for name in rules) >= min_rules
+
+
+def three_way(sig: dict, rules: tuple = THREE_WAY):
+    """rules 中的维度同时满足；回测缺研报历史时由调用方传入去掉研报后的维度并注明口径"""
+    return np.logical_and.reduce([sig[name] for name in rules])
+
+
+def top_k(row, k: int):
+    """单行得分的前 k 个下标（argpartition 后只对 k 个排序）"""
+    k = min(k, int(np.isfinite(row).sum()))
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    part = np.argpartition(-row, k - 1)[:k]
+    return part[np.argsort(-row[part], kind="stable")]
+
+
+def research_mask(codes: list, frame) -> np.ndarray:
+    """机构评级 DataFrame → 与 codes 对齐的布尔向量"""
+    mask = np.zeros(len(codes), dtype=bool)
+    if frame is None:
+        return mask
+    column = next((c for c in ("股票代码", "代码") if c in getattr(frame, "columns", ())), None)
+    if column is None:
+        return mask
+    rated = set(frame[column].astype(str))
+    mask[[i for i, c in enumerate(codes) if c in rated]] = True
+    return mask
+
+
+def rank_stocks(data: dict, ind: dict, codes: list, names: list, research=None, k: int = 20,
+                sectors: dict = None) -> list:
+    sig = signals(data, ind, research)
+    ok = tradable(data, names)
+    s = score(sig, ok)
+    multi = validated(sig)
+    picks = []
+    for i in top_k(s[-1], k):
+        if s[-1, i] <= 0:
+            break
+        picks.append({
+            "code": codes[i],
+            "name": names[i],
+            "sector": (sectors or {}).get(codes[i], ""),
+            "score": round(float(s[-1, i]), 3),
+            "rules": [name for name in WEIGHTS if sig[name][-1, i]],
+            "validated": bool(multi[-1, i]),
+            "close": float(data["close"][-1, i]),
+            "pct_chg": float(data["pct_chg"][-1, i]),
+            "main_net": float(data["main_net"][-1, i]),
+            "streak": int(ind["up_streak"][-1, i]),
+        })
+    return picks
+
+
+def rank_sectors(stats: list, k: int = 10) -> list:
+    """按主力净流入与平均涨幅两个名次之和排序"""
+    if not stats:
+        return []
+    flow = np.array([s["main_net"] for s in stats])
+    pct = np.array([s["avg_pct"] for s in stats])
+    combined = np.argsort(np.argsort(-flow)) + np.argsort(np.argsort(-pct))
+    return [stats[i] for i in np.argsort(combined, kind="stable")[:k]]
@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+"""
+观察清单渲染
+把 rank 阶段的结构化结果（涨跌统计、板块排名、推荐股）填进 templates/A股观察清单模板.md，
+同时输出 Markdown 与 JSON，不经过模型。
+
+模板只解析一次：按行识别可填的位置（核心结论各条的 → 之后、各条线的 [方向] 与
+标的/逻辑/风险、今日策略各项），编译成“字面量 + 槽位”列表并记下槽位下标，按模板
+mtime 缓存；渲染只是替换槽位后 join。
+流水线里由 stages.py 的 render 阶段调用，rank 结果、模板、本文件都没变时直接复用检查点
+
+用法:
+    python3 render.py [--input rank.json] [--out 清单.md] [--json 清单.json]
+    python3 render.py --bench
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+import time
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+TEMPLATE = os.environ.get("ASHARE_TEMPLATE",
+                          os.path.join(SCRIPT_DIR, "..", "templates", "A股观察清单模板.md"))
+LINES = 4
+
+CONCLUSION_RE = re.compile(r"^(\d+\. \*\*(.+?)\*\* → )(.*)$")
+LINE_HEAD_RE = re.compile(r"^(### (\d+)\) )(\[.*\])$")
+FIELD_RE = re.compile(r"^(- \*\*(.+?)\*\*: ?)(.*)$")
+
+
+class CompiledTemplate:
+    """字面量与槽位交替的片段列表；slots 记录每个槽位在列表中的下标"""
+
+    def __init__(self, text: str):
+        self.parts = []
+        self.slots = {}
+        self._slot_pos = set()
+        scope = ""
+        for line in text.splitlines():
+            if line.startswith("## "):
+                scope = "strategy" if line.startswith("## 四") else ""
+            if line.startswith("# ") and not self.parts:
+                self._slot("title", line)
+            elif m := CONCLUSION_RE.match(line):
+                self._literal(m.group(1))
+                self._slot(f"conclusion.{m.group(2)}", m.group(3))
+            elif m := LINE_HEAD_RE.match(line):
+                scope = f"line{m.group(2)}"
+                self._literal(m.group(1))
+                self._slot(f"{scope}.name", m.group(3))
+            elif scope and (m := FIELD_RE.match(line)):
+                self._literal(m.group(1))
+                self._slot(f"{scope}.{m.group(2)}", m.group(3))
+            else:
+                self._literal(line)
+            self._literal("\n")
+
+    def _literal(self, text: str) -> None:
+        # 相邻字面量合并，渲染时 join 的片段数只比槽位数多一倍左右
+        if self.parts and len(self.parts) - 1 not in self._slot_pos:
+            self.parts[-1] += text
+        else:
+            self.parts.append(text)
+
+    def _slot(self, key: str, default: str) -> None:
+        self.slots[key] = len(self.parts)
+        self._slot_pos.add(len(self.parts))
+        self.parts.append(default)
+
+    def render(self, values: dict) -> str:
+        """values 中的值为字符串，或接收模板原文返回字符串的函数；缺少的槽位保留模板原文"""
+        out = self.parts[:]
+        for key, i in self.slots.items():
+            value = values.get(key)
+            if callable(value):
+                value = value(out[i])
+            if value:
+                out[i] = value
+        return "".join(out)
+
+
+_compiled = {}
+
+
+def load_template(path: str = TEMPLATE) -> CompiledTemplate:
+    """按 (路径, mtime, 大小) 缓存编译结果，模板被修改后自动重新编译"""
+    st = os.stat(path)
+    key = (os.path.abspath(path), st.st_mtime_ns, st.st_size)
+    if key not in _compiled:
+        with open(path, "r", encoding="utf-8") as f:
+            _compiled[key] = CompiledTemplate(f.read())
+    return _compiled[key]
+
+
+def _yi(value: float) -> str:
+    return f"{value / 1e8:+.2f} 亿"
+
+
+def _is_growth(code: str) -> bool:
+    return code.startswith(("300", "301", "688", "689"))
+
+
+def position_advice(market: dict) -> tuple:
+    """按上涨家数占比与跌停数给出仓位区间"""
+    total = market["rising"] + market["falling"]
+    breadth = market["rising"] / total if total else 0.5
+    if breadth >= 0.6:
+        advice = "6-8 成"
+    elif breadth >= 0.4:
+        advice = "4-6 成"
+    else:
+        advice = "2-3 成"
+    if market["limit_down"] >= 20 and not advice.startswith("2"):
+        advice = "3 成以内"
+    return breadth, advice
+
+
+def sector_risk(s: dict) -> str:
+    risks = []
+    if s["avg_pct"] >= 5:
+        risks.append("短期涨幅较大，注意分歧回落")
+    if s["main_net"] < 0:
+        risks.append("主力资金净流出，涨势持续性存疑")
+    if s["limit_up"] >= 3:
+        risks.append("板块情绪高位，谨防炸板")
+    if s.get("up_ratio", 1) < 0.5:
+        risks.append("板块内部分化，只做最强个股")
+    return "；".join(risks) or "板块轮动较快，盯量能是否持续"
+
+
+def build_context(r: dict) -> dict:
+    """rank 结果 → 槽位值与结构化 JSON"""
+    m = r["market"]
+    stocks, sectors = r["stocks"], r["sectors"]
+    breadth, advice = position_advice(m)
+    mood = "普涨偏多" if breadth >= 0.6 else "分化震荡" if breadth >= 0.4 else "普跌偏空"
+
+    lines = []
+    for s in sectors[:LINES]:
+        picks = [x for x in stocks if x.get("sector") == s["sector"]][:3]
+        lines.append({
+            "name": s["sector"],
+            "标的": "、".join(f"{x['name']}({x['code']})" for x in picks) or "暂无入选个股，观察板块龙头",
+            "逻辑": f"主力净流入 {_yi(s['main_net'])}，平均涨幅 {s['avg_pct']:+.2f}%，"
+                    f"涨停 {s['limit_up']} 家，上涨占比 {s.get('up_ratio', 0) * 100:.0f}%",
+            "风险": sector_risk(s),
+        })
+    if not lines:
+        # 没有板块数据时按个股给出
+        for x in stocks[:LINES]:
+            lines.append({
+                "name": f"{x['name']}({x['code']})",
+                "标的": f"{x['name']}({x['code']})",
+                "逻辑": f"{'+'.join(x['rules'])}，涨幅 {x['pct_chg']:+.2f}%，主力 {_yi(x['main_net'])}",
+                "风险": "连板高位，谨防分歧" if x["streak"] >= 2 else "单票逻辑，控制仓位",
+            })
+
+    growth = sum(_is_growth(x["code"]) for x in stocks)
+    style = "科技成长（创业板/科创板）占优" if stocks and growth * 2 >= len(stocks) else "主板价值/周期占优"
+    top_sector = sectors[0]["sector"] if sectors else (lines[0]["name"] if lines else "")
+    validated = [x for x in stocks if x["validated"]]
+    risks = []
+    if m["limit_down"] >= 10:
+        risks.append(f"跌停 {m['limit_down']} 家，亏钱效应明显")
+    if m["broken"] > m["limit_up"] / 2 and m["broken"] >= 5:
+        risks.append(f"炸板 {m['broken']} 家，追高资金承接不足")
+    if r.get("errors"):
+        risks.append(f"数据源缺失（{', '.join(r['errors'])}），结论需人工复核")
+    if not risks:
+        risks.append("情绪高位时追涨回撤风险" if m["max_streak"] >= 4 else "量能不足时的冲高回落")
+
+    context = {
+        "date": r["date"],
+        "conclusions": {
+            "流动性/政策": f"{mood}：上涨 {m['rising']} / 下跌 {m['falling']}，"
+                         f"涨停 {m['limit_up']}，跌停 {m['limit_down']}",
+            "产业景气": "资金与涨幅综合靠前：" + "、".join(s["sector"] for s in sectors[:3]) if sectors
+                     else "板块数据缺失，见个股推荐",
+            "海外扰动": "规则数据不含外盘，盘前核对隔夜美股、汇率与大宗商品",
+            "风格判断": f"{style}，最高 {m['max_streak']} 连板",
+        },
+        "lines": lines,
+        "strategy": {
+            "今日核心观点": f"{mood}，主线看 {top_sector}" if top_sector else mood,
+            "最大看点": top_sector + (f"；多维验证个股 {'、'.join(x['name'] for x in validated[:3])}"
+                                    if validated else ""),
+            "最大风险": "；".join(risks),
+            "策略": "围绕主线低吸分歧，不追连板高位" if breadth >= 0.4 else "控制仓位，只做最强主线的回踩",
+            "仓位建议": advice,
+        },
+    }
+    return context
+
+
+def context_values(ctx: dict) -> dict:
+    values = {"title": lambda line: line.replace("今日", f"{ctx['date']} ").removesuffix("模板")}
+    values.update({f"conclusion.{k}": v for k, v in ctx["conclusions"].items()})
+    for i, line in enumerate(ctx["lines"], 1):
+        values[f"line{i}.name"] = f"[{line['name']}]"
+        values.update({f"line{i}.{k}": line[k] for k in ("标的", "逻辑", "风险")})
+    values.update({f"strategy.{k}": v for k, v in ctx["strategy"].items()})
+    return values
+
+
+def render(result: dict, template: str = TEMPLATE) -> tuple:
+    """返回 (markdown, context)"""
+    ctx = build_context(result)
+    return load_template(template).render(context_values(ctx)), ctx
+
+
+def sample_result() -> dict:
+    sectors = [{"sector": f"行业{i}", "members": 40, "avg_pct": 3.2 - i, "amount": 5e10,
+                "main_net": (9 - i) * 1e8, "limit_up": 4 - i % 4, "up_ratio": 0.7 - i * 0.05} for i in range(10)]
+    stocks = [{"code": f"{300000 + i:06d}" if i % 2 else f"{600000 + i:06d}", "name": f"股票{i}",
+               "sector": f"行业{i % 5}", "score": 0.8 - i * 0.02, "rules": ["资金", "趋势"],
+               "validated": i < 5, "close": 10.0, "pct_chg": 5.0, "main_net": 1e8, "streak": i % 3}
+              for i in range(20)]
+    return {"date": "2025-01-02", "stocks": stocks, "sectors": sectors,
+            "market": {"limit_up": 60, "limit_down": 3, "broken": 12, "max_streak": 5,
+                       "rising": 3200, "falling": 1800}, "errors": {}}
+
+
+def run_bench(iterations: int) -> None:
+    result = sample_result()
+    start = time.perf_counter()
+    _compiled.clear()
+    load_template()
+    compile_ms = (time.perf_counter() - start) * 1000
+    start = time.perf_counter()
+    for _ in range(iterations):
+        render(result)
+    render_ms = (time.perf_counter() - start) * 1000 / iterations
+    slots = len(load_template().slots)
+    print(f"模板编译 {compile_ms:.2f}ms（{slots} 个槽位），单次渲染 {render_ms:.3f}ms（{iterations} 次平均）")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="渲染A股观察清单")
+    parser.add_argument("--input", help="rank 阶段的 rank.json（默认今日检查点）")
+    parser.add_argument("--template", default=TEMPLATE)
+    parser.add_argument("--out", help="Markdown 输出路径（默认打印）")
+    parser.add_argument("--json", help="结构化结果输出路径")
+    parser.add_argument("--bench", action="store_true")
+    parser.add_argument("--iterations", type=int, default=1000)
+    args = parser.parse_args()
+
+    if args.bench:
+        run_bench(args.iterations)
+        return 0
+    path = args.input
+    if not path:
+        import stages
+
+        path = stages.Checkpoints().artifact("rank", "json")
+    if not os.path.exists(path):
+        print(f"Error: 找不到 {path}，先运行 stages.py")
+        return 1
+    with open(path, "r", encoding="utf-8") as f:
+        result = json.load(f)
+    markdown, ctx = render(result, args.template)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(markdown)
+    else:
+        print(markdown, end="")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(ctx, f, ensure_ascii=False, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,320 @@
+#!/usr/bin/env python3
+"""
+分阶段分析流水线：fetch → compute → rank → render
+每个阶段的产物写入 ~/.openclaw/workspace/ashare_data/checkpoints/<交易日>/，
+并记录输入哈希（上游产物哈希 + 本阶段代码 / 模板）。重跑时输入未变的阶段直接跳过，
+--from-stage 强制从某个阶段开始重算，例如只改了模板时 --from-stage render。
+盘中的 fetch 检查点只在同一个 15 分钟时段内复用；行情库只在 fetch 阶段写入，compute 只读。
+--date 指定历史交易日时只用行情库里截至当天的日线，库里没有该日时报错而不是拿实时行情顶替
+
+用法:
+    python3 stages.py [--from-stage rank] [--top 20] [--date 2025-06-03]
+    python3 stages.py status
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import pickle
+import sys
+import time
+from datetime import datetime
+
+import akcache
+import profiling
+
+CHECKPOINT_DIR = os.path.expanduser(os.environ.get("ASHARE_CHECKPOINT_DIR",
+                                                   "~/.openclaw/workspace/ashare_data/checkpoints"))
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+STAGES = ["fetch", "compute", "rank", "render"]
+# 各阶段依赖的代码文件，改动后对应阶段自动失效
+STAGE_CODE = {
+    "fetch": ["fetch.py", "market_store.py"],
+    "compute": ["indicators.py"],
+    "rank": ["rank.py"],
+    "render": ["render.py"],
+}
+HISTORY_DAYS = 80
+TOP_K = 20
+# 盘中 fetch 检查点的有效时长：同一时间段内重跑复用，跨时段重新拉取
+OPEN_BUCKET_MINUTES = 15
+
+
+def digest(*parts) -> str:
+    raw = json.dumps(parts, ensure_ascii=False, sort_keys=True, default=str).encode("utf-8")
+    return hashlib.sha256(raw).hexdigest()[:16]
+
+
+def file_digest(path: str) -> str:
+    h = hashlib.sha256()
+    try:
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                h.update(block)
+    except OSError:
+        return ""
+    return h.hexdigest()[:16]
+
+
+def session(now: datetime = None) -> str:
+    """盘前 / 盘中 / 盘后：同一交易日不同时段的行情不同，fetch 需分别缓存"""
+    now = now or datetime.now()
+    if (now.hour, now.minute) < (9, 15):
+        return "pre"
+    return "post" if now.hour >= 15 else "open"
+
+
+def fetch_key(now: datetime = None) -> str:
+    """fetch 检查点的时段键：盘中按 OPEN_BUCKET_MINUTES 分段，避免复用几小时前的快照"""
+    now = now or datetime.now()
+    name = session(now)
+    if name != "open":
+        return name
+    return f"open-{(now.hour * 60 + now.minute) // OPEN_BUCKET_MINUTES}"
+
+
+def age(finished: str) -> str:
+    minutes = (datetime.now() - datetime.fromisoformat(finished)).total_seconds() / 60
+    return f"{minutes:.0f} 分钟前" if minutes < 120 else f"{minutes / 60:.1f} 小时前"
+
+
+class Checkpoints:
+    """某个交易日的阶段产物与元数据（<stage>.meta.json 记录输入哈希与产物哈希）"""
+
+    def __init__(self, day: str = None, root: str = CHECKPOINT_DIR):
+        self.day = day or akcache.trading_date()
+        self.dir = os.path.join(root, self.day)
+        os.makedirs(self.dir, exist_ok=True)
+
+    def artifact(self, stage: str, ext: str) -> str:
+        return os.path.join(self.dir, f"{stage}.{ext}")
+
+    def meta(self, stage: str) -> dict:
+        try:
+            with open(os.path.join(self.dir, f"{stage}.meta.json"), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def load(self, stage: str, input_hash: str) -> dict:
+        """输入哈希一致且产物完好时返回元数据，否则返回 None"""
+        meta = self.meta(stage)
+        if meta.get("input_hash") != input_hash:
+            return None
+        path = meta.get("artifact", "")
+        if path and file_digest(path) != meta.get("output_hash"):
+            return None
+        return meta
+
+    def save(self, stage: str, input_hash: str, path: str, elapsed: float) -> dict:
+        meta = {
+            "stage": stage,
+            "input_hash": input_hash,
+            "artifact": path,
+            "output_hash": file_digest(path) if path else input_hash,
+            "elapsed": round(elapsed, 3),
+            "finished": datetime.now().isoformat(timespec="seconds"),
+        }
+        tmp = os.path.join(self.dir, f".{stage}.meta.json.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, os.path.join(self.dir, f"{stage}.meta.json"))
+        return meta
+
+    def mark(self, stage: str, input_hash: str, elapsed: float = 0.0) -> dict:
+        """记录没有产物文件的阶段（如 pipeline 的 morning / night）已完成"""
+        return self.save(stage, input_hash, "", elapsed)
+
+    def read(self, stage: str):
+        path = self.meta(stage).get("artifact", "")
+        if path.endswith(".pkl"):
+            with open(path, "rb") as f:
+                return pickle.load(f)
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f) if path.endswith(".json") else f.read()
+
+    def write_pickle(self, stage: str, value) -> str:
+        path = self.artifact(stage, "pkl")
+        with open(f"{path}.tmp", "wb") as f:
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(f"{path}.tmp", path)
+        return path
+
+    def write_text(self, stage: str, ext: str, text: str) -> str:
+        path = self.artifact(stage, ext)
+        with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(f"{path}.tmp", path)
+        return path
+
+
+def is_live(ckpt: Checkpoints) -> bool:
+    return ckpt.day == akcache.trading_date()
+
+
+def stage_fetch(ckpt: Checkpoints) -> str:
+    """拉取各数据源；收盘后 / 开盘前的快照是完整日线，同时写入行情库。
+    历史交易日不拉实时行情，只从行情库取当日日线，库里没有时报错"""
+    import fetch
+    import market_store
+
+    if not is_live(ckpt):
+        if ckpt.day not in market_store.MarketStore().dates:
+            raise RuntimeError(f"行情库没有 {ckpt.day} 的日线，历史日期不使用实时行情"
+                               f"（先运行 market_store.py backfill --start {ckpt.day}）")
+        return ckpt.write_pickle("fetch", {"session": "history", "bar_date": ckpt.day, "data": {},
+                                           "errors": {"research": "历史日期没有当日机构评级"}})
+    results = fetch.fetch_all()
+    print(fetch.format_report(results))
+    data = {name: r["data"] for name, r in results.items() if r["ok"]}
+    errors = {name: r["error"] for name, r in results.items() if not r["ok"]}
+    if "spot" not in data:
+        raise RuntimeError(f"行情快照获取失败: {errors.get('spot', '')}")
+    store = market_store.MarketStore()
+    day = market_store.bar_date(calendar=market_store.trade_calendar(store.root))
+    if day:
+        print(f"行情库: {market_store.append_snapshot(store, data['spot'], data.get('stock_flow'), day)}")
+    return ckpt.write_pickle("fetch", {"session": session(), "bar_date": day, "data": data, "errors": errors})
+
+
+def stage_compute(ckpt: Checkpoints) -> str:
+    """只读：行情库的历史 + 盘中快照（不入库，只在内存里接到历史后面）"""
+    import numpy as np
+
+    import indicators
+    import market_store
+
+    fetched = ckpt.read("fetch")
+    store = market_store.MarketStore()
+    day = fetched.get("bar_date")
+    end = store.dates.index(day) + 1 if day in store.dates else store.n_days
+    data = indicators.load_from_store(store, HISTORY_DAYS, end)
+    codes, names = store.codes, [s["name"] for s in store.symbols]
+    if not day:
+        codes_s, _, values = market_store.frames_to_values(fetched["data"]["spot"],
+                                                           fetched["data"].get("stock_flow"))
+        pos = {c: i for i, c in enumerate(codes_s)}
+        idx = np.array([pos.get(c, -1) for c in codes])
+        for field, arr in data.items():
+            row = np.full(len(codes), np.nan)
+            if field in values:
+                row[idx >= 0] = values[field][idx[idx >= 0]]
+            data[field] = np.vstack([arr, row[None, :]])
+    ind = indicators.compute(data, codes, names)
+    sectors = market_store.load_sectors(store)
+    stats = []
+    if sectors:
+        ids, labels = indicators.group_index(codes, sectors)
+        stats = indicators.sector_stats(indicators.latest(data, ind), ids, labels)
+    return ckpt.write_pickle("compute", {
+        "date": store.dates[end - 1] if day and end else ckpt.day, "codes": codes, "names": names,
+        "data": {k: np.asarray(v) for k, v in data.items()}, "ind": ind, "sectors": stats, "sector_map": sectors,
+        "research": fetched["data"].get("research"), "errors": fetched["errors"],
+    })
+
+
+def stage_rank(ckpt: Checkpoints) -> str:
+    import rank
+
+    c = ckpt.read("compute")
+    research = rank.research_mask(c["codes"], c["research"])
+    day_ind = {k: v[-1] for k, v in c["ind"].items()}
+    result = {
+        "date": c["date"],
+        "stocks": rank.rank_stocks(c["data"], c["ind"], c["codes"], c["names"], research, TOP_K,
+                                   c.get("sector_map")),
+        "sectors": rank.rank_sectors(c["sectors"]),
+        "market": {
+            "limit_up": int(day_ind["limit_up"].sum()),
+            "limit_down": int(day_ind["limit_down"].sum()),
+            "broken": int(day_ind["broken"].sum()),
+            "max_streak": int(day_ind["up_streak"].max()) if len(c["codes"]) else 0,
+            "rising": int((c["data"]["pct_chg"][-1] > 0).sum()),
+            "falling": int((c["data"]["pct_chg"][-1] < 0).sum()),
+        },
+        "errors": c["errors"],
+    }
+    return ckpt.write_text("rank", "json", json.dumps(result, ensure_ascii=False, indent=2))
+
+
+def stage_render(ckpt: Checkpoints) -> str:
+    import render
+
+    markdown, context = render.render(ckpt.read("rank"))
+    ckpt.write_text("render", "json", json.dumps(context, ensure_ascii=False, indent=2))
+    return ckpt.write_text("render", "md", markdown)
+
+
+STAGE_FUNCS = {"fetch": stage_fetch, "compute": stage_compute, "rank": stage_rank, "render": stage_render}
+
+
+def stage_input(stage: str, upstream: str, live: bool = True) -> str:
+    code = [file_digest(os.path.join(SCRIPT_DIR, name)) for name in STAGE_CODE[stage]]
+    extra = {"fetch": [fetch_key() if live else "history"], "rank": [TOP_K]}.get(stage, [])
+    if stage == "render":
+        import render
+
+        extra = [file_digest(render.TEMPLATE)]
+    return digest(stage, upstream, code, extra)
+
+
+def run(from_stage: str = None, day: str = None) -> tuple:
+    """依次执行各阶段，返回 (success, 最终报告路径或错误信息)"""
+    if day and day > akcache.trading_date():
+        return False, f"{day} 晚于当前交易日 {akcache.trading_date()}"
+    ckpt = Checkpoints(day)
+    forced = set(STAGES[STAGES.index(from_stage):]) if from_stage else set()
+    upstream = ""
+    for stage in STAGES:
+        input_hash = stage_input(stage, upstream, is_live(ckpt))
+        meta = None if stage in forced else ckpt.load(stage, input_hash)
+        if meta:
+            print(f"[{stage}] 跳过（检查点 {meta['finished']}，{age(meta['finished'])}）")
+        else:
+            start = time.perf_counter()
+            try:
+                with profiling.stage(stage):
+                    path = STAGE_FUNCS[stage](ckpt)
+            except Exception as e:
+                return False, f"{stage} 阶段失败: {type(e).__name__}: {e}"
+            meta = ckpt.save(stage, input_hash, path, time.perf_counter() - start)
+            print(f"[{stage}] 完成 {meta['elapsed']:.2f}s")
+        upstream = meta["output_hash"]
+    return True, meta["artifact"]
+
+
+def status(day: str = None) -> str:
+    ckpt = Checkpoints(day)
+    lines = [ckpt.dir]
+    for stage in ["morning", "night"] + STAGES:
+        meta = ckpt.meta(stage)
+        if meta:
+            lines.append(f"  {stage:<8} {meta['finished']}  {meta['elapsed']:.2f}s  {meta['input_hash']}")
+    return "\n".join(lines)
+
+
+def main():
+    global TOP_K
+    parser = argparse.ArgumentParser(description="A股分阶段流水线")
+    parser.add_argument("command", nargs="?", choices=["run", "status"], default="run")
+    parser.add_argument("--from-stage", choices=STAGES, help="从该阶段开始强制重算")
+    parser.add_argument("--date", help="交易日 YYYY-MM-DD（默认今天）")
+    parser.add_argument("--top", type=int, default=TOP_K)
+    args = parser.parse_args()
+
+    if args.command == "status":
+        print(status(args.date))
+        return 0
+    TOP_K = args.top
+    ok, result = run(args.from_stage, args.date)
+    if not ok:
+        print(f"Error: {result}")
+        return 1
+    with open(result, "r", encoding="utf-8") as f:
+        print(f.read())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+多查询并发扇出
+每个子查询各跑一次 search.sh（受最大并发和单查询超时限制），最后把各自的 sidecar
+按规范化 URL 合并去重为一个 JSON，并记录每条结果来自哪些子查询及各查询耗时
+"""
+
+import argparse
+import datetime
+import json
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from urlindex import canonicalize
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+SEARCH_SH = os.path.join(SCRIPT_DIR, "search.sh")
+RESULT_DIR = "/tmp/codex-search"
+# search.sh 自身会用 timeout 限制 codex，这里额外留出余量兜底
+TIMEOUT_GRACE = 30
+
+
+def load_prompts(prompts: list, prompt_file: str = None) -> list:
+    """合并 --prompt 与提示词文件（每行一个，忽略空行和 # 注释），保持顺序去重"""
+    result = list(prompts or [])
+    if prompt_file:
+        with open(os.path.expanduser(prompt_file), "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if line and not line.startswith("#"):
+                    result.append(line)
+    return list(dict.fromkeys(p for p in result if p.strip()))
+
+
+def run_query(query: dict, args, t0: float) -> dict:
+    """运行单个子查询，返回带耗时和退出码的 query 记录"""
+    cmd = ["bash", SEARCH_SH, "--prompt", query["prompt"], "--task-name", query["task_name"],
+           "--timeout", str(args.timeout), "--out-json", query["json_path"]]
+    if args.refresh:
+        cmd.append("--refresh")
+    if args.cache_ttl is not None:
+        cmd += ["--cache-ttl", str(args.cache_ttl)]
+    # 子查询不单独推送 Telegram、不单独导入历史索引，由外层 search.sh 汇总后统一处理
+    env = dict(os.environ, TELEGRAM_CHAT_ID="", CODEX_SEARCH_HISTORY_INGEST="0")
+    start = time.perf_counter()
+    try:
+        proc = subprocess.run(cmd, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+                              text=True, timeout=args.timeout + TIMEOUT_GRACE)
+        exit_code = proc.returncode
+        error = proc.stderr.strip()[-500:] if exit_code else ""
+    except subprocess.TimeoutExpired:
+        exit_code = 124
+        error = "timeout"
+    query.update(
+        started=round(start - t0, 3),
+        elapsed=round(time.perf_counter() - start, 3),
+        exit_code=exit_code,
+        error=error,
+    )
+    return query
+
+
+def load_sidecar(path: str) -> dict:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def merge_items(queries: list) -> list:
+    """按规范化 URL 合并各子查询的 items，保留首次出现的字段并补全空字段"""
+    merged = {}
+    order = []
+    for query in queries:
+        sidecar = load_sidecar(query["json_path"])
+        query["cached"] = "cached_from" in sidecar
+        items = sidecar.get("items", []) or []
+        query["items"] = len(items)
+        for rank, item in enumerate(items):
+            if not isinstance(item, dict):
+                continue
+            url = str(item.get("url", "") or "")
+            canonical = item.get("canonical_url") or (canonicalize(url) if url else "")
+            key = canonical or f"{query['id']}#{rank}"
+            if key not in merged:
+                merged[key] = dict(item, canonical_url=canonical, queries=[])
+                order.append(key)
+            else:
+                for field, value in item.items():
+                    if value and not merged[key].get(field):
+                        merged[key][field] = value
+                # 并发子查询都可能先于对方把同一 URL 记入索引，任一处为新即视为新
+                if "is_new" in item:
+                    merged[key]["is_new"] = merged[key].get("is_new", False) or item["is_new"]
+            merged[key]["queries"].append({"id": query["id"], "rank": rank})
+    return [merged[k] for k in order]
+
+
+def write_text(path: str, queries: list) -> None:
+    """把各子查询的原始输出按顺序拼接为一个 .txt"""
+    with open(path, "w", encoding="utf-8") as out:
+        for query in queries:
+            out.write(f"## [{query['id']}] {query['prompt']}\n\n")
+            try:
+                with open(query["txt_path"], "r", encoding="utf-8", errors="ignore") as f:
+                    out.write(f.read().rstrip() + "\n\n")
+            except OSError:
+                out.write(f"(无输出: {query['error'] or query['exit_code']})\n\n")
+
+
+def run_fanout(prompts: list, args) -> dict:
+    queries = []
+    for i, prompt in enumerate(prompts, 1):
+        qid = f"q{i:02d}"
+        sub_task = f"{args.task_name}-{qid}"
+        queries.append({
+            "id": qid,
+            "prompt": prompt,
+            "task_name": sub_task,
+            "txt_path": os.path.join(args.result_dir, f"{sub_task}.txt"),
+            "json_path": os.path.join(args.result_dir, f"{sub_task}.json"),
+        })
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(args.parallel, 1)) as pool:
+        list(pool.map(lambda q: run_query(q, args, t0), queries))
+    wall = round(time.perf_counter() - t0, 3)
+
+    items = merge_items(queries)
+    write_text(os.path.join(args.result_dir, f"{args.task_name}.txt"), queries)
+    out = {
+        "task_name": args.task_name,
+        "generated_at": datetime.datetime.now().isoformat(timespec="seconds"),
+        "mode": "fanout",
+        "prompts": prompts,
+        "parallel": args.parallel,
+        "elapsed": wall,
+        "queries": [{k: q[k] for k in ("id", "prompt", "task_name", "exit_code", "error",
+                                      "started", "elapsed", "items", "cached")}
+                    for q in queries],
+        "items": items,
+    }
+    if any("is_new" in it for it in items):
+        out["new_items"] = sum(1 for it in items if it.get("is_new"))
+    out_json = args.out_json or os.path.join(args.result_dir, f"{args.task_name}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out_json)), exist_ok=True)
+    with open(out_json, "w", encoding="utf-8") as f:
+        json.dump(out, f, ensure_ascii=False, indent=2)
+    return out
+
+
+def format_summary(out: dict) -> str:
+    queries = out["queries"]
+    failed = [q for q in queries if q["exit_code"] != 0]
+    serial = sum(q["elapsed"] for q in queries)
+    raw = sum(q["items"] for q in queries)
+    lines = [f"{len(queries)} 个子查询（并发 {out['parallel']}），失败 {len(failed)}，"
+             f"耗时 {out['elapsed']:.1f}s（串行合计 {serial:.1f}s）",
+             f"结果 {raw} 条 → 去重后 {len(out['items'])} 条"
+             + (f"，其中新来源 {out['new_items']} 条" if "new_items" in out else "")]
+    for q in queries:
+        status = "cache" if q["cached"] else ("ok" if q["exit_code"] == 0 else f"exit={q['exit_code']}")
+        lines.append(f"  [{q['id']}] {status:<7} {q['elapsed']:6.1f}s {q['items']:3d} 条  {q['prompt'][:60]}")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="并发运行多个 codex 搜索并合并结果")
+    parser.add_argument("--prompt", action="append", default=[], help="子查询，可重复")
+    parser.add_argument("--prompt-file", help="每行一个子查询")
+    parser.add_argument("--task-name", default=f"fanout-{datetime.datetime.now():%Y%m%d-%H%M%S}")
+    parser.add_argument("--parallel", type=int, default=4, help="最大并发数")
+    parser.add_argument("--timeout", type=int, default=120, help="单个子查询超时（秒）")
+    parser.add_argument("--out-json")
+    parser.add_argument("--result-dir", default=RESULT_DIR)
+    parser.add_argument("--refresh", action="store_true")
+    parser.add_argument("--cache-ttl", type=int)
+    args = parser.parse_args()
+
+    prompts = load_prompts(args.prompt, args.prompt_file)
+    if not prompts:
+        print("Error: 没有可执行的子查询", file=sys.stderr)
+        sys.exit(1)
+    os.makedirs(args.result_dir, exist_ok=True)
+    out = run_fanout(prompts, args)
+    print(format_summary(out))
+    sys.exit(0 if all(q["exit_code"] == 0 for q in out["queries"]) else 1)
+
+
+if __name__ == "__main__":
+    main()
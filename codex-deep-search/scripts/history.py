@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+历史搜索结果全文索引
+把 RESULT_DIR 下各次运行的 sidecar 条目和原始输出按文件 mtime 增量导入 SQLite FTS5，
+查询按 bm25 排序并返回高亮片段，发起新的 codex 搜索前先看看已经知道什么
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import time
+
+RESULT_DIR = "/tmp/codex-search"
+HISTORY_PATH = os.environ.get("CODEX_SEARCH_HISTORY_DB", "")
+# trigram 分词支持中文子串匹配，少于 3 个字的词改用 LIKE 过滤
+MIN_TRIGRAM = 3
+# bm25 列权重：task, kind, title, url, body（path 不参与索引）
+BM25_WEIGHTS = (0.5, 0.0, 5.0, 2.0, 1.0)
+SNIPPET_TOKENS = 24
+# 原始输出按段落切块入库，片段生成和排序都只针对小块
+CHUNK_CHARS = 2000
+
+
+def chunk_text(text: str, size: int = CHUNK_CHARS) -> list:
+    """在换行处把长文本切成不超过约 size 字符的块"""
+    chunks = []
+    start = 0
+    while start < len(text):
+        end = start + size
+        if end < len(text):
+            cut = text.rfind("\n", start, end)
+            end = cut + 1 if cut > start else end
+        chunk = text[start:end].strip()
+        if chunk:
+            chunks.append(chunk)
+        start = end
+    return chunks
+
+
+def is_result_file(name: str) -> bool:
+    return (name.endswith(".txt") or name.endswith(".json")) and not name.endswith(".items.jsonl")
+
+
+class HistoryIndex:
+    def __init__(self, path: str):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self.db = sqlite3.connect(path, timeout=30)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS files (path TEXT PRIMARY KEY, mtime REAL NOT NULL, size INTEGER NOT NULL)"
+        )
+        columns = "task, kind, title, url, body, path UNINDEXED"
+        try:
+            self.db.execute(f"CREATE VIRTUAL TABLE IF NOT EXISTS docs USING fts5({columns}, tokenize='trigram')")
+        except sqlite3.OperationalError:
+            # SQLite < 3.34 没有 trigram 分词
+            self.db.execute(f"CREATE VIRTUAL TABLE IF NOT EXISTS docs USING fts5({columns})")
+        self.db.commit()
+
+    def _rows(self, path: str) -> list:
+        """单个文件 → [(task, kind, title, url, body, path)]"""
+        name = os.path.basename(path)
+        task = name.rsplit(".", 1)[0]
+        with open(path, "r", encoding="utf-8", errors="ignore") as f:
+            raw = f.read()
+        if name.endswith(".txt"):
+            return [(task, "text", "", "", chunk, path) for chunk in chunk_text(raw)]
+        try:
+            data = json.loads(raw)
+        except ValueError:
+            return []
+        if not isinstance(data, dict):
+            return []
+        task = data.get("task_name", task)
+        prompts = data.get("prompts") or [data.get("prompt", "")]
+        rows = [(task, "prompt", "", "", "\n".join(p for p in prompts if p), path)]
+        for item in data.get("items", []) or []:
+            if isinstance(item, dict):
+                rows.append((task, "item", item.get("title", ""), item.get("url", ""),
+                             " ".join(filter(None, (item.get("source", ""), item.get("time", ""),
+                                                    item.get("snippet", "")))), path))
+        return rows
+
+    def ingest(self, result_dir: str = RESULT_DIR) -> dict:
+        """导入新增或修改过的文件，删除已消失文件的记录"""
+        stats = {"scanned": 0, "updated": 0, "removed": 0, "rows": 0}
+        known = {p: (m, s) for p, m, s in self.db.execute("SELECT path, mtime, size FROM files")}
+        present = set()
+        with self.db:
+            try:
+                entries = list(os.scandir(result_dir))
+            except FileNotFoundError:
+                entries = []
+            for entry in entries:
+                if not entry.is_file() or not is_result_file(entry.name):
+                    continue
+                stats["scanned"] += 1
+                present.add(entry.path)
+                st = entry.stat()
+                if known.get(entry.path) == (st.st_mtime, st.st_size):
+                    continue
+                rows = self._rows(entry.path)
+                self.db.execute("DELETE FROM docs WHERE path = ?", (entry.path,))
+                self.db.executemany("INSERT INTO docs VALUES (?, ?, ?, ?, ?, ?)", rows)
+                self.db.execute("INSERT OR REPLACE INTO files VALUES (?, ?, ?)",
+                                (entry.path, st.st_mtime, st.st_size))
+                stats["updated"] += 1
+                stats["rows"] += len(rows)
+            for path in set(known) - present:
+                self.db.execute("DELETE FROM docs WHERE path = ?", (path,))
+                self.db.execute("DELETE FROM files WHERE path = ?", (path,))
+                stats["removed"] += 1
+        return stats
+
+    def query(self, text: str, limit: int = 10, kinds: tuple = ("item", "text")) -> list:
+        """返回 [{task, kind, title, url, snippet, score}]，按相关度排序"""
+        terms = text.split()
+        long_terms = [t for t in terms if len(t) >= MIN_TRIGRAM]
+        short_terms = [t for t in terms if len(t) < MIN_TRIGRAM]
+        where = [f"kind IN ({', '.join('?' * len(kinds))})"]
+        params = list(kinds)
+        for t in short_terms:
+            where.append("(title LIKE ? OR body LIKE ?)")
+            params += [f"%{t}%", f"%{t}%"]
+        snippet = f"snippet(docs, -1, '[', ']', '…', {SNIPPET_TOKENS})"
+        if long_terms:
+            match = " ".join('"' + t.replace('"', '""') + '"' for t in long_terms)
+            bm25 = f"bm25(docs, {', '.join(map(str, BM25_WEIGHTS))})"
+            # 先只算分数取前 limit 条，再为这几条生成片段（snippet 对每个命中行都很贵）
+            sql = (f"SELECT task, kind, title, url, {snippet}, {bm25} AS score FROM docs"
+                   f" WHERE docs MATCH ? AND rowid IN (SELECT rowid FROM docs WHERE docs MATCH ?"
+                   f" AND {' AND '.join(where)} ORDER BY {bm25} LIMIT ?) ORDER BY score")
+            params = [match, match] + params
+        elif short_terms:
+            sql = (f"SELECT task, kind, title, url, substr(body, 1, 120), 0.0"
+                   f" FROM docs WHERE {' AND '.join(where)} ORDER BY rowid DESC LIMIT ?")
+        else:
+            return []
+        rows = self.db.execute(sql, params + [limit]).fetchall()
+        return [{"task": r[0], "kind": r[1], "title": r[2], "url": r[3],
+                 "snippet": " ".join(r[4].split()), "score": round(r[5], 3)} for r in rows]
+
+    def close(self) -> None:
+        self.db.close()
+
+
+def format_results(results: list, elapsed: float) -> str:
+    if not results:
+        return f"没有找到相关历史结果（{elapsed * 1000:.1f}ms）"
+    lines = [f"{len(results)} 条历史结果（{elapsed * 1000:.1f}ms）"]
+    for i, r in enumerate(results, 1):
+        head = r["title"] or r["url"] or "(原始输出)"
+        lines.append(f"{i:2d}. [{r['task']}] {head}")
+        if r["url"] and r["url"] != head:
+            lines.append(f"    {r['url']}")
+        if r["snippet"]:
+            lines.append(f"    {r['snippet']}")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="历史 codex-deep-search 结果全文检索")
+    parser.add_argument("--dir", default=RESULT_DIR, help="结果目录")
+    parser.add_argument("--db", default=HISTORY_PATH, help="索引路径，默认 <dir>/history.sqlite")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("ingest", help="增量导入结果目录")
+    p = sub.add_parser("query", help="检索（先增量导入）")
+    p.add_argument("text")
+    p.add_argument("--limit", type=int, default=10)
+    p.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    index = HistoryIndex(args.db or os.path.join(args.dir, "history.sqlite"))
+    try:
+        start = time.perf_counter()
+        stats = index.ingest(args.dir)
+        if args.command == "ingest":
+            print(f"[codex-deep-search] history: scanned={stats['scanned']} updated={stats['updated']} "
+                  f"removed={stats['removed']} rows={stats['rows']} ({time.perf_counter() - start:.2f}s)",
+                  file=sys.stderr)
+            return
+        start = time.perf_counter()
+        results = index.query(args.text, args.limit)
+        elapsed = time.perf_counter() - start
+        if args.json:
+            print(json.dumps(results, ensure_ascii=False, indent=2))
+        else:
+            print(format_results(results, elapsed))
+    finally:
+        index.close()
+
+
+if __name__ == "__main__":
+    main()
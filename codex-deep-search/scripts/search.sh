@@ -13,12 +13,34 @@ TELEGRAM_CHAT_ID="${TELEGRAM_CHAT_ID:-}"
 TELEGRAM_TOKEN_FILE="${TELEGRAM_TOKEN_FILE:-$HOME/.openclaw/telegram-bot-token}"
 TIMEOUT="${TIMEOUT:-120}"
 WORKDIR="${WORKDIR:-$HOME/.openclaw/workspace}"
+CACHE_DIR="${CODEX_SEARCH_CACHE_DIR:-$RESULT_DIR/cache}"
+CACHE_TTL="${CACHE_TTL:-3600}"
+CACHE_MAX_ENTRIES="${CACHE_MAX_ENTRIES:-200}"
+# 已见 URL 索引，设为空字符串则不标注 is_new
+INDEX_DB="${CODEX_SEARCH_INDEX_DB-$RESULT_DIR/seen.sqlite}"
+REFRESH=0
+PARALLEL="${PARALLEL:-4}"
+PROGRESS_EVERY="${PROGRESS_EVERY:-10}"
+PROMPTS=()
+PROMPT_FILE=""
+HISTORY_QUERY=""
+HISTORY_INGEST="${CODEX_SEARCH_HISTORY_INGEST:-1}"
+NL=$'\n'
+SCRIPT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
 
 # 解析参数
 while [[ $# -gt 0 ]]; do
     case "$1" in
         --prompt)
-            PROMPT="$2"
+            PROMPTS+=("$2")
+            shift 2
+            ;;
+        --prompt-file)
+            PROMPT_FILE="$2"
+            shift 2
+            ;;
+        --parallel)
+            PARALLEL="$2"
             shift 2
             ;;
         --task-name)
@@ -37,6 +59,22 @@ while [[ $# -gt 0 ]]; do
             OUT_JSON="$2"
             shift 2
             ;;
+        --history)
+            HISTORY_QUERY="$2"
+            shift 2
+            ;;
+        --refresh)
+            REFRESH=1
+            shift
+            ;;
+        --cache-ttl)
+            CACHE_TTL="$2"
+            shift 2
+            ;;
+        --cache-dir)
+            CACHE_DIR="$2"
+            shift 2
+            ;;
         *)
             echo "Unknown option: $1"
             exit 1
@@ -44,29 +82,73 @@ while [[ $# -gt 0 ]]; do
     esac
 done
 
+# 检索历史结果后直接退出
+if [ -n "$HISTORY_QUERY" ]; then
+    exec python3 "$SCRIPT_DIR/history.py" --dir "$RESULT_DIR" query "$HISTORY_QUERY"
+fi
+
 # 设置默认值
 TASK_NAME=${TASK_NAME:-"search-$(date +%Y%m%d-%H%M%S)"}
+if [ "${#PROMPTS[@]}" -gt 0 ]; then
+    PROMPT="${PROMPTS[0]}"
+fi
 PROMPT=${PROMPT:-"请搜索相关信息"}
 OUT_JSON=${OUT_JSON:-"$RESULT_DIR/$TASK_NAME.json"}
 TXT_PATH="$RESULT_DIR/$TASK_NAME.txt"
+ITEMS_PATH="$RESULT_DIR/$TASK_NAME.items.jsonl"
 
 # 创建结果目录
-mkdir -p "$RESULT_DIR"
+mkdir -p "$RESULT_DIR" "$(dirname "$OUT_JSON")"
+
+# 缓存键：规范化（去首尾空白、合并空白、小写）后的 prompt 的 SHA-256
+CACHE_KEY=$(PROMPT="$PROMPT" python3 -c 'import hashlib, os; p = " ".join(os.environ["PROMPT"].split()).lower(); print(hashlib.sha256(p.encode("utf-8")).hexdigest())')
+CACHE_TXT="$CACHE_DIR/$CACHE_KEY.txt"
+CACHE_JSON="$CACHE_DIR/$CACHE_KEY.json"
+
+file_age() {
+    local mtime
+    mtime=$(stat -c %Y "$1" 2>/dev/null || stat -f %m "$1")
+    echo $(( $(date +%s) - mtime ))
+}
+
+cache_fresh() {
+    [ "$CACHE_TTL" -gt 0 ] && [ -f "$CACHE_TXT" ] && [ -f "$CACHE_JSON" ] \
+        && [ "$(file_age "$CACHE_TXT")" -lt "$CACHE_TTL" ]
+}
+
+# 写入缓存并淘汰过期/超量的旧条目
+cache_store() {
+    mkdir -p "$CACHE_DIR"
+    cp "$TXT_PATH" "$CACHE_TXT.tmp" && mv "$CACHE_TXT.tmp" "$CACHE_TXT"
+    cp "$OUT_JSON" "$CACHE_JSON.tmp" && mv "$CACHE_JSON.tmp" "$CACHE_JSON"
+    local n=0 f
+    while IFS= read -r f; do
+        n=$((n + 1))
+        if [ "$n" -gt "$CACHE_MAX_ENTRIES" ] || [ "$(file_age "$f")" -ge "$CACHE_TTL" ]; then
+            rm -f "$f" "${f%.txt}.json"
+        fi
+    done < <(ls -1t "$CACHE_DIR"/*.txt 2>/dev/null)
+}
 
-# 发送通知
+# 退出时把本次结果增量导入历史索引（扇出的子查询由外层统一导入）
+ingest_history() {
+    if [ "$HISTORY_INGEST" = "1" ]; then
+        python3 "$SCRIPT_DIR/history.py" --dir "$RESULT_DIR" ingest 2>/dev/null || true
+    fi
+}
+trap ingest_history EXIT
+
+# 发送通知：send_message "标题" [结果文件]
+# 纯文本发送，长结果按段落分条（同一连接、遵守 429），过长时改为上传文件
 send_message() {
-    local message="$1"
-    local token
-    token="${TELEGRAM_BOT_TOKEN:-}"
-    if [ -z "$token" ] && [ -f "$TELEGRAM_TOKEN_FILE" ]; then
-        token=$(cat "$TELEGRAM_TOKEN_FILE" 2>/dev/null || true)
+    if [ -z "$TELEGRAM_CHAT_ID" ]; then
+        return 0
     fi
-    if [ -n "$token" ] && [ -n "$TELEGRAM_CHAT_ID" ]; then
-        curl -s -X POST "https://api.telegram.org/bot$token/sendMessage" \
-            -d "chat_id=$TELEGRAM_CHAT_ID" \
-            -d "text=$message" \
-            -d "parse_mode=Markdown" >/dev/null || true
+    local args=(--chat-id "$TELEGRAM_CHAT_ID" --text "$1")
+    if [ -n "${2:-}" ] && [ -f "$2" ]; then
+        args+=(--file "$2")
     fi
+    TELEGRAM_TOKEN_FILE="$TELEGRAM_TOKEN_FILE" python3 "$SCRIPT_DIR/telegram_send.py" "${args[@]}" || true
 }
 
 echo "========================================="
@@ -74,98 +156,86 @@ echo "Codex Deep Search"
 echo "任务: $TASK_NAME"
 echo "========================================="
 
-send_message "🔍 *Codex 深度搜索开始*\n\n任务: $TASK_NAME\n提示: $PROMPT\n\n请稍候..."
+# 扇出模式：多个 --prompt 或 --prompt-file 时并发执行子查询并合并结果
+if [ -n "$PROMPT_FILE" ] || [ "${#PROMPTS[@]}" -gt 1 ]; then
+    FANOUT_ARGS=(--task-name "$TASK_NAME" --parallel "$PARALLEL" --timeout "$TIMEOUT"
+                 --out-json "$OUT_JSON" --result-dir "$RESULT_DIR" --cache-ttl "$CACHE_TTL")
+    for p in ${PROMPTS[@]+"${PROMPTS[@]}"}; do
+        FANOUT_ARGS+=(--prompt "$p")
+    done
+    if [ -n "$PROMPT_FILE" ]; then
+        FANOUT_ARGS+=(--prompt-file "$PROMPT_FILE")
+    fi
+    if [ "$REFRESH" -eq 1 ]; then
+        FANOUT_ARGS+=(--refresh)
+    fi
+    send_message "🔍 Codex 扇出搜索开始${NL}${NL}任务: $TASK_NAME${NL}并发: $PARALLEL${NL}${NL}请稍候..."
+    EXIT_CODE=0
+    SUMMARY=$(CODEX_SEARCH_CACHE_DIR="$CACHE_DIR" CACHE_MAX_ENTRIES="$CACHE_MAX_ENTRIES" \
+        CODEX_SEARCH_INDEX_DB="$INDEX_DB" \
+        python3 "$SCRIPT_DIR/fanout.py" "${FANOUT_ARGS[@]}") || EXIT_CODE=$?
+    echo "$SUMMARY"
+    if [ "$EXIT_CODE" -eq 0 ]; then
+        send_message "✅ Codex 扇出搜索完成${NL}${NL}任务: $TASK_NAME${NL}${NL}$SUMMARY${NL}${NL}---" "$TXT_PATH"
+    else
+        send_message "⚠️ Codex 扇出搜索部分失败${NL}${NL}任务: $TASK_NAME${NL}${NL}$SUMMARY"
+    fi
+    echo "合并结果已保存到 $OUT_JSON"
+    exit "$EXIT_CODE"
+fi
+
+if [ "$REFRESH" -eq 0 ] && cache_fresh; then
+    cp "$CACHE_TXT" "$TXT_PATH"
+    # 缓存里的 is_new 是写入缓存那次的结果，按当前索引重新标注
+    REUSE_ARGS=(--from-cache "$CACHE_JSON" --out-json "$OUT_JSON" --task-name "$TASK_NAME")
+    if [ -n "$INDEX_DB" ]; then
+        REUSE_ARGS+=(--index "$INDEX_DB")
+    fi
+    python3 "$SCRIPT_DIR/sidecar.py" "${REUSE_ARGS[@]}" > /dev/null
+    echo "命中缓存（$(file_age "$CACHE_TXT")s 前，--refresh 可强制重新搜索）"
+    send_message "✅ Codex 搜索完成（缓存）${NL}${NL}任务: $TASK_NAME${NL}${NL}---" "$TXT_PATH"
+    echo "搜索完成，结果已保存到 $TXT_PATH"
+    exit 0
+fi
+
+send_message "🔍 Codex 深度搜索开始${NL}${NL}任务: $TASK_NAME${NL}提示: $PROMPT${NL}${NL}请稍候..."
 
 cd "$WORKDIR"
 if command -v timeout >/dev/null 2>&1; then
-    timeout "$TIMEOUT" "$CODEX_BIN" exec "$PROMPT" > "$TXT_PATH" 2>&1 || EXIT_CODE=$?
+    CODEX_CMD=(timeout "$TIMEOUT" "$CODEX_BIN" exec "$PROMPT")
 else
-    "$CODEX_BIN" exec "$PROMPT" > "$TXT_PATH" 2>&1 || EXIT_CODE=$?
+    CODEX_CMD=("$CODEX_BIN" exec "$PROMPT")
 fi
+: > "$TXT_PATH"
+: > "$ITEMS_PATH"
+"${CODEX_CMD[@]}" > "$TXT_PATH" 2>&1 &
+CODEX_PID=$!
+
+# 边输出边抽取条目，超时被杀时也能保留已输出的部分结果
+python3 "$SCRIPT_DIR/stream_extract.py" --txt "$TXT_PATH" --items "$ITEMS_PATH" \
+    --pid "$CODEX_PID" --progress-every "$PROGRESS_EVERY" | while IFS= read -r line; do
+        send_message "⏳ Codex 搜索进行中${NL}${NL}任务: $TASK_NAME${NL}$line"
+    done &
+EXTRACT_PID=$!
+
+wait "$CODEX_PID" || EXIT_CODE=$?
 EXIT_CODE=${EXIT_CODE:-0}
+wait "$EXTRACT_PID" || true
 
 # 输出 sidecar JSON
-export TASK_NAME PROMPT OUT_JSON TXT_PATH
-python3 - <<'PY'
-import json, re, datetime, os
-
-task = os.environ.get("TASK_NAME", "task")
-txt_path = os.environ.get("TXT_PATH", f"/tmp/codex-search/{task}.txt")
-out_path = os.environ.get("OUT_JSON", f"/tmp/codex-search/{task}.json")
-prompt = os.environ.get("PROMPT", "")
-
-text = ""
-if os.path.exists(txt_path):
-    text = open(txt_path, "r", encoding="utf-8", errors="ignore").read()
-
-def parse_json_payload(raw: str):
-    if not raw:
-        return None
-    raw = raw.strip()
-    candidates = [raw]
-    fenced = re.sub(r"^```(?:json)?\s*|\s*```$", "", raw, flags=re.I | re.S).strip()
-    if fenced and fenced != raw:
-        candidates.append(fenced)
-    decoder = json.JSONDecoder()
-    for candidate in candidates:
-        try:
-            return json.loads(candidate)
-        except Exception:
-            try:
-                obj, _ = decoder.raw_decode(candidate)
-                return obj
-            except Exception:
-                pass
-    return None
-
-items = []
-begin = text.find("BEGIN_JSON")
-if begin != -1:
-    end = text.find("END_JSON", begin + len("BEGIN_JSON"))
-    if end != -1:
-        payload = parse_json_payload(text[begin + len("BEGIN_JSON"):end])
-        if isinstance(payload, dict) and "items" in payload:
-            items = payload.get("items", []) or []
-        elif isinstance(payload, list):
-            items = payload
-
-if not items:
-    urls = sorted(set(re.findall(r"https?://[^\s\]\)\"'>,]+", text)))
-    items = [{"title": "", "url": u, "source": "", "time": "", "snippet": ""} for u in urls[:60]]
-
-normalized = []
-for it in items:
-    if not isinstance(it, dict):
-        continue
-    normalized.append(
-        {
-            "title": str(it.get("title", "") or ""),
-            "url": str(it.get("url", "") or ""),
-            "source": str(it.get("source", "") or ""),
-            "time": str(it.get("time", "") or ""),
-            "snippet": str(it.get("snippet", "") or ""),
-            "category": str(it.get("category", "") or ""),
-        }
-    )
-
-out = {
-    "task_name": task,
-    "generated_at": datetime.datetime.now().isoformat(timespec="seconds"),
-    "prompt": prompt,
-    "items": normalized,
-}
-
-os.makedirs(os.path.dirname(out_path), exist_ok=True)
-json.dump(out, open(out_path, "w", encoding="utf-8"), ensure_ascii=False, indent=2)
-print(f"[codex-deep-search] wrote json: {out_path} items={len(normalized)}")
-PY
+SIDECAR_ARGS=(--txt "$TXT_PATH" --out-json "$OUT_JSON" --task-name "$TASK_NAME"
+              --prompt "$PROMPT" --items "$ITEMS_PATH")
+if [ -n "$INDEX_DB" ]; then
+    SIDECAR_ARGS+=(--index "$INDEX_DB")
+fi
+python3 "$SCRIPT_DIR/sidecar.py" "${SIDECAR_ARGS[@]}"
 
 if [ "$EXIT_CODE" -eq 0 ]; then
-    RESULT=$(cat "$TXT_PATH")
-    send_message "✅ *Codex 搜索完成*\n\n任务: $TASK_NAME\n\n---\n\n$RESULT"
+    cache_store || echo "写入缓存失败" >&2
+    send_message "✅ Codex 搜索完成${NL}${NL}任务: $TASK_NAME${NL}${NL}---" "$TXT_PATH"
     echo "搜索完成，结果已保存到 $TXT_PATH"
 else
-    send_message "❌ *Codex 搜索失败*\n\n任务: $TASK_NAME\n\n错误码: $EXIT_CODE"
+    send_message "❌ Codex 搜索失败${NL}${NL}任务: $TASK_NAME${NL}${NL}错误码: $EXIT_CODE"
     echo "搜索失败，错误码: $EXIT_CODE"
 fi
 
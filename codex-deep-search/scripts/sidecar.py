@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+sidecar JSON 生成
+str.find 定位 BEGIN_JSON/END_JSON 后按偏移解码块内 JSON；只有需要回退时才扫描 URL，
+收满上限即停止。命中结果缓存时 --from-cache 复用缓存的 sidecar 并重新标注 is_new。
+可作为模块导入，并提供大输出基准测试（--bench）
+"""
+
+import argparse
+import datetime
+import json
+import os
+import random
+import re
+import time
+
+from stream_extract import load_items, normalize_item
+
+BEGIN = "BEGIN_JSON"
+END = "END_JSON"
+URL_RE = re.compile(r"https?://[^\s\]\)\"'>,]+")
+URL_LIMIT = 60
+
+
+def find_block(text: str):
+    """定位首个 BEGIN_JSON … END_JSON 块，返回 (start, end) 或 None"""
+    begin = text.find(BEGIN)
+    if begin == -1:
+        return None
+    begin += len(BEGIN)
+    end = text.find(END, begin)
+    return (begin, end) if end != -1 else None
+
+
+def scan_urls(text: str, limit: int = URL_LIMIT) -> list:
+    """按出现顺序去重收集 URL，收满 limit 个即停止扫描"""
+    urls = {}
+    for m in URL_RE.finditer(text):
+        urls.setdefault(m.group(0), None)
+        if len(urls) >= limit:
+            break
+    return list(urls)
+
+
+def strip_fence(raw: str) -> str:
+    """去掉 ```json ... ``` 围栏"""
+    if raw.startswith("```"):
+        raw = raw[3:]
+        if raw[:4].lower() == "json":
+            raw = raw[4:]
+        raw = raw.lstrip()
+    if raw.endswith("```"):
+        raw = raw[:-3].rstrip()
+    return raw
+
+
+def parse_json_payload(raw: str):
+    if not raw:
+        return None
+    raw = raw.strip()
+    candidates = [raw]
+    fenced = strip_fence(raw)
+    if fenced and fenced != raw:
+        candidates.append(fenced)
+    decoder = json.JSONDecoder()
+    for candidate in candidates:
+        try:
+            return json.loads(candidate)
+        except ValueError:
+            try:
+                obj, _ = decoder.raw_decode(candidate)
+                return obj
+            except ValueError:
+                pass
+    return None
+
+
+def extract_items(text: str, items_path: str = None) -> list:
+    """依次尝试：JSON 块 → 流式抽取的条目 → 正文 URL"""
+    block = find_block(text)
+    items = []
+    if block is not None:
+        payload = parse_json_payload(text[block[0]:block[1]])
+        if isinstance(payload, dict) and "items" in payload:
+            items = payload.get("items", []) or []
+        elif isinstance(payload, list):
+            items = payload
+
+    if not items and items_path:
+        # 输出被截断（如超时）时使用流式抽取已拿到的条目
+        items, _ = load_items(items_path)
+
+    if not items:
+        items = [{"url": u} for u in scan_urls(text)]
+
+    return [normalize_item(it) for it in items if isinstance(it, dict)]
+
+
+def annotate_sidecar(sidecar: dict, index_path: str = None) -> dict:
+    """index_path 给出时按规范化 URL 去重，并对照历史索引标注 is_new"""
+    if index_path:
+        import urlindex
+
+        index = urlindex.UrlIndex(index_path)
+        try:
+            sidecar["items"] = index.annotate(sidecar["items"], sidecar["task_name"])
+        finally:
+            index.close()
+        sidecar["new_items"] = sum(1 for it in sidecar["items"] if it["is_new"])
+    return sidecar
+
+
+def build_sidecar(task: str, prompt: str, text: str, items_path: str = None,
+                  index_path: str = None) -> dict:
+    sidecar = {
+        "task_name": task,
+        "generated_at": datetime.datetime.now().isoformat(timespec="seconds"),
+        "prompt": prompt,
+        "items": extract_items(text, items_path),
+    }
+    return annotate_sidecar(sidecar, index_path)
+
+
+def reuse_sidecar(cache_path: str, task: str, index_path: str = None) -> dict:
+    """命中结果缓存时复用缓存的 sidecar：改成本次任务名与时间，记下来源；
+    缓存里的 is_new 是写入缓存那次的结果，去掉后按当前索引重新标注"""
+    with open(cache_path, "r", encoding="utf-8") as f:
+        sidecar = json.load(f)
+    sidecar["cached_from"] = sidecar.get("task_name", "")
+    sidecar["cached_at"] = sidecar.get("generated_at", "")
+    sidecar["task_name"] = task
+    sidecar["generated_at"] = datetime.datetime.now().isoformat(timespec="seconds")
+    sidecar.pop("new_items", None)
+    sidecar["items"] = [{k: v for k, v in it.items() if k not in ("is_new", "near_duplicate_of")}
+                        for it in sidecar.get("items", [])]
+    return annotate_sidecar(sidecar, index_path)
+
+
+def write_sidecar(out_path: str, sidecar: dict) -> None:
+    os.makedirs(os.path.dirname(os.path.abspath(out_path)), exist_ok=True)
+    with open(out_path, "w", encoding="utf-8") as f:
+        json.dump(sidecar, f, ensure_ascii=False, indent=2)
+
+
+def synthetic_output(size: int, items: int = 40, seed: int = 0) -> str:
+    """构造约 size 字节的 codex 风格输出：大量夹带 URL 的正文，末尾一个 JSON 块"""
+    rng = random.Random(seed)
+    words = ["存算一体", "FeFET", "论文", "进展", "benchmark", "latency", "the", "of", "芯片", "research"]
+    parts = []
+    total = 0
+    while total < size:
+        line = " ".join(rng.choice(words) for _ in range(12))
+        if rng.random() < 0.3:
+            line += f" 参见 https://example{rng.randrange(500)}.com/p/{rng.randrange(10 ** 6)}?ref=x"
+        parts.append(line)
+        total += len(line.encode("utf-8")) + 1
+    payload = {"items": [{"title": f"结果 {i}", "url": f"https://src{i}.org/a/{i}",
+                          "snippet": "…" * 20} for i in range(items)]}
+    parts.append(f"{BEGIN}\n```json\n{json.dumps(payload, ensure_ascii=False, indent=2)}\n```\n{END}")
+    return "\n".join(parts)
+
+
+def run_bench(sizes_mb: list, repeat: int = 3) -> list:
+    """分别测量有 / 无 JSON 块两种输出，返回 [{size_mb, case, seconds, mb_per_s, items}]"""
+    rows = []
+    for mb in sizes_mb:
+        full = synthetic_output(int(mb * 1024 * 1024))
+        truncated = full[:full.rfind(BEGIN)]
+        for case, text in (("json-block", full), ("url-fallback", truncated)):
+            best = float("inf")
+            count = 0
+            for _ in range(repeat):
+                start = time.perf_counter()
+                count = len(extract_items(text))
+                best = min(best, time.perf_counter() - start)
+            size = len(text.encode("utf-8")) / 1e6
+            rows.append({"size_mb": round(size, 1), "case": case, "seconds": round(best, 4),
+                         "mb_per_s": round(size / best, 1) if best else 0.0, "items": count})
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="从 codex 输出生成 sidecar JSON")
+    parser.add_argument("--txt", help="codex 输出文件")
+    parser.add_argument("--out-json", help="sidecar 输出路径")
+    parser.add_argument("--task-name", default="task")
+    parser.add_argument("--prompt", default="")
+    parser.add_argument("--items", help="stream_extract.py 写出的 JSONL")
+    parser.add_argument("--index", help="已见 URL 索引（SQLite），给出时标注 is_new")
+    parser.add_argument("--from-cache", help="复用结果缓存中的 sidecar JSON（不读 --txt）")
+    parser.add_argument("--bench", action="store_true", help="在合成的大输出上做基准测试")
+    parser.add_argument("--sizes", default="1,4,16", help="基准测试输出大小（MB，逗号分隔）")
+    args = parser.parse_args()
+
+    if args.bench:
+        for row in run_bench([float(s) for s in args.sizes.split(",")]):
+            print(f"{row['size_mb']:7.1f}MB  {row['case']:<13} {row['seconds'] * 1000:9.1f}ms  "
+                  f"{row['mb_per_s']:7.1f}MB/s  items={row['items']}")
+        return
+
+    if not args.out_json or not (args.txt or args.from_cache):
+        parser.error("需要 --out-json 以及 --txt 或 --from-cache（或使用 --bench）")
+    if args.from_cache:
+        sidecar = reuse_sidecar(args.from_cache, args.task_name, args.index)
+    else:
+        text = ""
+        if os.path.exists(args.txt):
+            with open(args.txt, "r", encoding="utf-8", errors="ignore") as f:
+                text = f.read()
+        sidecar = build_sidecar(args.task_name, args.prompt, text, args.items, args.index)
+    write_sidecar(args.out_json, sidecar)
+    new = f" new={sidecar['new_items']}" if "new_items" in sidecar else ""
+    print(f"[codex-deep-search] wrote json: {args.out_json} items={len(sidecar['items'])}{new}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+流式结果抽取
+在 codex 运行期间跟随输出文件，增量解析 BEGIN_JSON/END_JSON 块中的条目和正文 URL，
+新条目立即追加到 JSONL；缓冲区有上限，超时中断时也能留下已输出的结构化结果
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+import time
+
+BEGIN = "BEGIN_JSON"
+END = "END_JSON"
+URL_RE = re.compile(r"https?://[^\s\]\)\"'>,]+")
+ITEMS_HEAD_RE = re.compile(r'\{\s*"items"\s*:\s*\[')
+# 单行 / 单个 JSON 块允许缓冲的最大字符数，超出即丢弃，保证内存有界
+MAX_LINE = 8 * 1024
+MAX_BLOCK = 1024 * 1024
+POLL_INTERVAL = 0.2
+READ_SIZE = 64 * 1024
+ITEM_FIELDS = ("title", "url", "source", "time", "snippet", "category")
+
+
+def normalize_item(it: dict) -> dict:
+    return {f: str(it.get(f, "") or "") for f in ITEM_FIELDS}
+
+
+class StreamExtractor:
+    """增量解析器：feed(text) 返回本次新发现的记录 [{"type": "item"|"url", ...}]"""
+
+    def __init__(self):
+        self.buf = ""
+        self.in_block = False
+        self.seen_items = set()
+        self.seen_urls = set()
+        self.items = 0
+        self.urls = 0
+        self.dropped = 0
+
+    def feed(self, text: str, final: bool = False) -> list:
+        self.buf += text
+        records = []
+        while True:
+            if self.in_block:
+                if not self._scan_block(records, final):
+                    break
+            else:
+                begin = self.buf.find(BEGIN)
+                if begin == -1:
+                    # 只处理完整的行，避免 URL 被读取边界截断；保留可能是 BEGIN_JSON 前缀的尾部
+                    cut = len(self.buf) if final else self.buf.rfind("\n") + 1
+                    self._scan_urls(self.buf[:cut], records)
+                    self.buf = self.buf[cut:]
+                    if len(self.buf) > MAX_LINE:
+                        self._scan_urls(self.buf[:-len(BEGIN)], records)
+                        self.buf = self.buf[-len(BEGIN):]
+                    break
+                self._scan_urls(self.buf[:begin], records)
+                self.buf = self.buf[begin + len(BEGIN):]
+                self.in_block = True
+        return records
+
+    def _scan_urls(self, text: str, records: list) -> None:
+        for m in URL_RE.finditer(text):
+            url = m.group(0)
+            if url not in self.seen_urls:
+                self.seen_urls.add(url)
+                self.urls += 1
+                records.append({"type": "url", "url": url})
+
+    def _emit(self, obj, records: list) -> None:
+        if not isinstance(obj, dict):
+            return
+        item = normalize_item(obj)
+        key = (item["url"], item["title"])
+        if key not in self.seen_items:
+            self.seen_items.add(key)
+            self.items += 1
+            records.append(dict(item, type="item"))
+
+    def _scan_block(self, records: list, final: bool) -> bool:
+        """在块内逐个解码对象；返回 False 表示需要更多输入"""
+        decoder = json.JSONDecoder()
+        end = self.buf.find(END)
+        body = self.buf if end == -1 else self.buf[:end]
+        pos = 0
+        while True:
+            start = body.find("{", pos)
+            if start == -1:
+                # 保留可能是 END_JSON 前缀的尾部
+                pos = len(body) if end != -1 else max(pos, len(body) - len(END) + 1)
+                break
+            head = ITEMS_HEAD_RE.match(body, start)
+            if head:
+                # 外层 {"items": [...]} 要等到结尾才完整，直接进入数组逐条解析
+                pos = head.end()
+                continue
+            try:
+                obj, stop = decoder.raw_decode(body, start)
+            except ValueError:
+                if end == -1 and not final and len(body) - start < MAX_BLOCK:
+                    pos = start
+                    break  # 对象尚未写完
+                pos = start + 1  # 格式错误，跳过
+                continue
+            if isinstance(obj, dict) and isinstance(obj.get("items"), list):
+                for it in obj["items"]:
+                    self._emit(it, records)
+            else:
+                self._emit(obj, records)
+            pos = stop
+
+        if end != -1:
+            self.buf = self.buf[end + len(END):]
+            self.in_block = False
+            return True
+        self.buf = self.buf[pos:]
+        if len(self.buf) > MAX_BLOCK:
+            self.dropped += len(self.buf)
+            self.buf = ""
+        return False
+
+
+def pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def follow(txt_path: str, items_path: str, pid: int = None, progress_every: int = 0,
+           poll: float = POLL_INTERVAL) -> StreamExtractor:
+    """跟随 txt_path 直到进程 pid 退出（未给 pid 时读到文件末尾即结束）"""
+    extractor = StreamExtractor()
+    while not os.path.exists(txt_path):
+        if pid is None or not pid_alive(pid):
+            return extractor
+        time.sleep(poll)
+
+    next_report = progress_every
+    with open(txt_path, "r", encoding="utf-8", errors="ignore") as src, \
+            open(items_path, "a", encoding="utf-8") as out:
+        while True:
+            alive = pid is not None and pid_alive(pid)
+            chunk = src.read(READ_SIZE)
+            if chunk:
+                records = extractor.feed(chunk)
+            elif alive:
+                time.sleep(poll)
+                continue
+            else:
+                records = extractor.feed("", final=True)
+            for record in records:
+                out.write(json.dumps(record, ensure_ascii=False) + "\n")
+            if records:
+                out.flush()
+            if progress_every and extractor.items >= next_report:
+                print(f"已解析 {extractor.items} 条结果", flush=True)
+                next_report = (extractor.items // progress_every + 1) * progress_every
+            if not chunk and not alive:
+                return extractor
+
+
+def load_items(items_path: str) -> tuple:
+    """读取流式 JSONL，返回 (items, urls)"""
+    items, urls = [], []
+    if not os.path.exists(items_path):
+        return items, urls
+    with open(items_path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if record.pop("type", "") == "item":
+                items.append(normalize_item(record))
+            elif record.get("url"):
+                urls.append(record["url"])
+    return items, urls
+
+
+def main():
+    parser = argparse.ArgumentParser(description="跟随 codex 输出增量抽取结果")
+    parser.add_argument("--txt", required=True, help="codex 输出文件")
+    parser.add_argument("--items", required=True, help="追加写入的 JSONL")
+    parser.add_argument("--pid", type=int, help="codex 进程号，退出后读完剩余内容即结束")
+    parser.add_argument("--progress-every", type=int, default=0, metavar="N",
+                        help="每新增 N 条结果向 stdout 打印一行进度")
+    args = parser.parse_args()
+
+    extractor = follow(args.txt, args.items, args.pid, args.progress_every)
+    print(f"[codex-deep-search] stream: items={extractor.items} urls={extractor.urls}"
+          + (f" dropped={extractor.dropped}B" if extractor.dropped else ""), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
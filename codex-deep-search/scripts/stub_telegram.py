@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Stub Telegram - 本地替身 Bot API，用于离线测试 telegram_send.py / search.sh
+
+用法:
+    python3 stub_telegram.py [--port 18081] [--log /tmp/stub-telegram.jsonl]
+        [--rate-limit 3] [--retry-after 1]
+
+配合 search.sh 使用:
+    TELEGRAM_API_BASE=http://127.0.0.1:18081 TELEGRAM_BOT_TOKEN=test \\
+        bash search.sh --prompt "..." --telegram-group 42
+
+每条收到的消息按行写入 --log（含连接序号，便于确认连接复用）；
+--rate-limit N 表示每 N 个请求返回一次 429。
+"""
+
+import argparse
+import itertools
+import json
+import os
+import threading
+from email import policy
+from email.parser import BytesParser
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+DEFAULT_PORT = int(os.environ.get("STUB_TELEGRAM_PORT", "18081"))
+MESSAGE_LIMIT = 4096
+
+
+class StubState:
+    def __init__(self, log_path: str, rate_limit: int, retry_after: int):
+        self.log_path = log_path
+        self.rate_limit = rate_limit
+        self.retry_after = retry_after
+        self.requests = itertools.count(1)
+        self.connections = itertools.count(1)
+        self.lock = threading.Lock()
+
+    def record(self, entry: dict) -> None:
+        if not self.log_path:
+            return
+        with self.lock, open(self.log_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+
+def make_handler(state: StubState):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # 支持 keep-alive
+
+        def setup(self):
+            super().setup()
+            self.conn_id = next(state.connections)
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send_json(self, code: int, payload: dict) -> None:
+            body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _fields(self, raw: bytes) -> dict:
+            ctype = self.headers.get("Content-Type", "")
+            if ctype.startswith("multipart/form-data"):
+                msg = BytesParser(policy=policy.default).parsebytes(
+                    f"Content-Type: {ctype}\r\n\r\n".encode() + raw)
+                fields = {}
+                for part in msg.iter_parts():
+                    name = part.get_param("name", header="content-disposition")
+                    payload = part.get_payload(decode=True)
+                    if part.get_filename():
+                        fields[name] = {"filename": part.get_filename(), "bytes": len(payload)}
+                    else:
+                        fields[name] = payload.decode("utf-8")
+                return fields
+            return {k: v[0] for k, v in parse_qs(raw.decode("utf-8")).items()}
+
+        def do_POST(self):
+            raw = self.rfile.read(int(self.headers.get("Content-Length", "0")))
+            method = self.path.rsplit("/", 1)[-1]
+            n = next(state.requests)
+            if state.rate_limit and n % state.rate_limit == 0:
+                state.record({"conn": self.conn_id, "method": method, "status": 429})
+                self._send_json(429, {"ok": False, "error_code": 429,
+                                      "description": "Too Many Requests",
+                                      "parameters": {"retry_after": state.retry_after}})
+                return
+            fields = self._fields(raw)
+            text = fields.get("text", "")
+            if method == "sendMessage" and not 0 < len(text) <= MESSAGE_LIMIT:
+                state.record({"conn": self.conn_id, "method": method, "status": 400, "length": len(text)})
+                self._send_json(400, {"ok": False, "error_code": 400,
+                                      "description": "Bad Request: message is too long"})
+                return
+            if method not in ("sendMessage", "sendDocument"):
+                self._send_json(404, {"ok": False, "error_code": 404, "description": "Not Found"})
+                return
+            state.record({"conn": self.conn_id, "method": method, "status": 200, **fields})
+            self._send_json(200, {"ok": True, "result": {"message_id": n}})
+
+    return Handler
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Stub Telegram Bot API")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--log", default="/tmp/stub-telegram.jsonl", help="收到的请求记录（JSONL）")
+    parser.add_argument("--rate-limit", type=int, default=0, metavar="N", help="每 N 个请求返回一次 429")
+    parser.add_argument("--retry-after", type=int, default=1, help="429 响应中的 retry_after（秒）")
+    args = parser.parse_args()
+
+    state = StubState(args.log, args.rate_limit, args.retry_after)
+    server = ThreadingHTTPServer(("127.0.0.1", args.port), make_handler(state))
+    print(f"stub telegram listening on http://127.0.0.1:{args.port} (log: {args.log})", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
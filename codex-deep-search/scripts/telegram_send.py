@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+Telegram 结果投递
+长文本按段落切成 ≤4096 字符的多条纯文本消息，复用同一个 keep-alive 连接发送；
+遇到 429 按 retry_after 等待重试，超长结果改为上传文件
+
+用法:
+    python3 telegram_send.py --chat-id 123 --text "标题" [--file result.txt]
+    echo "内容" | python3 telegram_send.py --chat-id 123
+
+本地测试:
+    python3 stub_telegram.py --port 18081 &
+    TELEGRAM_API_BASE=http://127.0.0.1:18081 TELEGRAM_BOT_TOKEN=x python3 telegram_send.py ...
+"""
+
+import argparse
+import http.client
+import json
+import os
+import sys
+import time
+import uuid
+from urllib.parse import urlencode, urlsplit
+
+API_BASE = os.environ.get("TELEGRAM_API_BASE", "https://api.telegram.org")
+TOKEN_FILE = os.environ.get("TELEGRAM_TOKEN_FILE", os.path.expanduser("~/.openclaw/telegram-bot-token"))
+MESSAGE_LIMIT = 4096
+# 超过这么多条消息就改为发送文件
+MAX_MESSAGES = int(os.environ.get("TELEGRAM_MAX_MESSAGES", "5"))
+MAX_RETRIES = 5
+REQUEST_TIMEOUT = 30
+
+
+class TelegramError(Exception):
+    pass
+
+
+def split_message(text: str, limit: int = MESSAGE_LIMIT) -> list:
+    """优先在空行处切分，其次换行处，单行超长时硬切"""
+    chunks = []
+    current = ""
+
+    def pieces(block: str, sep: str):
+        if len(block) <= limit:
+            yield block
+        elif sep == "\n\n":
+            for line in block.split("\n"):
+                yield from pieces(line, "\n")
+        else:
+            for i in range(0, len(block), limit):
+                yield block[i:i + limit]
+
+    for para in text.split("\n\n"):
+        for piece in pieces(para, "\n\n"):
+            sep = "\n\n" if piece is para else "\n"
+            if current and len(current) + len(sep) + len(piece) <= limit:
+                current += sep + piece
+            else:
+                if current:
+                    chunks.append(current)
+                current = piece
+    if current.strip():
+        chunks.append(current)
+    return [c for c in chunks if c.strip()]
+
+
+def load_token() -> str:
+    token = os.environ.get("TELEGRAM_BOT_TOKEN", "")
+    if not token and os.path.exists(TOKEN_FILE):
+        with open(TOKEN_FILE, "r", encoding="utf-8") as f:
+            token = f.read().strip()
+    return token
+
+
+class TelegramSender:
+    """单个 keep-alive 连接上的 Bot API 客户端"""
+
+    def __init__(self, token: str, chat_id: str, api_base: str = API_BASE):
+        base = urlsplit(api_base)
+        self.https = base.scheme == "https"
+        self.host = base.netloc
+        self.prefix = f"{base.path.rstrip('/')}/bot{token}"
+        self.chat_id = chat_id
+        self.conn = None
+        self.stats = {"requests": 0, "connections": 0, "retries": 0, "waited": 0.0}
+
+    def _connect(self):
+        if self.conn is None:
+            cls = http.client.HTTPSConnection if self.https else http.client.HTTPConnection
+            self.conn = cls(self.host, timeout=REQUEST_TIMEOUT)
+            self.stats["connections"] += 1
+        return self.conn
+
+    def _post(self, method: str, body: bytes, content_type: str) -> dict:
+        """发送请求；429 按 retry_after 等待，连接错误和 5xx 指数退避后重连重试"""
+        for attempt in range(MAX_RETRIES + 1):
+            delay = min(2 ** attempt, 30)
+            try:
+                conn = self._connect()
+                conn.request("POST", f"{self.prefix}/{method}", body=body,
+                             headers={"Content-Type": content_type, "Connection": "keep-alive"})
+                resp = conn.getresponse()
+                raw = resp.read()
+                self.stats["requests"] += 1
+                if resp.getheader("Connection", "").lower() == "close":
+                    self.close()
+                try:
+                    data = json.loads(raw)
+                except ValueError:
+                    data = {"ok": False, "description": raw[:200].decode("utf-8", "replace")}
+                if resp.status == 429:
+                    delay = data.get("parameters", {}).get("retry_after", delay)
+                elif resp.status < 500:
+                    if not data.get("ok"):
+                        raise TelegramError(f"{method}: {resp.status} {data.get('description', '')}")
+                    return data
+            except (OSError, http.client.HTTPException):
+                self.close()
+            if attempt < MAX_RETRIES:
+                self.stats["retries"] += 1
+                self.stats["waited"] += delay
+                time.sleep(delay)
+        raise TelegramError(f"{method}: 重试 {MAX_RETRIES} 次后仍失败")
+
+    def send_message(self, text: str) -> dict:
+        body = urlencode({"chat_id": self.chat_id, "text": text,
+                          "disable_web_page_preview": "true"}).encode("utf-8")
+        return self._post("sendMessage", body, "application/x-www-form-urlencoded")
+
+    def send_document(self, filename: str, content: bytes, caption: str = "") -> dict:
+        boundary = uuid.uuid4().hex
+        parts = []
+        for name, value in (("chat_id", self.chat_id), ("caption", caption[:1024])):
+            parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n'
+                         f"{value}\r\n".encode("utf-8"))
+        parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="document"; '
+                     f'filename="{filename}"\r\nContent-Type: text/plain; charset=utf-8\r\n\r\n'
+                     .encode("utf-8") + content + b"\r\n")
+        parts.append(f"--{boundary}--\r\n".encode())
+        return self._post("sendDocument", b"".join(parts), f"multipart/form-data; boundary={boundary}")
+
+    def deliver(self, header: str, body: str = "", filename: str = "result.txt") -> dict:
+        """发送标题 + 正文：正文过长时只发标题和开头一段，完整内容作为文件上传"""
+        chunks = split_message(f"{header}\n\n{body}" if body else header)
+        if len(chunks) <= MAX_MESSAGES:
+            for chunk in chunks:
+                self.send_message(chunk)
+            return {"messages": len(chunks), "document": False}
+        preview = split_message(body, max(MESSAGE_LIMIT - len(header) - 40, 500))[0]
+        self.send_message(f"{header}\n\n{preview}\n\n…（完整结果见附件）")
+        self.send_document(filename, body.encode("utf-8"), caption=header)
+        return {"messages": 1, "document": True}
+
+    def close(self) -> None:
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="发送搜索结果到 Telegram")
+    parser.add_argument("--chat-id", default=os.environ.get("TELEGRAM_CHAT_ID", ""))
+    parser.add_argument("--text", help="消息标题 / 正文（未给出时读 stdin）")
+    parser.add_argument("--file", help="附加的结果文件，内容接在 --text 之后")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    token = load_token()
+    if not token or not args.chat_id:
+        return 0  # 未配置 Telegram 时静默跳过
+    header = args.text if args.text is not None else sys.stdin.read()
+    body = ""
+    filename = "result.txt"
+    if args.file:
+        with open(args.file, "r", encoding="utf-8", errors="ignore") as f:
+            body = f.read().strip()
+        filename = os.path.basename(args.file)
+
+    sender = TelegramSender(token, args.chat_id)
+    try:
+        result = sender.deliver(header.strip(), body, filename)
+    except TelegramError as e:
+        print(f"Telegram 发送失败: {e}", file=sys.stderr)
+        return 1
+    finally:
+        sender.close()
+    if args.verbose:
+        s = sender.stats
+        print(f"telegram: messages={result['messages']} document={result['document']} "
+              f"requests={s['requests']} connections={s['connections']} retries={s['retries']} "
+              f"waited={s['waited']:.1f}s", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
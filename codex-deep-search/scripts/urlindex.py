@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+"""
+URL 规范化与跨运行去重索引
+- canonicalize：统一 https、小写 host、去掉跟踪参数 / fragment / 末尾斜杠、还原 AMP 地址
+- UrlIndex：SQLite 记录见过的规范化 URL，前面挡一层 Bloom filter 省去大多数查询；
+  摘要 simhash 分段建索引，换了 URL 的转载内容也能识别为已见过
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import sys
+import time
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+RESULT_DIR = "/tmp/codex-search"
+INDEX_PATH = os.environ.get("CODEX_SEARCH_INDEX_DB", os.path.join(RESULT_DIR, "seen.sqlite"))
+
+TRACKING_PARAMS = {"fbclid", "gclid", "dclid", "yclid", "msclkid", "mc_cid", "mc_eid", "igshid",
+                   "spm", "share_token", "from_source", "ref_src", "amp"}
+TRACKING_PREFIXES = ("utm_", "_hs", "pk_", "mtm_")
+DEFAULT_PORTS = {":80", ":443"}
+# AMP 缓存：https://www.google.com/amp/s/example.com/a 、https://example-com.cdn.ampproject.org/c/s/example.com/a
+AMP_CACHE_RE = re.compile(r"^/(?:amp/|[cv]/)(s/)?(.+)$")
+
+# Bloom filter：约 100 万条时误判率 ~1%
+BLOOM_BITS = 1 << 23
+BLOOM_HASHES = 7
+
+SIMHASH_BITS = 64
+SIMHASH_BANDS = 4
+SIMHASH_DISTANCE = 3
+SIMHASH_MIN_TOKENS = 8
+TOKEN_RE = re.compile(r"[a-z0-9]+|[一-鿿]")
+
+
+def canonicalize(url: str) -> str:
+    """返回用于去重的规范化 URL；无法解析的原样返回"""
+    url = url.strip()
+    try:
+        parts = urlsplit(url)
+    except ValueError:
+        return url
+    if parts.scheme.lower() not in ("http", "https") or not parts.netloc:
+        return url
+
+    host = parts.netloc.lower().rsplit("@", 1)[-1]
+    for port in DEFAULT_PORTS:
+        if host.endswith(port):
+            host = host[:-len(port)]
+    path = parts.path
+
+    if host.endswith(".cdn.ampproject.org") or (host in ("www.google.com", "google.com")
+                                                and path.startswith("/amp/")):
+        m = AMP_CACHE_RE.match(path)
+        if m:
+            return canonicalize("https://" + m.group(2) + (f"?{parts.query}" if parts.query else ""))
+
+    if host.startswith("www."):
+        host = host[4:]
+    if host.startswith("amp."):
+        host = host[4:]
+    if path.endswith("/amp") or path.endswith("/amp/"):
+        path = path[:path.rstrip("/").rfind("/")]
+    elif path.startswith("/amp/"):
+        path = path[4:]
+    elif path.endswith(".amp.html"):
+        path = path[:-len(".amp.html")] + ".html"
+    path = re.sub(r"/{2,}", "/", path).rstrip("/")
+
+    query = [(k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+             if k.lower() not in TRACKING_PARAMS and not k.lower().startswith(TRACKING_PREFIXES)
+             and not (k == "outputType" and v == "amp")]
+    query.sort()
+    return urlunsplit(("https", host, path, urlencode(query), ""))
+
+
+def _hash64(data: str) -> int:
+    return int.from_bytes(hashlib.blake2b(data.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def simhash(text: str):
+    """摘要 simhash（英文按词、中文按字，取相邻二元组为特征）；文本过短返回 None"""
+    tokens = TOKEN_RE.findall(text.lower())
+    if len(tokens) < SIMHASH_MIN_TOKENS:
+        return None
+    weights = [0] * SIMHASH_BITS
+    for a, b in zip(tokens, tokens[1:]):
+        h = _hash64(a + " " + b)
+        for i in range(SIMHASH_BITS):
+            weights[i] += 1 if h >> i & 1 else -1
+    return sum(1 << i for i, w in enumerate(weights) if w > 0)
+
+
+def _bands(h: int) -> list:
+    width = SIMHASH_BITS // SIMHASH_BANDS
+    return [h >> (i * width) & ((1 << width) - 1) for i in range(SIMHASH_BANDS)]
+
+
+def _signed(h: int) -> int:
+    """SQLite INTEGER 为有符号 64 位"""
+    return h - (1 << 64) if h >= 1 << 63 else h
+
+
+class BloomFilter:
+    def __init__(self, bits: int = BLOOM_BITS, hashes: int = BLOOM_HASHES):
+        self.bits = bits
+        self.hashes = hashes
+        self.array = bytearray(bits // 8)
+        self.count = 0
+
+    def _positions(self, key: str):
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "big")
+        h2 = int.from_bytes(digest[8:], "big") | 1
+        return [(h1 + i * h2) % self.bits for i in range(self.hashes)]
+
+    def add(self, key: str) -> None:
+        for p in self._positions(key):
+            self.array[p >> 3] |= 1 << (p & 7)
+        self.count += 1
+
+    def __contains__(self, key: str) -> bool:
+        return all(self.array[p >> 3] & (1 << (p & 7)) for p in self._positions(key))
+
+    def save(self, path: str) -> None:
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(f"{self.bits} {self.hashes} {self.count}\n".encode())
+            f.write(self.array)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str):
+        try:
+            with open(path, "rb") as f:
+                bits, hashes, count = map(int, f.readline().split())
+                bloom = cls(bits, hashes)
+                data = f.read()
+        except (OSError, ValueError):
+            return None
+        if len(data) != len(bloom.array):
+            return None
+        bloom.array = bytearray(data)
+        bloom.count = count
+        return bloom
+
+
+class UrlIndex:
+    """跨运行的已见 URL / 摘要索引"""
+
+    def __init__(self, path: str = INDEX_PATH):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self.bloom_path = path + ".bloom"
+        # fanout 模式下多个子查询会同时写入
+        self.db = sqlite3.connect(path, timeout=30)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS urls ("
+            " url TEXT PRIMARY KEY, task TEXT, first_seen REAL NOT NULL,"
+            " last_seen REAL NOT NULL, hits INTEGER NOT NULL DEFAULT 1)"
+        )
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS snippets ("
+            " hash INTEGER NOT NULL, url TEXT NOT NULL,"
+            + "".join(f" b{i} INTEGER NOT NULL," for i in range(SIMHASH_BANDS))
+            + " PRIMARY KEY (hash, url))"
+        )
+        for i in range(SIMHASH_BANDS):
+            self.db.execute(f"CREATE INDEX IF NOT EXISTS idx_snippets_b{i} ON snippets(b{i})")
+        self.db.commit()
+        self.stats = {"checked": 0, "new": 0, "bloom_skips": 0, "db_lookups": 0, "near_dups": 0}
+        self.dirty = False
+        self.bloom = self._load_bloom()
+
+    def _load_bloom(self) -> BloomFilter:
+        total = self.db.execute("SELECT COUNT(*) FROM urls").fetchone()[0]
+        bloom = BloomFilter.load(self.bloom_path)
+        if bloom is None or bloom.count != total:
+            # 文件缺失或与数据库不一致（如被其他进程更新过）时重建
+            bloom = BloomFilter()
+            for (url,) in self.db.execute("SELECT url FROM urls"):
+                bloom.add(url)
+            self.dirty = True
+        return bloom
+
+    def seen(self, url: str) -> bool:
+        if url not in self.bloom:
+            self.stats["bloom_skips"] += 1
+            return False
+        self.stats["db_lookups"] += 1
+        return self.db.execute("SELECT 1 FROM urls WHERE url = ?", (url,)).fetchone() is not None
+
+    def near_duplicate(self, h: int, url: str, pending: list = ()):
+        """返回摘要相近的已见 URL（不同于 url），没有则 None；pending 为本批尚未入库的 (hash, url)"""
+        for other, other_url in pending:
+            if other_url != url and bin(other ^ h).count("1") <= SIMHASH_DISTANCE:
+                return other_url
+        bands = _bands(h)
+        clause = " OR ".join(f"b{i} = ?" for i in range(SIMHASH_BANDS))
+        for other, other_url in self.db.execute(
+                f"SELECT hash, url FROM snippets WHERE ({clause}) AND url != ?", (*bands, url)):
+            if bin((other & (1 << 64) - 1) ^ h).count("1") <= SIMHASH_DISTANCE:
+                return other_url
+        return None
+
+    def annotate(self, items: list, task: str = "") -> list:
+        """补充 canonical_url / is_new（转载内容另附 near_duplicate_of），同一批内按规范化 URL 去重，
+        并把本批记入索引"""
+        now = time.time()
+        result = []
+        batch = set()
+        hashes = []
+        for item in items:
+            url = item.get("url", "")
+            canonical = canonicalize(url) if url else ""
+            if canonical and canonical in batch:
+                continue
+            batch.add(canonical)
+            item = dict(item, canonical_url=canonical)
+            self.stats["checked"] += 1
+            is_new = bool(canonical) and not self.seen(canonical)
+            h = simhash(item.get("snippet", ""))
+            if h is not None:
+                dup = self.near_duplicate(h, canonical, hashes)
+                if dup:
+                    item["near_duplicate_of"] = dup
+                    self.stats["near_dups"] += 1
+                    is_new = False
+                hashes.append((h, canonical))
+            item["is_new"] = is_new
+            self.stats["new"] += is_new
+            result.append(item)
+
+        with self.db:
+            for canonical in batch:
+                if not canonical:
+                    continue
+                cur = self.db.execute(
+                    "INSERT OR IGNORE INTO urls (url, task, first_seen, last_seen) VALUES (?, ?, ?, ?)",
+                    (canonical, task, now, now),
+                )
+                if cur.rowcount:
+                    self.bloom.add(canonical)
+                    self.dirty = True
+                else:
+                    self.db.execute("UPDATE urls SET last_seen = ?, hits = hits + 1 WHERE url = ?",
+                                    (now, canonical))
+            self.db.executemany(
+                "INSERT OR IGNORE INTO snippets VALUES (?, ?" + ", ?" * SIMHASH_BANDS + ")",
+                [(_signed(h), url, *_bands(h)) for h, url in hashes],
+            )
+        return result
+
+    def summary(self) -> str:
+        s = self.stats
+        return (f"urlindex: checked={s['checked']} new={s['new']} near_dups={s['near_dups']} "
+                f"bloom_skips={s['bloom_skips']} db_lookups={s['db_lookups']} "
+                f"indexed={self.bloom.count}")
+
+    def close(self) -> None:
+        if self.dirty:
+            self.bloom.save(self.bloom_path)
+        self.db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="URL 规范化与已见索引")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("canon", help="打印规范化 URL")
+    p.add_argument("urls", nargs="+")
+    p = sub.add_parser("annotate", help="为 sidecar 的 items 标注 is_new 并记入索引")
+    p.add_argument("sidecar")
+    p.add_argument("--index", default=INDEX_PATH)
+    p = sub.add_parser("stats", help="索引统计")
+    p.add_argument("--index", default=INDEX_PATH)
+    args = parser.parse_args()
+
+    if args.command == "canon":
+        for url in args.urls:
+            print(canonicalize(url))
+        return
+
+    index = UrlIndex(args.index)
+    try:
+        if args.command == "annotate":
+            with open(args.sidecar, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            data["items"] = index.annotate(data.get("items", []), data.get("task_name", ""))
+            with open(args.sidecar, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False, indent=2)
+            print(index.summary(), file=sys.stderr)
+        else:
+            urls = index.db.execute("SELECT COUNT(*) FROM urls").fetchone()[0]
+            snippets = index.db.execute("SELECT COUNT(*) FROM snippets").fetchone()[0]
+            print(f"{index.path}: urls={urls} snippets={snippets}")
+    finally:
+        index.close()
+
+
+if __name__ == "__main__":
+    main()
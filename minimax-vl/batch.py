@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+MiniMax VL 批量模式
+目录 / glob / 清单文件 → 有界线程池并发理解图片，结果按 JSONL 流式写出，可断点续跑
+"""
+
+import glob
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+IMAGE_EXTS = {".jpg", ".jpeg", ".png", ".webp", ".gif", ".bmp", ".tif", ".tiff", ".heic"}
+
+
+def is_image(path: str) -> bool:
+    return os.path.splitext(path)[1].lower() in IMAGE_EXTS
+
+
+def collect_items(sources: list, prompt: str) -> list:
+    """展开输入源为 [{"path", "prompt"}]，保持输入顺序并去重
+
+    - 目录：递归收集图片
+    - glob：如 "shots/**/*.png"
+    - 清单：.txt 每行一个路径；.jsonl 每行 {"path": ..., "prompt": ...}
+    """
+    items = []
+    seen = set()
+
+    def add(path, item_prompt=None):
+        path = os.path.abspath(os.path.expanduser(path))
+        key = (path, item_prompt or prompt)
+        if key not in seen:
+            seen.add(key)
+            items.append({"path": path, "prompt": item_prompt or prompt})
+
+    for source in sources:
+        source = os.path.expanduser(source)
+        if os.path.isdir(source):
+            for root, dirs, files in os.walk(source):
+                dirs.sort()
+                for name in sorted(files):
+                    if is_image(name):
+                        add(os.path.join(root, name))
+        elif any(ch in source for ch in "*?["):
+            for path in sorted(glob.glob(source, recursive=True)):
+                if os.path.isfile(path) and is_image(path):
+                    add(path)
+        elif os.path.isfile(source) and not is_image(source):
+            base = os.path.dirname(os.path.abspath(source))
+            with open(source, "r", encoding="utf-8") as f:
+                for lineno, line in enumerate(f, 1):
+                    line = line.strip()
+                    if not line or line.startswith("#"):
+                        continue
+                    if line.startswith("{"):
+                        try:
+                            entry = json.loads(line)
+                        except ValueError as e:
+                            print(f"Warning: 跳过无法解析的清单行 {source}:{lineno}（{e}）", file=sys.stderr)
+                            continue
+                        path, item_prompt = entry.get("path", ""), entry.get("prompt")
+                        if not isinstance(path, str) or not isinstance(item_prompt, (str, type(None))):
+                            print(f"Warning: 跳过字段类型不对的清单行 {source}:{lineno}", file=sys.stderr)
+                            continue
+                    else:
+                        path, item_prompt = line, None
+                    if path:
+                        add(os.path.join(base, os.path.expanduser(path)), item_prompt)
+        elif os.path.isfile(source):
+            add(source)
+        else:
+            print(f"Warning: 跳过不存在的输入: {source}", file=sys.stderr)
+    return items
+
+
+def load_done(output: str) -> set:
+    """读取已有输出中成功完成的 (path, prompt)，用于断点续跑"""
+    done = set()
+    if not os.path.exists(output):
+        return done
+    with open(output, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue  # 中断时可能留下半行
+            if not record.get("error"):
+                done.add((record.get("path"), record.get("prompt")))
+    return done
+
+
+def process_item(item: dict, describe, timeout: float, retries: int) -> dict:
+    """处理单张图片，失败按指数退避重试（describe(path, prompt, timeout)）"""
+    start = time.perf_counter()
+    error = ""
+    output = ""
+    attempts = 0
+    for attempt in range(retries + 1):
+        attempts = attempt + 1
+        try:
+            output = describe(item["path"], item["prompt"], timeout)
+            error = ""
+            break
+        except Exception as e:
+            error = str(e) or type(e).__name__
+            if attempt < retries:
+                time.sleep(min(2 ** attempt, 10))
+    return {
+        "path": item["path"],
+        "prompt": item["prompt"],
+        "output": output,
+        "latency": round(time.perf_counter() - start, 3),
+        "error": error,
+        "attempts": attempts,
+    }
+
+
+def run_batch(items: list, output: str, describe, workers: int = 4,
+              timeout: float = 60, retries: int = 2, verbose: bool = False,
+              prepare=None, dedup=None) -> dict:
+    """并发处理并流式写出 JSONL，返回统计
+
+    prepare(paths) 可选：在提交前对待处理图片统一做预处理（如进程池压缩）
+    dedup(items) 可选：返回 {重复项下标: 代表项下标}，重复项直接复用代表项的结果
+    """
+    done = load_done(output)
+    pending = [it for it in items if (it["path"], it["prompt"]) not in done]
+    stats = {"total": len(items), "skipped": len(items) - len(pending), "ok": 0, "failed": 0,
+             "deduped": 0}
+
+    duplicates = dedup(pending) if dedup is not None and pending else {}
+    followers = {}
+    for dup, rep in duplicates.items():
+        followers.setdefault(rep, []).append(dup)
+    stats["deduped"] = len(duplicates)
+    todo = [i for i in range(len(pending)) if i not in duplicates]
+
+    if prepare is not None and todo:
+        prepare([pending[i]["path"] for i in todo])
+
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    lock = threading.Lock()
+    start = time.perf_counter()
+    with open(output, "a", encoding="utf-8") as out, \
+            ThreadPoolExecutor(max_workers=max(workers, 1)) as pool:
+        futures = {pool.submit(process_item, pending[i], describe, timeout, retries): i for i in todo}
+        for fut in as_completed(futures):
+            record = fut.result()
+            records = [record]
+            for dup in followers.get(futures[fut], []):
+                records.append({
+                    "path": pending[dup]["path"],
+                    "prompt": pending[dup]["prompt"],
+                    "output": record["output"],
+                    "latency": 0.0,
+                    "error": f"dedup source failed: {record['error']}" if record["error"] else "",
+                    "attempts": 0,
+                    "dedup_of": record["path"],
+                })
+            with lock:
+                for r in records:
+                    out.write(json.dumps(r, ensure_ascii=False) + "\n")
+                out.flush()
+            for r in records:
+                stats["failed" if r["error"] else "ok"] += 1
+                if verbose:
+                    status = "ERR" if r["error"] else ("dup" if r.get("dedup_of") else "ok")
+                    print(f"[{stats['ok'] + stats['failed']}/{len(pending)}] {status} "
+                          f"{r['latency']:.2f}s {r['path']}", file=sys.stderr)
+
+    stats["elapsed"] = round(time.perf_counter() - start, 2)
+    return stats
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+图片理解结果缓存
+键 = SHA-256(图片字节) + 提示词 + 模型 host；SQLite 存储，按总大小做 LRU 淘汰并支持 TTL
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+CACHE_DIR = os.path.expanduser(os.environ.get("MINIMAX_VL_CACHE_DIR", "~/.cache/minimax-vl"))
+CACHE_MAX_BYTES = int(os.environ.get("MINIMAX_VL_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+CACHE_TTL = float(os.environ.get("MINIMAX_VL_CACHE_TTL", str(7 * 24 * 3600)))
+
+
+def file_digest(path: str) -> str:
+    """流式计算文件 SHA-256"""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def cache_key(image_digest: str, prompt: str, host: str) -> str:
+    return hashlib.sha256(f"{image_digest}\0{prompt}\0{host}".encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    """线程安全的 SQLite 结果缓存"""
+
+    def __init__(self, path: str = None, max_bytes: int = CACHE_MAX_BYTES, ttl: float = CACHE_TTL):
+        path = path or os.path.join(CACHE_DIR, "results.sqlite")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "expired": 0, "evicted": 0, "hit_seconds": 0.0}
+        self.db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            " key TEXT PRIMARY KEY, output TEXT NOT NULL, size INTEGER NOT NULL,"
+            " created REAL NOT NULL, accessed REAL NOT NULL)"
+        )
+        self.db.execute("CREATE INDEX IF NOT EXISTS idx_results_accessed ON results(accessed)")
+
+    def get(self, key: str):
+        start = time.perf_counter()
+        now = time.time()
+        with self.lock:
+            row = self.db.execute("SELECT output, created FROM results WHERE key = ?", (key,)).fetchone()
+            if row and self.ttl > 0 and now - row[1] > self.ttl:
+                self.db.execute("DELETE FROM results WHERE key = ?", (key,))
+                self.stats["expired"] += 1
+                row = None
+            if row is None:
+                self.stats["misses"] += 1
+                return None
+            self.db.execute("UPDATE results SET accessed = ? WHERE key = ?", (now, key))
+            self.stats["hits"] += 1
+            self.stats["hit_seconds"] += time.perf_counter() - start
+            return row[0]
+
+    def put(self, key: str, output: str) -> None:
+        now = time.time()
+        size = len(output.encode("utf-8"))
+        with self.lock:
+            self.db.execute(
+                "INSERT OR REPLACE INTO results (key, output, size, created, accessed) VALUES (?, ?, ?, ?, ?)",
+                (key, output, size, now, now),
+            )
+            self._evict()
+
+    def _evict(self) -> None:
+        """超出容量时按最近访问时间淘汰最旧的条目"""
+        total = self.db.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        freed = 0
+        victims = []
+        for key, size in self.db.execute("SELECT key, size FROM results ORDER BY accessed"):
+            if total - freed <= self.max_bytes:
+                break
+            victims.append((key,))
+            freed += size
+        self.db.executemany("DELETE FROM results WHERE key = ?", victims)
+        self.stats["evicted"] += len(victims)
+
+    def summary(self) -> str:
+        s = self.stats
+        lookups = s["hits"] + s["misses"]
+        rate = s["hits"] / lookups if lookups else 0.0
+        avg_ms = s["hit_seconds"] / s["hits"] * 1000 if s["hits"] else 0.0
+        return (f"cache: hits={s['hits']} misses={s['misses']} hit_rate={rate:.0%} "
+                f"expired={s['expired']} evicted={s['evicted']} avg_hit={avg_ms:.2f}ms ({self.path})")
+
+    def close(self) -> None:
+        with self.lock:
+            self.db.close()
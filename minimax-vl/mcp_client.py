@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+MCP stdio 客户端
+常驻启动 MCP server 子进程，复用同一会话发起多次 tools/call（JSON-RPC 2.0，按行分隔）
+"""
+
+import itertools
+import json
+import os
+import queue
+import subprocess
+import threading
+import time
+from collections import deque
+
+PROTOCOL_VERSION = "2024-11-05"
+CLIENT_INFO = {"name": "minimax-vl", "version": "1.0"}
+
+
+class McpError(Exception):
+    """MCP 调用失败（服务端返回错误或会话已断开）"""
+
+
+class McpClient:
+    """单个 MCP server 子进程上的长连接会话，可被多个线程并发使用"""
+
+    def __init__(self, command: list, env: dict = None, startup_timeout: float = 120):
+        self.command = command
+        self.env = env
+        self.startup_timeout = startup_timeout
+        self.proc = None
+        self.pending = {}
+        self.ids = itertools.count(1)
+        self.write_lock = threading.Lock()
+        self.stderr_tail = deque(maxlen=50)
+        self.last_ok = 0.0
+        self.eof = threading.Event()
+
+    def start(self) -> None:
+        """启动子进程并完成 initialize 握手"""
+        self.proc = subprocess.Popen(
+            self.command,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            env={**os.environ, **(self.env or {})},
+            text=True,
+            encoding="utf-8",
+            bufsize=1,
+        )
+        threading.Thread(target=self._read_stdout, daemon=True).start()
+        threading.Thread(target=self._read_stderr, daemon=True).start()
+
+        self.request("initialize", {
+            "protocolVersion": PROTOCOL_VERSION,
+            "capabilities": {},
+            "clientInfo": CLIENT_INFO,
+        }, timeout=self.startup_timeout)
+        self._send({"jsonrpc": "2.0", "method": "notifications/initialized"})
+
+    def alive(self) -> bool:
+        return self.proc is not None and not self.eof.is_set() and self.proc.poll() is None
+
+    def close(self) -> None:
+        if self.proc is None:
+            return
+        try:
+            self.proc.stdin.close()
+            self.proc.wait(timeout=3)
+        except (OSError, subprocess.TimeoutExpired):
+            self.proc.kill()
+            self.proc.wait()
+        self.proc = None
+        self._fail_pending("会话已关闭")
+
+    def ping(self, timeout: float = 5) -> bool:
+        try:
+            self.request("ping", {}, timeout=timeout)
+            return True
+        except (McpError, TimeoutError):
+            return False
+
+    def call_tool(self, name: str, arguments: dict, timeout: float = 60) -> str:
+        """调用工具，返回拼接后的文本内容"""
+        result = self.request("tools/call", {"name": name, "arguments": arguments}, timeout=timeout)
+        text = "\n".join(
+            item.get("text", "") for item in result.get("content", []) if item.get("type") == "text"
+        ).strip()
+        if result.get("isError"):
+            raise McpError(text or "tool returned error")
+        return text
+
+    def request(self, method: str, params: dict, timeout: float = 60) -> dict:
+        if not self.alive():
+            raise McpError("MCP server 未运行")
+        req_id = next(self.ids)
+        slot = queue.Queue(maxsize=1)
+        self.pending[req_id] = slot
+        try:
+            self._send({"jsonrpc": "2.0", "id": req_id, "method": method, "params": params})
+            if self.eof.is_set():
+                raise McpError("MCP server 已退出")
+            try:
+                message = slot.get(timeout=timeout)
+            except queue.Empty:
+                raise TimeoutError(f"{method} 超时（{timeout}s）")
+        finally:
+            self.pending.pop(req_id, None)
+
+        if "error" in message:
+            err = message["error"] or {}
+            raise McpError(err.get("message") or str(err))
+        self.last_ok = time.monotonic()
+        return message.get("result") or {}
+
+    def _send(self, message: dict) -> None:
+        try:
+            with self.write_lock:
+                self.proc.stdin.write(json.dumps(message, ensure_ascii=False) + "\n")
+                self.proc.stdin.flush()
+        except (OSError, ValueError, AttributeError) as e:
+            raise McpError(f"写入 MCP server 失败: {e}")
+
+    def _read_stdout(self) -> None:
+        proc = self.proc
+        for line in proc.stdout:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                message = json.loads(line)
+            except ValueError:
+                continue
+            if "method" in message:
+                # 服务端发来的 ping 等请求：回空结果；通知忽略
+                if "id" in message:
+                    try:
+                        self._send({"jsonrpc": "2.0", "id": message["id"], "result": {}})
+                    except McpError:
+                        pass
+                continue
+            slot = self.pending.get(message.get("id"))
+            if slot is not None:
+                slot.put(message)
+        self.eof.set()
+        self._fail_pending("MCP server 已退出: " + " | ".join(list(self.stderr_tail)[-3:]))
+
+    def _read_stderr(self) -> None:
+        for line in self.proc.stderr:
+            self.stderr_tail.append(line.rstrip())
+
+    def _fail_pending(self, reason: str) -> None:
+        for slot in list(self.pending.values()):
+            try:
+                slot.put_nowait({"error": {"message": reason}})
+            except queue.Full:
+                pass
+
+
+class ManagedClient:
+    """带健康检查与自动重启的 McpClient 包装"""
+
+    def __init__(self, command: list, env: dict = None, idle_check: float = 30):
+        self.command = command
+        self.env = env
+        self.idle_check = idle_check
+        self.client = None
+        self.restarts = 0
+        self.lock = threading.Lock()
+
+    def _ensure(self) -> McpClient:
+        with self.lock:
+            client = self.client
+            healthy = client is not None and client.alive()
+            # 空闲较久后先 ping 一次，避免把请求发给僵死的 server
+            if healthy and time.monotonic() - client.last_ok > self.idle_check:
+                healthy = client.ping()
+            if not healthy:
+                if client is not None:
+                    client.close()
+                    self.client = None
+                    self.restarts += 1
+                client = McpClient(self.command, self.env)
+                try:
+                    client.start()
+                except BaseException:
+                    # 握手超时或失败时结束已启动的 server，避免每次重试泄漏一个进程
+                    client.close()
+                    raise
+                self.client = client
+            return client
+
+    def call_tool(self, name: str, arguments: dict, timeout: float = 60) -> str:
+        """调用工具；会话断开时重启 server 并重试一次"""
+        client = self._ensure()
+        try:
+            return client.call_tool(name, arguments, timeout=timeout)
+        except McpError:
+            if client.alive():
+                raise
+        return self._ensure().call_tool(name, arguments, timeout=timeout)
+
+    def close(self) -> None:
+        with self.lock:
+            if self.client is not None:
+                self.client.close()
+                self.client = None
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+感知哈希近似去重
+aHash / dHash / pHash 以 NumPy 批量计算，BK-tree 按汉明距离检索已分析过的相似图片
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import numpy as np
+    from PIL import Image
+    PHASH_AVAILABLE = True
+except ImportError:
+    PHASH_AVAILABLE = False
+
+HASH_SIZE = 8
+# 各算法需要的缩略图尺寸 (宽, 高)
+SAMPLE_SIZES = {"ahash": (8, 8), "dhash": (9, 8), "phash": (32, 32)}
+
+
+def load_sample(path: str, method: str = "phash"):
+    """读取并缩放为灰度小图（在子进程中执行），失败返回 None"""
+    try:
+        with Image.open(path) as img:
+            img.draft("L", SAMPLE_SIZES[method])
+            small = img.convert("L").resize(SAMPLE_SIZES[method], Image.LANCZOS)
+            return np.asarray(small, dtype=np.float32)
+    except (OSError, ValueError):
+        return None
+
+
+def _dct_matrix(n: int):
+    k = np.arange(n)[:, None]
+    x = np.arange(n)[None, :]
+    m = np.cos(np.pi * (2 * x + 1) * k / (2 * n))
+    m[0] *= 1 / np.sqrt(2)
+    return m * np.sqrt(2 / n)
+
+
+def compute_hashes(samples, method: str = "phash") -> list:
+    """对 (N, H, W) 灰度样本批量计算 64 位哈希，返回 int 列表"""
+    if method == "ahash":
+        bits = samples > samples.mean(axis=(1, 2), keepdims=True)
+    elif method == "dhash":
+        bits = samples[:, :, 1:] > samples[:, :, :-1]
+    elif method == "phash":
+        d = _dct_matrix(samples.shape[1])
+        coeffs = (d @ samples @ d.T)[:, :HASH_SIZE, :HASH_SIZE].reshape(len(samples), -1)
+        # 中位数不含直流分量
+        median = np.median(coeffs[:, 1:], axis=1, keepdims=True)
+        bits = coeffs > median
+    else:
+        raise ValueError(f"unknown hash method: {method}")
+    packed = np.packbits(bits.reshape(len(samples), -1), axis=1)
+    return [int.from_bytes(row.tobytes(), "big") for row in packed]
+
+
+def hash_images(paths: list, method: str = "phash", workers: int = None) -> dict:
+    """进程池读取缩略图后批量计算哈希，返回 {path: hash 或 None}"""
+    if not PHASH_AVAILABLE or not paths:
+        return {p: None for p in paths}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        samples = list(pool.map(load_sample, paths, [method] * len(paths), chunksize=8))
+    valid = [i for i, s in enumerate(samples) if s is not None]
+    hashes = {p: None for p in paths}
+    if valid:
+        for i, h in zip(valid, compute_hashes(np.stack([samples[i] for i in valid]), method)):
+            hashes[paths[i]] = h
+    return hashes
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+class BKTree:
+    """汉明距离 BK-tree：节点为 [hash, value, {distance: child}]"""
+
+    def __init__(self):
+        self.root = None
+        self.size = 0
+
+    def add(self, h: int, value) -> None:
+        self.size += 1
+        if self.root is None:
+            self.root = [h, value, {}]
+            return
+        node = self.root
+        while True:
+            d = hamming(h, node[0])
+            child = node[2].get(d)
+            if child is None:
+                node[2][d] = [h, value, {}]
+                return
+            node = child
+
+    def search(self, h: int, threshold: int) -> list:
+        """返回距离不超过 threshold 的 [(distance, value)]，按距离升序"""
+        found = []
+        stack = [self.root] if self.root else []
+        while stack:
+            node = stack.pop()
+            d = hamming(h, node[0])
+            if d <= threshold:
+                found.append((d, node[1]))
+            for dist, child in node[2].items():
+                if d - threshold <= dist <= d + threshold:
+                    stack.append(child)
+        found.sort(key=lambda x: x[0])
+        return found
+
+
+def group_near_duplicates(items: list, threshold: int, method: str = "phash",
+                          workers: int = None) -> dict:
+    """按输入顺序聚类，返回 {重复项下标: 代表项下标}
+
+    每个提示词单独一棵树：只有提示词相同的近似图片才复用结果。
+    """
+    hashes = hash_images([it["path"] for it in items], method, workers)
+    trees = {}
+    duplicates = {}
+    for i, item in enumerate(items):
+        h = hashes.get(item["path"])
+        if h is None:
+            continue
+        tree = trees.setdefault(item["prompt"], BKTree())
+        match = tree.search(h, threshold)
+        if match:
+            duplicates[i] = match[0][1]
+        else:
+            tree.add(h, i)
+    return duplicates
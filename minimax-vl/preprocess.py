@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+上传前图片预处理
+限制长边、重新压缩为 JPEG/WebP 并去除 EXIF；小图直接跳过。批量时用进程池并行。
+prepared/ 目录与结果缓存一样按 TTL 过期、按总大小做 LRU 淘汰（复用时刷新 mtime 作为访问时间）
+"""
+
+import hashlib
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    from PIL import Image, ImageOps
+    PIL_AVAILABLE = True
+except ImportError:
+    PIL_AVAILABLE = False
+
+from cache import CACHE_DIR, CACHE_TTL, file_digest
+
+MAX_EDGE = int(os.environ.get("MINIMAX_VL_MAX_EDGE", "2048"))
+QUALITY = int(os.environ.get("MINIMAX_VL_QUALITY", "85"))
+FORMAT = os.environ.get("MINIMAX_VL_FORMAT", "jpeg").lower()
+# 小于该字节数且长边不超限的图片不处理
+SKIP_BYTES = int(os.environ.get("MINIMAX_VL_SKIP_BYTES", str(300 * 1024)))
+PREPARED_DIR = os.path.join(CACHE_DIR, "prepared")
+PREPARED_MAX_BYTES = int(os.environ.get("MINIMAX_VL_PREPARED_MAX_BYTES", str(512 * 1024 * 1024)))
+# 写到一半被中断的临时文件超过该时长视为残留
+STALE_TMP_SECONDS = 3600
+
+EXTENSIONS = {"jpeg": ".jpg", "webp": ".webp"}
+
+
+def _result(path: str, original: int, size: int, reason: str) -> dict:
+    return {"path": path, "original_bytes": original, "bytes": size,
+            "saved": original - size, "reason": reason}
+
+
+def prepare_image(path: str, max_edge: int = MAX_EDGE, quality: int = QUALITY,
+                  fmt: str = FORMAT) -> dict:
+    """返回 {path, original_bytes, bytes, saved, reason}；path 为实际上传的文件"""
+    original = os.path.getsize(path)
+    if not PIL_AVAILABLE:
+        return _result(path, original, original, "pillow-missing")
+    if fmt not in EXTENSIONS:
+        raise ValueError(f"unsupported format: {fmt}")
+
+    # 输出按原图内容 + 参数命名，重复预处理直接复用
+    tag = hashlib.sha256(f"{file_digest(path)}:{max_edge}:{quality}:{fmt}".encode()).hexdigest()
+    out_path = os.path.join(PREPARED_DIR, tag[:2], tag + EXTENSIONS[fmt])
+    if os.path.exists(out_path):
+        try:
+            os.utime(out_path)  # 记录访问时间，LRU 淘汰据此排序
+        except OSError:
+            pass
+        return _result(out_path, original, os.path.getsize(out_path), "reused")
+
+    try:
+        with Image.open(path) as img:
+            if getattr(img, "is_animated", False):
+                return _result(path, original, original, "animated")
+            if original <= SKIP_BYTES and max(img.size) <= max_edge:
+                return _result(path, original, original, "small")
+
+            img = ImageOps.exif_transpose(img)
+            if max(img.size) > max_edge:
+                img.thumbnail((max_edge, max_edge), Image.LANCZOS)
+
+            if fmt == "jpeg" and img.mode not in ("RGB", "L"):
+                rgba = img.convert("RGBA")
+                img = Image.new("RGB", rgba.size, (255, 255, 255))
+                img.paste(rgba, mask=rgba.split()[-1])
+            elif fmt == "webp" and img.mode not in ("RGB", "RGBA"):
+                img = img.convert("RGBA" if "A" in img.getbands() else "RGB")
+
+            os.makedirs(os.path.dirname(out_path), exist_ok=True)
+            tmp_path = f"{out_path}.{os.getpid()}.tmp"
+            # 不传 exif 参数即丢弃原图 EXIF
+            img.save(tmp_path, format=fmt.upper(), quality=quality, optimize=True)
+    except (OSError, Image.DecompressionBombError):
+        return _result(path, original, original, "unreadable")
+
+    size = os.path.getsize(tmp_path)
+    if size >= original:
+        os.unlink(tmp_path)
+        return _result(path, original, original, "no-gain")
+    os.replace(tmp_path, out_path)
+    return _result(out_path, original, size, "recompressed")
+
+
+def _unlink(path: str) -> int:
+    try:
+        os.unlink(path)
+        return 1
+    except OSError:
+        return 0
+
+
+def prune_prepared(root: str = PREPARED_DIR, max_bytes: int = PREPARED_MAX_BYTES,
+                   ttl: float = CACHE_TTL) -> dict:
+    """删除超过 TTL 的预处理结果与残留临时文件，总大小仍超出 max_bytes 时按 mtime 从旧到新淘汰"""
+    now = time.time()
+    files = []
+    removed = freed = 0
+    for dirpath, _, names in os.walk(root):
+        for name in names:
+            path = os.path.join(dirpath, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            age = now - st.st_mtime
+            if (ttl > 0 and age > ttl) or (name.endswith(".tmp") and age > STALE_TMP_SECONDS):
+                removed += _unlink(path)
+                freed += st.st_size
+            elif not name.endswith(".tmp"):
+                files.append((st.st_mtime, st.st_size, path))
+    total = sum(size for _, size, _ in files)
+    for _, size, path in sorted(files):
+        if total <= max_bytes:
+            break
+        removed += _unlink(path)
+        freed += size
+        total -= size
+    return {"removed": removed, "freed": freed, "bytes": total}
+
+
+_pruned = False
+
+
+def prune_once() -> None:
+    """每个进程在首次预处理前清理一次；放在预处理之前，本次要上传的文件不会被删"""
+    global _pruned
+    if not _pruned:
+        _pruned = True
+        prune_prepared()
+
+
+def prepare_many(paths: list, workers: int = None, **options) -> dict:
+    """用进程池批量预处理，返回 {原路径: prepare_image 结果}"""
+    paths = list(dict.fromkeys(paths))
+    if not paths:
+        return {}
+    if not PIL_AVAILABLE or len(paths) == 1:
+        return {p: prepare_image(p, **options) for p in paths}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {p: pool.submit(prepare_image, p, **options) for p in paths}
+        results = {}
+        for p, fut in futures.items():
+            try:
+                results[p] = fut.result()
+            except Exception:
+                size = os.path.getsize(p) if os.path.exists(p) else 0
+                results[p] = _result(p, size, size, "error")
+        return results
+
+
+def summarize(results) -> str:
+    """汇总节省的字节数"""
+    results = list(results)
+    original = sum(r["original_bytes"] for r in results)
+    saved = sum(r["saved"] for r in results)
+    changed = sum(1 for r in results if r["reason"] in ("recompressed", "reused"))
+    pct = saved / original if original else 0.0
+    return (f"preprocess: {changed}/{len(results)} 张压缩，"
+            f"{original / 1e6:.1f}MB → {(original - saved) / 1e6:.1f}MB（节省 {pct:.0%}）")
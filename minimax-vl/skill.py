@@ -1,62 +1,190 @@
 #!/usr/bin/env python3
 """
 MiniMax VL - 图片理解工具
-通过 MiniMax MCP 调用视觉模型
+通过 MiniMax MCP 调用视觉模型（常驻 MCP 会话，多次调用复用同一个 server 进程）
 """
 
+import argparse
+import atexit
 import os
+import shlex
 import sys
-import subprocess
+import threading
+
+import cache
+import preprocess
+from mcp_client import ManagedClient
 
 API_KEY = os.environ.get("MINIMAX_API_KEY", "")
 API_HOST = os.environ.get("MINIMAX_API_HOST", "https://api.minimaxi.com")
+MCP_COMMAND = shlex.split(os.environ.get("MINIMAX_MCP_COMMAND", "uvx minimax-coding-plan-mcp"))
+CALL_TIMEOUT = 60
+DEFAULT_PROMPT = "请描述这张图片"
 
-def understand_image(image_path, prompt="请描述这张图片"):
-    """调用 MiniMax MCP 理解图片"""
+_session = None
+_cache = None
+_init_lock = threading.Lock()
+CACHE_ENABLED = os.environ.get("MINIMAX_VL_CACHE", "1") != "0"
+PREPROCESS_ENABLED = os.environ.get("MINIMAX_VL_PREPROCESS", "1") != "0"
+PREPROCESS_OPTIONS = {}
+# 原路径 -> 预处理结果（批量模式由进程池预先填充）
+_prepared = {}
+
+
+def get_session() -> ManagedClient:
+    """获取（必要时创建）常驻 MCP 会话"""
+    global _session
+    with _init_lock:
+        if _session is None:
+            _session = ManagedClient(
+                MCP_COMMAND,
+                env={"MINIMAX_API_KEY": API_KEY, "MINIMAX_API_HOST": API_HOST},
+            )
+            atexit.register(_session.close)
+    return _session
+
+
+def get_cache():
+    """获取结果缓存（禁用时返回 None）"""
+    global _cache
+    with _init_lock:
+        if _cache is None and CACHE_ENABLED:
+            _cache = cache.ResultCache()
+            atexit.register(_cache.close)
+    return _cache
+
+
+def prepare_upload(image_path):
+    """返回实际上传的路径（本地大图先缩放/重压缩）"""
+    if not PREPROCESS_ENABLED or not os.path.isfile(image_path):
+        return image_path
+    if image_path not in _prepared:
+        preprocess.prune_once()
+        _prepared[image_path] = preprocess.prepare_image(image_path, **PREPROCESS_OPTIONS)
+    return _prepared[image_path]["path"]
 
+
+def prepare_batch(paths):
+    """批量模式：用进程池一次性预处理全部待处理图片"""
+    if PREPROCESS_ENABLED:
+        preprocess.prune_once()
+        _prepared.update(preprocess.prepare_many(paths, **PREPROCESS_OPTIONS))
+
+
+def describe_image(image_path, prompt=DEFAULT_PROMPT, timeout=CALL_TIMEOUT):
+    """调用 MiniMax MCP 理解图片，失败时抛出异常（本地文件按内容哈希命中缓存）"""
     if not API_KEY:
-        return "Error: MINIMAX_API_KEY is not set"
-
-    # 使用 shell 命令
-    cmd = (
-        f'export MINIMAX_API_KEY="{API_KEY}" && '
-        f'export MINIMAX_API_HOST="{API_HOST}" && '
-        f'mcporter call --stdio "uvx minimax-coding-plan-mcp" '
-        f'understand_image "prompt:{prompt}" "image_source:{image_path}"'
+        raise RuntimeError("MINIMAX_API_KEY is not set")
+
+    results = get_cache() if os.path.isfile(image_path) else None
+    key = None
+    if results is not None:
+        key = cache.cache_key(cache.file_digest(image_path), prompt, API_HOST)
+        hit = results.get(key)
+        if hit is not None:
+            return hit
+
+    output = get_session().call_tool(
+        "understand_image",
+        {"prompt": prompt, "image_source": prepare_upload(image_path)},
+        timeout=timeout,
     )
+    if results is not None:
+        results.put(key, output)
+    return output
+
 
+def understand_image(image_path, prompt=DEFAULT_PROMPT):
+    """调用 MiniMax MCP 理解图片"""
     try:
-        result = subprocess.run(
-            cmd,
-            shell=True,
-            capture_output=True,
-            text=True,
-            timeout=60
-        )
-        
-        if result.returncode == 0:
-            return result.stdout.strip()
-        else:
-            return f"Error: {result.stderr}"
+        return describe_image(image_path, prompt)
     except Exception as e:
         return f"Error: {str(e)}"
 
+def print_verbose_stats(args):
+    if not args.verbose:
+        return
+    if _prepared:
+        print(preprocess.summarize(_prepared.values()), file=sys.stderr)
+    if _cache is not None:
+        print(_cache.summary(), file=sys.stderr)
+
+def run_batch_mode(args):
+    import batch
+
+    if not args.out:
+        print("Error: --batch 需要 --out 指定结果 JSONL 文件")
+        return 1
+    if not API_KEY:
+        print("Error: MINIMAX_API_KEY is not set")
+        return 1
+    dedup = None
+    if args.dedup_threshold >= 0:
+        import phash
+
+        if not phash.PHASH_AVAILABLE:
+            print("Warning: 近似去重需要 numpy 和 Pillow，已跳过", file=sys.stderr)
+        else:
+            def dedup(pending):
+                return phash.group_near_duplicates(pending, args.dedup_threshold, args.hash)
+
+    items = batch.collect_items(args.batch, args.prompt)
+    stats = batch.run_batch(items, args.out, describe_image, workers=args.workers,
+                            timeout=args.timeout, retries=args.retries, verbose=args.verbose,
+                            prepare=prepare_batch, dedup=dedup)
+    print(f"完成: 共 {stats['total']} 张，成功 {stats['ok']}，失败 {stats['failed']}，"
+          f"跳过 {stats['skipped']}（已完成），耗时 {stats['elapsed']}s → {args.out}")
+    if dedup is not None:
+        print(f"近似去重: {stats['deduped']} 张复用了相似图片的结果，省去 {stats['deduped']} 次模型调用")
+    print_verbose_stats(args)
+    return 0 if stats["failed"] == 0 else 2
+
 def main():
-    if len(sys.argv) < 2:
-        print("Usage: python3 skill.py <image_path> [prompt]")
-        print("Example: python3 skill.py /path/to/image.jpg '请描述这张图片'")
+    parser = argparse.ArgumentParser(
+        description="MiniMax VL 图片理解",
+        epilog="Example: python3 skill.py /path/to/image.jpg '请描述这张图片'",
+    )
+    parser.add_argument("image_path", nargs="?")
+    parser.add_argument("image_prompt", nargs="?", default=DEFAULT_PROMPT, metavar="prompt")
+    parser.add_argument("--batch", nargs="+", metavar="SRC", help="目录、glob 或清单文件（.txt/.jsonl）")
+    parser.add_argument("--out", help="批量结果 JSONL（已成功的条目续跑时跳过）")
+    parser.add_argument("--prompt", default=DEFAULT_PROMPT, help="批量模式的默认提示词")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--timeout", type=float, default=CALL_TIMEOUT, help="单张超时（秒）")
+    parser.add_argument("--retries", type=int, default=2)
+    parser.add_argument("--no-cache", action="store_true", help="不读写结果缓存")
+    parser.add_argument("--max-edge", type=int, default=preprocess.MAX_EDGE, help="上传前长边上限（像素）")
+    parser.add_argument("--quality", type=int, default=preprocess.QUALITY, help="重压缩质量")
+    parser.add_argument("--format", choices=["jpeg", "webp"], default=preprocess.FORMAT)
+    parser.add_argument("--no-preprocess", action="store_true", help="原图直接上传")
+    parser.add_argument("--dedup-threshold", type=int, default=-1, metavar="BITS",
+                        help="批量模式近似去重的汉明距离阈值（如 5），默认关闭")
+    parser.add_argument("--hash", choices=["phash", "dhash", "ahash"], default="phash")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    global CACHE_ENABLED, PREPROCESS_ENABLED
+    if args.no_cache:
+        CACHE_ENABLED = False
+    if args.no_preprocess:
+        PREPROCESS_ENABLED = False
+    PREPROCESS_OPTIONS.update(max_edge=args.max_edge, quality=args.quality, fmt=args.format)
+
+    if args.batch:
+        sys.exit(run_batch_mode(args))
+
+    if not args.image_path:
+        parser.print_usage()
         sys.exit(1)
-    
-    image_path = sys.argv[1]
-    prompt = sys.argv[2] if len(sys.argv) > 2 else "请描述这张图片"
-    
+
     # 检查文件是否存在
-    if not os.path.exists(image_path):
-        print(f"Error: File not found: {image_path}")
+    if not os.path.exists(args.image_path):
+        print(f"Error: File not found: {args.image_path}")
         sys.exit(1)
-    
-    result = understand_image(image_path, prompt)
+
+    result = understand_image(args.image_path, args.image_prompt)
     print(result)
+    print_verbose_stats(args)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""
+Model Bench - 模型延迟与错误率基准
+向配置中的每个模型并发发送固定探针提示，统计 p50/p95 延迟、tokens/s 与错误率
+"""
+
+import json
+import os
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+HISTORY_PATH = Path.home() / ".openclaw" / "model-bench" / "history.jsonl"
+
+# 固定探针集：短问答 + 少量生成，保证各模型之间可比
+PROBE_PROMPTS = [
+    "Reply with the single word: pong",
+    "What is 17 * 23? Answer with the number only.",
+    "用一句话解释什么是 fallback 链。",
+    "List three prime numbers greater than 50, comma separated.",
+]
+
+# 未在 models.providers 中声明的内置 provider
+BUILTIN_PROVIDERS = {
+    "openai": {"baseUrl": "https://api.openai.com/v1", "apiKey": "${OPENAI_API_KEY}",
+               "api": "openai-completions"},
+    "anthropic": {"baseUrl": "https://api.anthropic.com", "apiKey": "${ANTHROPIC_API_KEY}",
+                  "api": "anthropic-messages"},
+}
+
+
+def collect_bench_models(config: dict) -> list:
+    """收集主模型、fallback、subagents、heartbeat 中的全部模型（去重保序）"""
+    defaults = config.get("agents", {}).get("defaults", {})
+    model_cfg = defaults.get("model", {})
+    models = [model_cfg.get("primary", "")] + list(model_cfg.get("fallbacks", []))
+
+    sub_model = defaults.get("subagents", {}).get("model", "")
+    if isinstance(sub_model, dict):
+        models.append(sub_model.get("primary", ""))
+        models.extend(sub_model.get("fallbacks", []))
+    else:
+        models.append(sub_model)
+
+    models.append(defaults.get("heartbeat", {}).get("model", ""))
+
+    seen = []
+    for m in models:
+        if isinstance(m, str) and m.strip() and m not in seen:
+            seen.append(m)
+    return seen
+
+
+def resolve_endpoint(config: dict, model_id: str, endpoint: str = "") -> Optional[dict]:
+    """解析模型对应的请求地址、API Key 与协议；endpoint 非空时统一指向该地址"""
+    provider, _, name = model_id.partition("/")
+    if not name:
+        provider, name = "", model_id
+
+    info = config.get("models", {}).get("providers", {}).get(provider) or BUILTIN_PROVIDERS.get(provider, {})
+    api = info.get("api", "openai-completions")
+    base = endpoint or info.get("baseUrl", "")
+    if not base:
+        return None
+
+    api_key = os.path.expandvars(str(info.get("apiKey", "") or ""))
+    if api_key.startswith("$"):
+        api_key = ""
+
+    base = base.rstrip("/")
+    if api == "anthropic-messages":
+        url = base + ("/messages" if base.endswith("/v1") else "/v1/messages")
+    else:
+        url = base + "/chat/completions"
+    return {"url": url, "api_key": api_key, "api": api, "model": name}
+
+
+def probe_once(target: dict, prompt: str, timeout: float) -> dict:
+    """发送一次探针请求，返回 {ok, latency, tokens, error}"""
+    headers = {"Content-Type": "application/json"}
+    body = {"model": target["model"], "max_tokens": 64,
+            "messages": [{"role": "user", "content": prompt}]}
+    if target["api"] == "anthropic-messages":
+        headers["anthropic-version"] = "2023-06-01"
+        if target["api_key"]:
+            headers["x-api-key"] = target["api_key"]
+    elif target["api_key"]:
+        headers["Authorization"] = f"Bearer {target['api_key']}"
+
+    req = urllib.request.Request(target["url"], data=json.dumps(body).encode("utf-8"),
+                                 headers=headers, method="POST")
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as resp:
+            payload = json.loads(resp.read().decode("utf-8") or "{}")
+    except urllib.error.HTTPError as e:
+        return {"ok": False, "latency": time.perf_counter() - start, "tokens": 0, "error": f"HTTP {e.code}"}
+    except (urllib.error.URLError, OSError, ValueError) as e:
+        return {"ok": False, "latency": time.perf_counter() - start, "tokens": 0, "error": str(e)}
+    latency = time.perf_counter() - start
+
+    usage = payload.get("usage", {}) or {}
+    tokens = usage.get("completion_tokens") or usage.get("output_tokens") or 0
+    if not tokens:
+        # 没有 usage 时按字符数粗估
+        if target["api"] == "anthropic-messages":
+            text = "".join(c.get("text", "") for c in payload.get("content", []) if isinstance(c, dict))
+        else:
+            choices = payload.get("choices") or [{}]
+            text = (choices[0].get("message") or {}).get("content") or ""
+        tokens = max(1, len(text) // 4) if text else 0
+    return {"ok": True, "latency": latency, "tokens": tokens, "error": ""}
+
+
+def percentile(values: list, pct: float) -> Optional[float]:
+    """最近秩百分位"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * pct // 100))
+    return ordered[int(rank) - 1]
+
+
+def summarize(samples: list) -> dict:
+    """汇总单个模型的探针结果"""
+    ok = [s for s in samples if s["ok"]]
+    latencies = [s["latency"] for s in ok]
+    busy = sum(latencies)
+    errors = [s["error"] for s in samples if not s["ok"]]
+    return {
+        "requests": len(samples),
+        "errors": len(errors),
+        "error_rate": len(errors) / len(samples) if samples else 1.0,
+        "p50": percentile(latencies, 50),
+        "p95": percentile(latencies, 95),
+        "tokens_per_s": sum(s["tokens"] for s in ok) / busy if busy > 0 else 0.0,
+        "last_error": errors[-1] if errors else "",
+    }
+
+
+def run_bench(config: dict, endpoint: str = "", rounds: int = 1,
+              concurrency: int = 8, timeout: float = 30.0) -> dict:
+    """并发对所有模型跑探针集，返回 {model_id: stats}"""
+    models = collect_bench_models(config)
+    jobs = []
+    results = {m: [] for m in models}
+    for model_id in models:
+        target = resolve_endpoint(config, model_id, endpoint)
+        if target is None:
+            results[model_id].append({"ok": False, "latency": 0.0, "tokens": 0, "error": "未找到 provider 地址"})
+            continue
+        for _ in range(max(rounds, 1)):
+            for prompt in PROBE_PROMPTS:
+                jobs.append((model_id, target, prompt))
+
+    with ThreadPoolExecutor(max_workers=max(concurrency, 1)) as pool:
+        futures = [(model_id, pool.submit(probe_once, target, prompt, timeout))
+                   for model_id, target, prompt in jobs]
+        for model_id, fut in futures:
+            results[model_id].append(fut.result())
+
+    return {m: summarize(samples) for m, samples in results.items()}
+
+
+def rank_models(stats: dict) -> list:
+    """按错误率、p50 延迟排序（无成功样本的排最后）"""
+    def key(model_id):
+        s = stats[model_id]
+        p50 = s["p50"] if s["p50"] is not None else float("inf")
+        return (round(s["error_rate"], 2), p50)
+    return sorted(stats, key=key)
+
+
+def append_history(stats: dict, endpoint: str = "") -> Path:
+    """追加一条基准记录到本地历史"""
+    HISTORY_PATH.parent.mkdir(parents=True, exist_ok=True)
+    record = {
+        "ts": datetime.now().isoformat(timespec="seconds"),
+        "endpoint": endpoint,
+        "probes": len(PROBE_PROMPTS),
+        "results": stats,
+    }
+    with open(HISTORY_PATH, "a", encoding="utf-8") as f:
+        f.write(json.dumps(record, ensure_ascii=False) + "\n")
+    return HISTORY_PATH
+
+
+def format_bench(stats: dict) -> str:
+    """格式化基准结果（按排名）"""
+    if not stats:
+        return "没有配置任何模型"
+
+    def ms(v):
+        return f"{v * 1000:.0f}ms" if v is not None else "-"
+
+    lines = ["⏱️ **模型基准**", ""]
+    for i, model_id in enumerate(rank_models(stats), 1):
+        s = stats[model_id]
+        line = (f"{i}. `{model_id}` p50={ms(s['p50'])} p95={ms(s['p95'])} "
+                f"{s['tokens_per_s']:.1f} tok/s 错误率={s['error_rate']:.0%}")
+        if s["last_error"]:
+            line += f" ({s['last_error']})"
+        lines.append(line)
+    return "\n".join(lines)
@@ -0,0 +1,349 @@
+#!/usr/bin/env python3
+"""
+Model Failover - 基于健康度的自动切换
+按滑动窗口统计每个模型的成功率与延迟，主模型劣化时提升最健康的 fallback（带滞回与冷却）
+
+生成可回放的合成事件流:
+    python3 failover.py synth --out events.jsonl --models openai/gpt-5 deepseek/deepseek-chat \
+        --degrade openai/gpt-5 --at 120
+回放:
+    python3 model-switch.py watch --replay events.jsonl
+"""
+
+import argparse
+import json
+import random
+import re
+import sys
+import time
+import urllib.request
+from collections import deque
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Optional
+
+DECISION_LOG = Path.home() / ".openclaw" / "model-failover" / "decisions.jsonl"
+
+WINDOW_SECONDS = 300
+MIN_SAMPLES = 20
+LATENCY_REF_MS = 2000.0
+DEGRADE_THRESHOLD = 0.5
+HYSTERESIS_MARGIN = 0.15
+COOLDOWN_SECONDS = 600
+
+# 非 JSON 日志行：model=xxx ... latency=123ms / duration_ms=123 ... error
+TEXT_MODEL = re.compile(r"\bmodel[=:]\s*\"?([\w./:@-]+)")
+TEXT_LATENCY = re.compile(r"\b(?:latency|duration)(?:_?ms)?[=:]\s*(\d+(?:\.\d+)?)\s*(ms|s)?", re.I)
+TEXT_ERROR = re.compile(r"\b(error|failed|timeout|timed out|status[=:]\s*[45]\d\d)\b", re.I)
+
+
+def parse_event(line: str, now: Optional[float] = None) -> Optional[dict]:
+    """把一行日志/指标解析为 {ts, model, ok, latency_ms}，无法识别返回 None"""
+    line = line.strip()
+    if not line:
+        return None
+    ts = now if now is not None else time.time()
+
+    if line.startswith("{"):
+        try:
+            return normalize_event(json.loads(line), ts)
+        except (ValueError, TypeError) as e:
+            print(f"⚠️ 跳过无法解析的日志行（{e}）: {line[:120]}", file=sys.stderr)
+            return None
+
+    m = TEXT_MODEL.search(line)
+    if not m:
+        return None
+    lat = TEXT_LATENCY.search(line)
+    latency = float(lat.group(1)) * (1000 if (lat.group(2) or "").lower() == "s" else 1) if lat else 0.0
+    return {"ts": ts, "model": m.group(1), "ok": not TEXT_ERROR.search(line), "latency_ms": latency}
+
+
+def parse_ts(value, default: float) -> float:
+    """事件时间戳：epoch 秒 / 毫秒（大于 1e12 视为毫秒）或 ISO-8601 字符串，无法解析时抛 ValueError"""
+    if value is None or value == "":
+        return default
+    if isinstance(value, str):
+        try:
+            value = float(value)
+        except ValueError:
+            text = value.strip()
+            if text.endswith(("Z", "z")):
+                text = text[:-1] + "+00:00"
+            return datetime.fromisoformat(text).timestamp()
+    value = float(value)
+    return value / 1000 if value > 1e12 else value
+
+
+def normalize_event(obj: dict, ts: float) -> Optional[dict]:
+    """统一 JSON 事件字段；时间戳或延迟无法解析时抛 ValueError"""
+    if not isinstance(obj, dict):
+        return None
+    model = obj.get("model") or ""
+    if obj.get("provider") and model and "/" not in model:
+        model = f"{obj['provider']}/{model}"
+    if not model:
+        return None
+    if "ok" in obj:
+        ok = bool(obj["ok"])
+    else:
+        status = obj.get("status")
+        ok = not obj.get("error") and not (isinstance(status, int) and status >= 400)
+    latency = obj.get("latency_ms", obj.get("durationMs", obj.get("duration_ms", 0))) or 0
+    return {"ts": parse_ts(obj.get("ts"), ts), "model": model, "ok": ok, "latency_ms": float(latency)}
+
+
+class HealthTracker:
+    """每个模型的滑动窗口健康度"""
+
+    def __init__(self, window: float = WINDOW_SECONDS, min_samples: int = MIN_SAMPLES,
+                 latency_ref: float = LATENCY_REF_MS):
+        self.window = window
+        self.min_samples = min_samples
+        self.latency_ref = latency_ref
+        self.samples = {}
+        # model -> [成功数, 成功请求延迟总和]，随进出窗口增量维护
+        self.totals = {}
+        self.swept = 0.0
+
+    def _expire(self, model: str, now: float) -> None:
+        window = self.samples[model]
+        totals = self.totals[model]
+        while window and window[0][0] < now - self.window:
+            _, success, latency = window.popleft()
+            if success:
+                totals[0] -= 1
+                totals[1] -= latency
+        if not window:
+            del self.samples[model], self.totals[model]
+
+    def add(self, event: dict) -> None:
+        """记录一个样本并按窗口清理；不在 fallback 链中、不会被 score 的模型也不会无限累积"""
+        now = event["ts"]
+        self.samples.setdefault(event["model"], deque()).append((now, event["ok"], event["latency_ms"]))
+        totals = self.totals.setdefault(event["model"], [0, 0.0])
+        if event["ok"]:
+            totals[0] += 1
+            totals[1] += event["latency_ms"]
+        self._expire(event["model"], now)
+        # 每过一个窗口顺带清理一遍其他模型（包括之后再也没有新样本的）
+        if now - self.swept >= self.window:
+            self.swept = now
+            for model in list(self.samples):
+                self._expire(model, now)
+
+    def score(self, model: str, now: float) -> Optional[float]:
+        """健康分 0~1：成功率 × 延迟因子；样本不足返回 None"""
+        if model not in self.samples:
+            return None
+        self._expire(model, now)
+        window = self.samples.get(model)
+        if not window or len(window) < self.min_samples:
+            return None
+        totals = self.totals[model]
+        if totals[0] <= 0:
+            return 0.0
+        mean_latency = max(totals[1], 0.0) / totals[0]
+        return (totals[0] / len(window)) * (self.latency_ref / (self.latency_ref + mean_latency))
+
+    def scores(self, models: list, now: float) -> dict:
+        return {m: self.score(m, now) for m in models}
+
+
+class FailoverController:
+    """主模型劣化时提升最健康的 fallback
+
+    - 主模型健康分低于 degrade_threshold 才考虑切换
+    - 候选需高出主模型 margin（滞回），避免在相近模型间来回切
+    - 两次切换之间至少间隔 cooldown 秒
+    """
+
+    def __init__(self, primary: str, fallbacks: list, switch_fn: Callable[[str], tuple],
+                 tracker: Optional[HealthTracker] = None, threshold: float = DEGRADE_THRESHOLD,
+                 margin: float = HYSTERESIS_MARGIN, cooldown: float = COOLDOWN_SECONDS,
+                 log_path: Optional[Path] = DECISION_LOG):
+        self.primary = primary
+        self.fallbacks = list(fallbacks)
+        self.switch_fn = switch_fn
+        self.tracker = tracker or HealthTracker()
+        self.threshold = threshold
+        self.margin = margin
+        self.cooldown = cooldown
+        self.log_path = log_path
+        self.last_switch = None
+        self.last_decision = None
+        self.decisions = []
+
+    def observe(self, event: dict) -> Optional[dict]:
+        """接收一条事件并评估，返回本次记录的决策（无变化时为 None）"""
+        self.tracker.add(event)
+        return self.evaluate(event["ts"])
+
+    def evaluate(self, now: float) -> Optional[dict]:
+        scores = self.tracker.scores([self.primary] + self.fallbacks, now)
+        primary_score = scores[self.primary]
+        if primary_score is None or primary_score >= self.threshold:
+            return self._log(now, "hold", None, scores, "主模型健康或样本不足")
+
+        ranked = sorted(((s, m) for m, s in scores.items() if m != self.primary and s is not None),
+                        reverse=True)
+        if not ranked:
+            return self._log(now, "hold", None, scores, "主模型劣化，但 fallback 样本不足")
+        best_score, best = ranked[0]
+        if best_score < primary_score + self.margin:
+            return self._log(now, "hold", best, scores, "候选未超过滞回阈值")
+        if self.last_switch is not None and now - self.last_switch < self.cooldown:
+            return self._log(now, "cooldown", best, scores,
+                             f"冷却中（剩余 {self.cooldown - (now - self.last_switch):.0f}s）")
+
+        ok, msg = self.switch_fn(best)
+        if not ok:
+            return self._log(now, "error", best, scores, msg)
+        old = self.primary
+        self.primary = best
+        self.fallbacks = [old] + [f for f in self.fallbacks if f not in (old, best)]
+        self.last_switch = now
+        return self._log(now, "promote", best, scores, msg, previous=old)
+
+    def _log(self, now: float, action: str, candidate: Optional[str], scores: dict,
+             reason: str, previous: str = "") -> Optional[dict]:
+        # 连续相同的 hold/cooldown 只记一次
+        signature = (action, candidate, reason if action != "cooldown" else "")
+        if action in ("hold", "cooldown") and signature == self.last_decision:
+            return None
+        self.last_decision = signature
+
+        record = {
+            "ts": now,
+            "time": datetime.fromtimestamp(now).isoformat(timespec="seconds"),
+            "action": action,
+            "primary": previous or self.primary,
+            "candidate": candidate,
+            "scores": {m: (round(s, 3) if s is not None else None) for m, s in scores.items()},
+            "reason": reason,
+        }
+        self.decisions.append(record)
+        if self.log_path:
+            self.log_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.log_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        return record
+
+
+def replay_events(path: Path):
+    """按文件顺序回放事件（使用事件自身的时间戳）"""
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            event = parse_event(line, now=0.0)
+            if event:
+                yield event
+
+
+def tail_log(path: Path, interval: float = 1.0, from_start: bool = False):
+    """持续跟随日志文件（支持轮转/截断）"""
+    f = open(path, "r", encoding="utf-8", errors="ignore")
+    if not from_start:
+        f.seek(0, 2)
+    try:
+        while True:
+            line = f.readline()
+            if line:
+                event = parse_event(line)
+                if event:
+                    yield event
+                continue
+            time.sleep(interval)
+            try:
+                if path.stat().st_size < f.tell():
+                    f.close()
+                    f = open(path, "r", encoding="utf-8", errors="ignore")
+            except OSError:
+                pass
+    finally:
+        f.close()
+
+
+def poll_metrics(url: str, interval: float = 5.0, memory: int = 100_000):
+    """轮询本地指标端点（返回事件数组或 {"events": [...]}）
+
+    端点通常返回累积的事件列表，只产出新出现的事件：带 id 的按 id 去重，带 ts 的按整条事件去重，
+    两者都没有的按列表长度只取新增的尾部（列表变短视为端点重启）。
+    """
+    seen = set()
+    order = deque()
+    anonymous = 0
+    while True:
+        try:
+            with urllib.request.urlopen(url, timeout=5) as resp:
+                payload = json.loads(resp.read().decode("utf-8") or "[]")
+        except (OSError, ValueError) as e:
+            print(f"⚠️ 指标拉取失败: {e}", file=sys.stderr)
+            time.sleep(interval)
+            continue
+        events = payload.get("events", []) if isinstance(payload, dict) else payload
+        if not isinstance(events, list):
+            events = []
+        now = time.time()
+        plain = [obj for obj in events if not (isinstance(obj, dict) and ("id" in obj or "ts" in obj))]
+        fresh = {id(obj) for obj in (plain[anonymous:] if len(plain) >= anonymous else plain)}
+        anonymous = len(plain)
+        for obj in events:
+            if isinstance(obj, dict) and ("id" in obj or "ts" in obj):
+                key = f"id:{obj['id']}" if "id" in obj else json.dumps(obj, sort_keys=True, default=str)
+                if key in seen:
+                    continue
+                seen.add(key)
+                order.append(key)
+                if len(order) > memory:
+                    seen.discard(order.popleft())
+            elif id(obj) not in fresh:
+                continue
+            try:
+                event = normalize_event(obj, now)
+            except (ValueError, TypeError) as e:
+                print(f"⚠️ 跳过无法解析的指标事件（{e}）: {str(obj)[:120]}", file=sys.stderr)
+                continue
+            if event:
+                yield event
+        time.sleep(interval)
+
+
+def generate_synthetic_events(models: list, degrade: str, degrade_at: float,
+                              duration: float = 900, rate: float = 1.0, seed: int = 42) -> list:
+    """生成合成事件流：degrade 模型在 degrade_at 秒后错误率升高、延迟变大"""
+    rng = random.Random(seed)
+    events = []
+    t = 0.0
+    start = 1_700_000_000.0
+    while t < duration:
+        for model in models:
+            bad = model == degrade and t >= degrade_at
+            ok = rng.random() >= (0.6 if bad else 0.02)
+            latency = rng.gauss(6000 if bad else 800, 200)
+            events.append({"ts": start + t, "model": model, "ok": ok, "latency_ms": max(latency, 50.0)})
+        t += 1.0 / rate
+    return events
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Generate synthetic failover events")
+    sub = parser.add_subparsers(dest="command", required=True)
+    synth = sub.add_parser("synth", help="生成合成事件流")
+    synth.add_argument("--out", required=True)
+    synth.add_argument("--models", nargs="+", required=True)
+    synth.add_argument("--degrade", required=True, help="劣化的模型")
+    synth.add_argument("--at", type=float, default=120, help="开始劣化的时间（秒）")
+    synth.add_argument("--duration", type=float, default=900)
+    synth.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    events = generate_synthetic_events(args.models, args.degrade, args.at, args.duration, seed=args.seed)
+    with open(args.out, "w", encoding="utf-8") as f:
+        for event in events:
+            f.write(json.dumps(event) + "\n")
+    print(f"wrote {len(events)} events to {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
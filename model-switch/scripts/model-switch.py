@@ -4,18 +4,37 @@ Model Switch - OpenClaw Model Management Skill
 管理 OpenClaw 模型切换的 Python 脚本
 """
 
+import argparse
 import json
+import os
+import shlex
+import signal
 import subprocess
 import sys
 import shutil
 import tempfile
+import time
+import urllib.error
+import urllib.request
 from datetime import datetime
 from pathlib import Path
 from typing import Optional
 
+import bench
+import failover
+import resolver
+
 CONFIG_PATH = Path.home() / ".openclaw" / "openclaw.json"
 BACKUP_DIR = Path.home() / ".openclaw" / "backups"
 
+# 可用 OPENCLAW_BIN 指向替身命令（如 "python3 stub_gateway.py"）做本地测试
+OPENCLAW_BIN = os.environ.get("OPENCLAW_BIN", "openclaw")
+DEFAULT_GATEWAY_PORT = 18789
+HOT_RELOAD_MODES = ("hot", "hybrid")
+READY_TIMEOUT = float(os.environ.get("GATEWAY_READY_TIMEOUT", "30"))
+PROBE_INTERVAL = 0.2
+RELOAD_TIMEOUT = 5.0
+
 
 def load_config() -> Optional[dict]:
     """加载配置文件"""
@@ -92,9 +111,15 @@ def mask_api_key(key: str) -> str:
     return key[:8] + "..."
 
 
+def openclaw_argv(*args: str) -> list:
+    """拼出 openclaw 命令行（支持 OPENCLAW_BIN 覆盖）"""
+    return shlex.split(OPENCLAW_BIN) + list(args)
+
+
 def check_openclaw_cmd() -> bool:
     """检查 openclaw 命令是否可用"""
-    return shutil.which("openclaw") is not None
+    argv = shlex.split(OPENCLAW_BIN)
+    return bool(argv) and shutil.which(argv[0]) is not None
 
 
 def get_all_models(config: dict) -> list:
@@ -131,53 +156,55 @@ def format_model_list(models: list) -> str:
 
 
 def get_model_by_name_or_number(config: dict, name_or_number: str) -> Optional[str]:
-    """根据名称或编号查找模型（精确匹配优先）"""
-    models = get_all_models(config)
-    all_models = [m["id"] for m in models]
-    name_lower = name_or_number.lower().strip()
-    
+    """根据名称或编号查找模型（编号 → 索引排序匹配，存在歧义时返回 None）"""
+    target, _ = resolve_model(config, name_or_number)
+    return target
+
+
+def resolve_model(config: dict, name_or_number: str) -> tuple:
+    """解析模型，返回 (唯一匹配或 None, 候选列表)"""
     # 1. 尝试解析编号
     try:
         idx = int(name_or_number) - 1
+        all_models = [m["id"] for m in get_all_models(config)]
         if 0 <= idx < len(all_models):
-            return all_models[idx]
+            return all_models[idx], []
     except ValueError:
         pass
-    
-    # 2. 精确匹配 model id（全等）
-    for model_id in all_models:
-        if model_id.lower() == name_lower:
-            return model_id
-    
-    # 3. 匹配 alias
-    models_aliases = config.get("agents", {}).get("defaults", {}).get("models", {})
-    for model_id, model_info in models_aliases.items():
-        alias = model_info.get("alias", "")
-        if alias and alias.lower() == name_lower:
-            return model_id
-    
-    # 4. 前缀匹配
-    for model_id in all_models:
-        if model_id.lower().startswith(name_lower):
-            return model_id
-    
-    # 5. 模糊匹配（包含）
-    matches = [m for m in all_models if name_lower in m.lower()]
-    if len(matches) == 1:
-        return matches[0]
-    elif len(matches) > 1:
-        # 多匹配返回 None，让用户确认
-        return None
-    
-    return None
+
+    # 2. 索引匹配：id / alias / 模型名 / 前缀 / 分词 / trigram 相似度
+    return resolver.build_index(config).resolve(name_or_number)
+
+
+def pick_target(config: dict, name: str, force: bool = False) -> tuple:
+    """switch/add 的目标模型，返回 (模型 id 或 None, 无法确定时的候选提示)
+
+    未收录的完整 provider/model id、没有相近模型的名称以及 --force 时按原样使用；
+    只有相似度命中时列出候选，不自动替换
+    """
+    name = name.strip()
+    if force:
+        return name, ""
+    target, candidates = resolve_model(config, name)
+    if target:
+        return target, ""
+    if resolver.is_full_id(name) or not candidates:
+        return name, ""
+    return None, resolver.format_candidates(name, candidates, hint=f"确认要按原样使用 `{name}` 时加 --force")
+
+
+def split_force(args: str) -> tuple:
+    """从参数中取出 --force / -f，返回 (其余参数, 是否强制)"""
+    words = args.split()
+    rest = [w for w in words if w not in ("--force", "-f")]
+    return " ".join(rest), len(rest) != len(words)
 
 
-def switch_model(config: dict, target_model: str) -> tuple:
+def switch_model(config: dict, target_model: str, force: bool = False) -> tuple:
     """切换主模型"""
-    target = get_model_by_name_or_number(config, target_model)
+    target, hint = pick_target(config, target_model, force)
     if not target:
-        # 尝试直接使用输入的名称
-        target = target_model.strip()
+        return False, hint
     
     all_models = [m["id"] for m in get_all_models(config)]
     
@@ -205,11 +232,11 @@ def switch_model(config: dict, target_model: str) -> tuple:
     return False, "保存配置失败"
 
 
-def add_fallback(config: dict, model_name: str) -> tuple:
+def add_fallback(config: dict, model_name: str, force: bool = False) -> tuple:
     """添加 fallback 模型"""
-    target = get_model_by_name_or_number(config, model_name)
+    target, hint = pick_target(config, model_name, force)
     if not target:
-        target = model_name.strip()
+        return False, hint
     
     # 检查是否已在主模型
     primary = config.get("agents", {}).get("defaults", {}).get("model", {}).get("primary", "")
@@ -232,8 +259,10 @@ def add_fallback(config: dict, model_name: str) -> tuple:
 
 def remove_fallback(config: dict, model_name: str) -> tuple:
     """移除 fallback 模型"""
-    target = get_model_by_name_or_number(config, model_name)
+    target, candidates = resolve_model(config, model_name)
     if not target:
+        if candidates:
+            return False, resolver.format_candidates(model_name, candidates)
         return False, f"找不到模型: {model_name}"
     
     fallbacks = config.get("agents", {}).get("defaults", {}).get("model", {}).get("fallbacks", [])
@@ -295,35 +324,324 @@ def show_api_keys(config: dict) -> str:
     return "\n".join(lines)
 
 
-def restart_gateway() -> tuple:
-    """重启 Gateway（后台运行 + 超时检测）"""
+def gateway_url(config: dict) -> str:
+    """Gateway 就绪探测地址（OPENCLAW_GATEWAY_URL 优先）"""
+    url = os.environ.get("OPENCLAW_GATEWAY_URL", "").strip()
+    if url:
+        return url
+    port = config.get("gateway", {}).get("port") or DEFAULT_GATEWAY_PORT
+    return f"http://127.0.0.1:{port}/"
+
+
+def probe_gateway(url: str, timeout: float = 1.0) -> Optional[dict]:
+    """探测 Gateway：在服务时返回响应 JSON（非 JSON 时为空 dict），否则返回 None
+
+    任何非 5xx 响应都算在服务。
+    """
+    try:
+        with urllib.request.urlopen(url, timeout=timeout) as resp:
+            if resp.status >= 500:
+                return None
+            body = resp.read()
+    except urllib.error.HTTPError as e:
+        return {} if e.code < 500 else None
+    except (urllib.error.URLError, OSError, ValueError):
+        return None
+    try:
+        data = json.loads(body or b"{}")
+    except ValueError:
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+IDENTITY_KEYS = ("pid", "startedAt", "started_at", "started", "bootId", "instanceId", "version")
+
+
+def gateway_identity(state: Optional[dict]) -> tuple:
+    """进程身份（pid / 启动时间 / 版本等），Gateway 不提供时为空"""
+    if not state:
+        return ()
+    return tuple((k, state[k]) for k in IDENTITY_KEYS if k in state)
+
+
+def served_model(state: Optional[dict]) -> Optional[dict]:
+    """Gateway 当前加载的模型配置 {primary, fallbacks}，不提供时为 None"""
+    model = (state or {}).get("model")
+    if isinstance(model, str):
+        return {"primary": model}
+    if isinstance(model, dict):
+        return {k: model[k] for k in ("primary", "fallbacks") if k in model}
+    return None
+
+
+def model_matches(served: Optional[dict], config: dict) -> bool:
+    """served 报告的各项与配置一致"""
+    if not served:
+        return False
+    expected = config.get("agents", {}).get("defaults", {}).get("model", {})
+    return all(expected.get(k) == v for k, v in served.items())
+
+
+def _stop_process(proc: Optional[subprocess.Popen]) -> None:
+    """结束仍在运行的 restart 命令及其子进程"""
+    if proc is None or proc.poll() is not None:
+        return
+    try:
+        os.killpg(proc.pid, signal.SIGKILL)
+    except (AttributeError, OSError):
+        proc.kill()
+    proc.wait()
+
+
+def wait_gateway_ready(url: str, proc: Optional[subprocess.Popen] = None, baseline: tuple = (),
+                       check=None, timeout: float = READY_TIMEOUT) -> dict:
+    """轮询就绪状态，返回 {ready, time_to_ready, downtime, error}
+
+    - 有 proc（restart 命令）时：必须观察到掉线后恢复，或进程身份与 baseline 不同才算重启完成；
+      命令退出前探测到的“在线”不算数，超时后结束仍在运行的命令。baseline 为空（无身份信息）时
+      掉线可能短于探测间隔而看不到，命令成功退出后探测到在线即算就绪
+    - check（热加载）时：check(探测结果) 为真即新配置已生效
+    """
+    start = time.perf_counter()
+    deadline = start + timeout
+    down_since = None
+    up_since = None
+    downtime = 0.0
+    saw_down = False
+    proc_exited = proc is None
+
+    while True:
+        now = time.perf_counter()
+        state = probe_gateway(url)
+        if proc is not None and not proc_exited and proc.poll() is not None:
+            proc_exited = True
+            up_since = None  # 命令退出前的在线可能还是旧进程
+        if state is None:
+            if down_since is None:
+                down_since = now
+            up_since = None
+            saw_down = True
+        else:
+            if down_since is not None:
+                downtime += now - down_since
+                down_since = None
+            if up_since is None:
+                up_since = now
+
+        if proc is not None and proc_exited and proc.returncode != 0 and not saw_down:
+            stderr = proc.stderr.read().strip() if proc.stderr else ""
+            return {"ready": False, "time_to_ready": None, "downtime": 0.0,
+                    "error": stderr or f"exit={proc.returncode}"}
+
+        if state is not None:
+            if proc is not None:
+                # 没有身份可比较（Gateway 不暴露 pid 等字段）时退回就绪检查：命令成功退出后在线即可
+                changed = not baseline or gateway_identity(state) not in ((), baseline)
+                done = saw_down or (proc_exited and changed)
+            else:
+                done = check is None or check(state)
+            if done:
+                return {"ready": True, "time_to_ready": up_since - start, "downtime": downtime, "error": ""}
+
+        if now >= deadline:
+            _stop_process(proc)
+            if down_since is not None:
+                downtime += now - down_since
+            if state is not None and proc is not None:
+                error = f"{timeout:.0f}s 内未观察到重启（Gateway 一直在线且进程身份未变）"
+            elif state is not None:
+                error = f"{timeout:.0f}s 内新配置未生效"
+            else:
+                error = f"{timeout:.0f}s 内未就绪"
+            return {"ready": False, "time_to_ready": None, "downtime": downtime, "error": error}
+        time.sleep(PROBE_INTERVAL)
+
+
+def format_ready_result(action: str, result: dict) -> tuple:
+    """格式化就绪探测结果"""
+    if result["ready"]:
+        return True, (f"✅ Gateway 已{action}（就绪耗时 {result['time_to_ready']:.2f}s，"
+                      f"实际中断 {result['downtime']:.2f}s）")
+    return False, f"❌ Gateway {action}后未就绪: {result['error']}"
+
+
+def restart_gateway(config: Optional[dict] = None) -> tuple:
+    """重启 Gateway 并探测就绪（测量真实中断时长）"""
     if not check_openclaw_cmd():
         return False, "❌ 找不到 openclaw 命令，请确保已安装"
-    
+
+    url = gateway_url(config or {})
+    baseline = gateway_identity(probe_gateway(url))
     try:
-        # 后台启动重启
-        result = subprocess.Popen(
-            ["openclaw", "gateway", "restart"],
-            stdout=subprocess.PIPE,
+        proc = subprocess.Popen(
+            openclaw_argv("gateway", "restart"),
+            stdout=subprocess.DEVNULL,
             stderr=subprocess.PIPE,
-            text=True
+            text=True,
+            start_new_session=True
         )
-        
-        # 等待最多 10 秒
-        try:
-            stdout, stderr = result.communicate(timeout=10)
-            if result.returncode == 0:
-                return True, "✅ Gateway 已重启"
-            else:
-                return False, f"❌ 重启失败: {stderr.strip()}"
-        except subprocess.TimeoutExpired:
-            # 超时但可能正在重启，视为成功
-            result.kill()
-            return True, "✅ Gateway 正在重启（后台进行中）"
-            
     except Exception as e:
         return False, f"❌ 重启失败: {str(e)}"
 
+    try:
+        result = wait_gateway_ready(url, proc=proc, baseline=baseline)
+    finally:
+        _stop_process(proc)
+    return format_ready_result("重启", result)
+
+
+def reload_gateway(config: dict) -> tuple:
+    """让配置生效：支持热加载时就地生效，否则回退到重启
+
+    gateway.reload.mode 为 hot/hybrid 且 Gateway 报告当前加载的模型时，
+    等到报告的模型与新配置一致；否则执行 `openclaw gateway restart`。
+    """
+    mode = config.get("gateway", {}).get("reload", {}).get("mode", "")
+    url = gateway_url(config)
+    if mode in HOT_RELOAD_MODES and served_model(probe_gateway(url)) is not None:
+        check = lambda state: model_matches(served_model(state), config)
+        result = wait_gateway_ready(url, check=check, timeout=RELOAD_TIMEOUT)
+        if result["ready"]:
+            return format_ready_result("热加载配置", result)
+    return restart_gateway(config)
+
+
+def reorder_fallbacks(config: dict, ranking: list) -> tuple:
+    """按基准排名重排 fallback 链（未参与基准的模型保持原相对顺序，排在后面）"""
+    model_cfg = config.setdefault("agents", {}).setdefault("defaults", {}).setdefault("model", {})
+    fallbacks = model_cfg.get("fallbacks", [])
+    position = {m: i for i, m in enumerate(ranking)}
+    reordered = sorted(fallbacks, key=lambda m: position.get(m, len(ranking)))
+    if reordered == fallbacks:
+        return True, "fallback 顺序已是最优，无需调整"
+
+    model_cfg["fallbacks"] = reordered
+    if save_config(config):
+        return True, "已按基准重排 fallback 链: " + " → ".join(f"`{m}`" for m in reordered)
+    return False, "保存配置失败"
+
+
+def run_bench_command(config: dict, args: str) -> str:
+    """bench 命令：并发探测全部模型，记录历史，可选重排 fallback"""
+    parser = argparse.ArgumentParser(prog="model-switch.py bench", add_help=False)
+    parser.add_argument("--reorder", action="store_true")
+    parser.add_argument("--endpoint", default=os.environ.get("MODEL_BENCH_ENDPOINT", ""))
+    parser.add_argument("--rounds", type=int, default=1)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--timeout", type=float, default=30.0)
+    try:
+        opts = parser.parse_args(shlex.split(args))
+    except SystemExit:
+        return "❌ 参数错误，用法: bench [--reorder] [--endpoint URL] [--rounds N] [--concurrency N] [--timeout S]"
+
+    stats = bench.run_bench(config, endpoint=opts.endpoint, rounds=opts.rounds,
+                            concurrency=opts.concurrency, timeout=opts.timeout)
+    if not stats:
+        return "没有配置任何模型"
+    history = bench.append_history(stats, opts.endpoint)
+    result = bench.format_bench(stats) + f"\n\n📁 已记录到 `{history}`"
+
+    if opts.reorder:
+        before = list(config.get("agents", {}).get("defaults", {}).get("model", {}).get("fallbacks", []))
+        success, msg = reorder_fallbacks(config, bench.rank_models(stats))
+        result += f"\n{msg}"
+        if success and config["agents"]["defaults"]["model"]["fallbacks"] != before:
+            restart_ok, restart_msg = reload_gateway(config)
+            result += f"\n{restart_msg}"
+    return result
+
+
+def format_decision(record: dict) -> str:
+    """格式化一条 failover 决策"""
+    scores = ", ".join(f"{m}={s}" for m, s in record["scores"].items())
+    if record["action"] == "promote":
+        head = f"🔀 {record['primary']} → {record['candidate']}"
+    else:
+        head = f"• {record['action']}"
+    return f"[{record['time']}] {head}: {record['reason']} ({scores})"
+
+
+def run_watch_command(config: dict, args: str) -> str:
+    """watch 命令：跟随 Gateway 日志/指标，主模型劣化时自动切换到最健康的 fallback"""
+    parser = argparse.ArgumentParser(prog="model-switch.py watch", add_help=False)
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--log")
+    source.add_argument("--metrics-url")
+    source.add_argument("--replay")
+    parser.add_argument("--from-start", action="store_true")
+    parser.add_argument("--dry-run", action="store_true")
+    parser.add_argument("--interval", type=float, default=1.0)
+    parser.add_argument("--window", type=float, default=failover.WINDOW_SECONDS)
+    parser.add_argument("--min-samples", type=int, default=failover.MIN_SAMPLES)
+    parser.add_argument("--threshold", type=float, default=failover.DEGRADE_THRESHOLD)
+    parser.add_argument("--margin", type=float, default=failover.HYSTERESIS_MARGIN)
+    parser.add_argument("--cooldown", type=float, default=failover.COOLDOWN_SECONDS)
+    parser.add_argument("--decision-log")
+    try:
+        opts = parser.parse_args(shlex.split(args))
+    except SystemExit:
+        return ("❌ 参数错误，用法: watch (--log PATH | --metrics-url URL | --replay PATH) "
+                "[--dry-run] [--window S] [--threshold X] [--margin X] [--cooldown S]")
+
+    model_cfg = config.get("agents", {}).get("defaults", {}).get("model", {})
+    primary = model_cfg.get("primary", "")
+    if not primary:
+        return "❌ 未配置主模型"
+
+    # 回放只模拟决策，不改配置
+    dry_run = opts.dry_run or bool(opts.replay)
+
+    def apply_switch(target: str) -> tuple:
+        if dry_run:
+            return True, f"[dry-run] 切换到 `{target}`"
+        fresh = load_config()
+        if not fresh:
+            return False, "无法读取配置文件"
+        ok, msg = switch_model(fresh, target)
+        if ok:
+            _, restart_msg = reload_gateway(fresh)
+            msg += f" | {restart_msg}"
+        return ok, msg
+
+    if opts.decision_log:
+        log_path = Path(opts.decision_log).expanduser()
+    else:
+        log_path = None if opts.replay else failover.DECISION_LOG
+    controller = failover.FailoverController(
+        primary,
+        model_cfg.get("fallbacks", []),
+        apply_switch,
+        tracker=failover.HealthTracker(window=opts.window, min_samples=opts.min_samples),
+        threshold=opts.threshold,
+        margin=opts.margin,
+        cooldown=opts.cooldown,
+        log_path=log_path,
+    )
+
+    if opts.replay:
+        events = failover.replay_events(Path(opts.replay).expanduser())
+    elif opts.log:
+        events = failover.tail_log(Path(opts.log).expanduser(), opts.interval, opts.from_start)
+    else:
+        events = failover.poll_metrics(opts.metrics_url, opts.interval)
+
+    print(f"👀 监控中: 主模型 `{primary}`，fallback {len(controller.fallbacks)} 个"
+          f"{'（dry-run）' if dry_run else ''}", flush=True)
+    count = 0
+    try:
+        for event in events:
+            count += 1
+            record = controller.observe(event)
+            if record:
+                print(format_decision(record), flush=True)
+    except KeyboardInterrupt:
+        pass
+    except OSError as e:
+        return f"❌ 读取事件失败: {e}"
+
+    promotions = sum(1 for d in controller.decisions if d["action"] == "promote")
+    return f"共处理 {count} 条事件，切换 {promotions} 次，当前主模型 `{controller.primary}`"
+
 
 def handle_command(command: str, args: str = "") -> str:
     """处理命令"""
@@ -344,10 +662,11 @@ def handle_command(command: str, args: str = "") -> str:
     if cmd in ["switch", "切换", "换成", "用"]:
         if not args:
             return "❌ 请指定要切换的模型"
-        success, msg = switch_model(config, args)
+        args, force = split_force(args)
+        success, msg = switch_model(config, args, force)
         if success:
-            # 尝试重启
-            restart_ok, restart_msg = restart_gateway()
+            # 让配置生效（热加载优先，回退重启）
+            restart_ok, restart_msg = reload_gateway(config)
             msg += f"\n{restart_msg}"
         return msg
     
@@ -356,10 +675,11 @@ def handle_command(command: str, args: str = "") -> str:
         if not args:
             return "❌ 请指定要添加的模型"
         # 移除 "到 fallback" 等后缀
+        args, force = split_force(args)
         clean_args = args.replace("到 fallback", "").replace("fallback", "").strip()
-        success, msg = add_fallback(config, clean_args)
+        success, msg = add_fallback(config, clean_args, force)
         if success:
-            restart_ok, restart_msg = restart_gateway()
+            restart_ok, restart_msg = reload_gateway(config)
             msg += f"\n{restart_msg}"
         return msg
     
@@ -369,7 +689,7 @@ def handle_command(command: str, args: str = "") -> str:
             return "❌ 请指定要移除的模型"
         success, msg = remove_fallback(config, args)
         if success:
-            restart_ok, restart_msg = restart_gateway()
+            restart_ok, restart_msg = reload_gateway(config)
             msg += f"\n{restart_msg}"
         return msg
     
@@ -385,9 +705,24 @@ def handle_command(command: str, args: str = "") -> str:
     if cmd in ["keys", "apikey", "密钥"]:
         return show_api_keys(config)
     
+    # 查找模型
+    if cmd in ["find", "search", "查找"]:
+        if not args:
+            return "❌ 请指定要查找的模型"
+        candidates = resolver.build_index(config).search(args, limit=10)
+        return resolver.format_candidates(args, candidates, title=f"🔎 `{args}` 的候选模型:")
+    
+    # 基准测试
+    if cmd in ["bench", "测速"]:
+        return run_bench_command(config, args)
+    
+    # 健康监控 + 自动切换
+    if cmd in ["watch", "监控"]:
+        return run_watch_command(config, args)
+    
     # 重启
     if cmd in ["restart", "重启"]:
-        success, msg = restart_gateway()
+        success, msg = restart_gateway(config)
         return msg
     
     # 帮助
@@ -395,13 +730,16 @@ def handle_command(command: str, args: str = "") -> str:
         return """📖 **可用命令**:
 
 - `status` - 查看当前模型配置
-- `switch <模型>` - 切换主模型
-- `add <模型>` - 添加到 fallback 链
+- `switch <模型> [--force]` - 切换主模型（--force 按原样使用输入的名称）
+- `add <模型> [--force]` - 添加到 fallback 链
 - `remove <模型>` - 从 fallback 链移除
+- `find <关键词>` - 在全部已配置模型中按相似度查找
 - `heartbeat` - 查看心跳模型
 - `subagents` - 查看子智能体模型
 - `keys` - 查看 API Keys
-- `restart` - 重启 Gateway
+- `restart` - 重启 Gateway（探测就绪并报告中断时长）
+- `bench [--reorder]` - 测量各模型延迟/错误率，可按结果重排 fallback
+- `watch --log <文件>` - 监控 Gateway 日志，主模型劣化时自动切换
 
 示例:
 - `switch Codex`
@@ -416,7 +754,7 @@ if __name__ == "__main__":
     # 从命令行参数获取命令
     if len(sys.argv) < 2:
         print("Usage: model-switch.py <command> [args]")
-        print("Commands: status, switch, add, remove, heartbeat, subagents, keys, restart, help")
+        print("Commands: status, switch, add, remove, find, heartbeat, subagents, keys, restart, bench, watch, help")
         sys.exit(1)
     
     command = sys.argv[1]
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+Model Resolver - 模型名解析索引
+为模型 id、alias 及 provider/model 分词建立 trigram 倒排索引，返回带分数的候选列表
+"""
+
+import bisect
+import re
+
+TOKEN_SPLIT = re.compile(r"[/\-_.:\s]+")
+
+# 分数阈值：低于 MIN_SCORE 不作为候选；自动采用需不低于 ACCEPT_SCORE 且领先第二名 AMBIGUITY_GAP
+MIN_SCORE = 0.45
+ACCEPT_SCORE = 0.6
+AMBIGUITY_GAP = 0.1
+# 已在主模型/fallback 链中的模型略微优先
+CHAIN_BONUS = 0.03
+
+
+def trigrams(text: str) -> set:
+    """带首尾标记的 trigram 集合"""
+    padded = f"^{text}$"
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def edit_distance(a: str, b: str) -> int:
+    """带相邻换位的编辑距离（OSA）"""
+    prev2, prev = None, list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        cur = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            cur[j] = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                cur[j] = min(cur[j], prev2[j - 2] + 1)
+        prev2, prev = prev, cur
+    return prev[len(b)]
+
+
+class ModelIndex:
+    """模型名索引：精确表 + 有序前缀表 + 分词表 + trigram 倒排表"""
+
+    def __init__(self, entries: dict, chain: list = None):
+        # entries: {model_id: [alias, ...]}
+        self.chain = set(chain or [])
+        self.exact = {}
+        self.names = {}
+        self.keys = []
+        self.tokens = {}
+        self.grams = {}
+        self.gram_counts = {}
+
+        for model_id, aliases in entries.items():
+            lower = model_id.lower()
+            self.exact.setdefault(lower, (model_id, "id"))
+            for alias in aliases:
+                if alias:
+                    self.exact.setdefault(alias.lower(), (model_id, "alias"))
+
+            name = lower.split("/", 1)[-1]
+            self.names.setdefault(name, []).append(model_id)
+
+            tokens = [t for t in TOKEN_SPLIT.split(" ".join([lower, *(a.lower() for a in aliases if a)])) if t]
+            for token in tokens:
+                self.tokens.setdefault(token, set()).add(model_id)
+
+            # 完整 id、模型名、alias 以及较长的分词都作为可检索的键
+            keys = {lower, name, *(a.lower() for a in aliases if a), *(t for t in tokens if len(t) >= 3)}
+            for key in keys:
+                self.keys.append((key, model_id))
+                grams = trigrams(key)
+                self.gram_counts[(key, model_id)] = len(grams)
+                for g in grams:
+                    self.grams.setdefault(g, set()).add((key, model_id))
+
+        self.keys.sort()
+
+    def _bump(self, scores: dict, model_id: str, score: float, reason: str) -> None:
+        if model_id in self.chain:
+            score += CHAIN_BONUS
+        if score > scores.get(model_id, (0.0, ""))[0]:
+            scores[model_id] = (score, reason)
+
+    def search(self, query: str, limit: int = 5) -> list:
+        """返回按分数降序的候选 [(model_id, score, reason), ...]"""
+        q = query.lower().strip()
+        if not q:
+            return []
+        scores = {}
+
+        # 1. 精确 id / alias
+        hit = self.exact.get(q)
+        if hit:
+            self._bump(scores, hit[0], 1.0, hit[1])
+
+        # 2. 不带 provider 的模型名
+        for model_id in self.names.get(q, []):
+            self._bump(scores, model_id, 0.97, "name")
+
+        # 3. 前缀（有序表二分）
+        i = bisect.bisect_left(self.keys, (q, ""))
+        while i < len(self.keys) and self.keys[i][0].startswith(q):
+            key, model_id = self.keys[i]
+            self._bump(scores, model_id, 0.9 - 0.1 * (1 - len(q) / len(key)), "prefix")
+            i += 1
+
+        # 4. 分词全命中（如 "claude sonnet"）
+        q_tokens = [t for t in TOKEN_SPLIT.split(q) if t]
+        if q_tokens:
+            sets = [self.tokens.get(t, set()) for t in q_tokens]
+            for model_id in set.intersection(*sets) if all(sets) else set():
+                self._bump(scores, model_id, 0.8, "tokens")
+
+        # 5. trigram 召回 + 相似度（子串、拼写错误）
+        q_grams = trigrams(q)
+        overlap = {}
+        for g in q_grams:
+            for entry in self.grams.get(g, ()):
+                overlap[entry] = overlap.get(entry, 0) + 1
+        for (key, model_id), common in overlap.items():
+            if q in key:
+                self._bump(scores, model_id, 0.75, "substring")
+            dice = 2 * common / (len(q_grams) + self.gram_counts[(key, model_id)])
+            self._bump(scores, model_id, 0.7 * dice, "fuzzy")
+            # 长度接近时用编辑距离补足 trigram 对换位/错字不敏感的问题
+            if abs(len(key) - len(q)) <= 3:
+                dist = edit_distance(q, key)
+                self._bump(scores, model_id, 0.7 * (1 - dist / max(len(q), len(key))), "typo")
+
+        ranked = sorted(((m, s, r) for m, (s, r) in scores.items() if s >= MIN_SCORE),
+                        key=lambda x: (-x[1], x[0]))
+        return ranked[:limit]
+
+    def resolve(self, query: str) -> tuple:
+        """返回 (唯一匹配或 None, 候选列表)
+
+        只自动采用完整 id / alias、唯一的模型名或唯一的前缀匹配；
+        分词、相似度（fuzzy / typo）命中只作为候选，避免把未收录的模型悄悄换成另一个已配置模型
+        """
+        q = query.lower().strip()
+        candidates = self.search(query)
+        if not q:
+            return None, candidates
+        hit = self.exact.get(q)
+        if hit:
+            return hit[0], candidates
+        named = self.names.get(q, [])
+        if len(named) == 1:
+            return named[0], candidates
+        if named:
+            return None, candidates
+        i = bisect.bisect_left(self.keys, (q, ""))
+        prefixed = set()
+        while i < len(self.keys) and self.keys[i][0].startswith(q):
+            prefixed.add(self.keys[i][1])
+            i += 1
+        if len(prefixed) == 1:
+            return prefixed.pop(), candidates
+        return None, candidates
+
+
+def is_full_id(text: str) -> bool:
+    """形如 provider/model 的完整模型 id"""
+    provider, _, model = text.strip().partition("/")
+    return bool(provider and model) and not any(c.isspace() for c in text.strip())
+
+
+def build_index(config: dict) -> ModelIndex:
+    """从配置构建索引（每次调用重建：几十个模型约 1ms，比读写磁盘缓存还快）"""
+    defaults = config.get("agents", {}).get("defaults", {})
+    model_cfg = defaults.get("model", {})
+    chain = [m for m in [model_cfg.get("primary", "")] + list(model_cfg.get("fallbacks", [])) if m]
+    catalog = defaults.get("models", {}) or {}
+
+    entries = {m: [] for m in chain}
+    for model_id, info in catalog.items():
+        alias = info.get("alias", "") if isinstance(info, dict) else ""
+        entries.setdefault(model_id, []).append(alias)
+
+    return ModelIndex(entries, chain)
+
+
+def format_candidates(query: str, candidates: list, title: str = "", hint: str = "") -> str:
+    """格式化候选建议"""
+    if not candidates:
+        return f"找不到与 `{query}` 相近的模型"
+    lines = [title or f"🔎 `{query}` 没有唯一匹配，你要找的可能是:"]
+    for i, (model_id, score, reason) in enumerate(candidates, 1):
+        lines.append(f"  {i}. `{model_id}` ({score:.2f}, {reason})")
+    if hint:
+        lines.append(hint)
+    return "\n".join(lines)
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+Stub Gateway - 本地替身 Gateway，用于离线测试 model-switch
+
+用法:
+    python3 stub_gateway.py serve [--port 18789] [--restart-delay 2] [--config ~/.openclaw/openclaw.json] [--anonymous]
+        [--model-latency deepseek-chat=0.3] [--model-error gpt-5=0.5]
+    python3 stub_gateway.py gateway restart [--port 18789] [--after 0.3]
+
+配合 model-switch 使用:
+    OPENCLAW_BIN="python3 stub_gateway.py" python3 model-switch.py restart
+    python3 model-switch.py bench --endpoint http://127.0.0.1:18789/v1
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_PORT = int(os.environ.get("STUB_GATEWAY_PORT", "18789"))
+
+
+class StubState:
+    """替身 Gateway 的可变状态"""
+
+    def __init__(self, restart_delay: float, latency: dict = None, errors: dict = None,
+                 default_latency: float = 0.05, config: str = "", anonymous: bool = False):
+        self.restart_delay = restart_delay
+        self.config = config
+        self.anonymous = anonymous
+        self.started = time.time()
+        self.latency = latency or {}
+        self.errors = errors or {}
+        self.default_latency = default_latency
+        self.down_until = 0.0
+        self.restarts = 0
+        self.lock = threading.Lock()
+
+    def is_up(self) -> bool:
+        return time.monotonic() >= self.down_until
+
+    def restart(self, after: float = 0.0) -> None:
+        """after 秒后开始重启（模拟命令先退出、旧进程随后才下线）"""
+        if after > 0:
+            threading.Timer(after, self.restart).start()
+            return
+        with self.lock:
+            self.restarts += 1
+            self.down_until = time.monotonic() + self.restart_delay
+            self.started = time.time() + self.restart_delay
+
+    def model(self):
+        """--config 指定时按配置文件报告当前模型（模拟热加载）"""
+        if not self.config:
+            return None
+        try:
+            with open(self.config, "r", encoding="utf-8") as f:
+                model = json.load(f).get("agents", {}).get("defaults", {}).get("model", {})
+        except (OSError, ValueError):
+            return None
+        return {k: model[k] for k in ("primary", "fallbacks") if k in model}
+
+
+def make_handler(state: StubState):
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+        def _send_json(self, code: int, payload: dict) -> None:
+            body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if not state.is_up():
+                self._send_json(503, {"ok": False, "status": "restarting"})
+                return
+            payload = {"ok": True}
+            if not state.anonymous:
+                payload.update({"restarts": state.restarts, "pid": os.getpid(), "startedAt": state.started})
+            model = state.model()
+            if model is not None:
+                payload["model"] = model
+            self._send_json(200, payload)
+
+        def do_POST(self):
+            if self.path.startswith("/__restart"):
+                _, _, after = self.path.partition("after=")
+                state.restart(float(after or 0))
+                self._send_json(200, {"ok": True})
+                return
+            if self.path.endswith("/chat/completions") or self.path.endswith("/messages"):
+                self._complete()
+                return
+            self._send_json(404, {"ok": False, "error": "not found"})
+
+        def _complete(self):
+            """模拟模型调用：按 --model-latency / --model-error 注入延迟和错误"""
+            length = int(self.headers.get("Content-Length") or 0)
+            try:
+                body = json.loads(self.rfile.read(length) or b"{}")
+            except ValueError:
+                self._send_json(400, {"error": "bad json"})
+                return
+            model = str(body.get("model", ""))
+            time.sleep(state.latency.get(model, state.default_latency))
+            if random.random() < state.errors.get(model, 0.0):
+                self._send_json(500, {"error": "injected failure"})
+                return
+            text = f"pong from {model}"
+            if self.path.endswith("/messages"):
+                self._send_json(200, {"content": [{"type": "text", "text": text}],
+                                      "usage": {"output_tokens": 4}})
+            else:
+                self._send_json(200, {"choices": [{"message": {"role": "assistant", "content": text}}],
+                                      "usage": {"completion_tokens": 4}})
+
+    return Handler
+
+
+def parse_model_values(pairs: list) -> dict:
+    """解析 name=value 形式的参数"""
+    values = {}
+    for pair in pairs or []:
+        name, _, value = pair.rpartition("=")
+        if name:
+            values[name] = float(value)
+    return values
+
+
+def serve(args: argparse.Namespace) -> int:
+    state = StubState(args.restart_delay, parse_model_values(args.model_latency),
+                      parse_model_values(args.model_error), args.default_latency,
+                      os.path.expanduser(args.config or ""), args.anonymous)
+    server = ThreadingHTTPServer(("127.0.0.1", args.port), make_handler(state))
+    print(f"stub gateway listening on http://127.0.0.1:{args.port}/", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+def gateway(args: argparse.Namespace) -> int:
+    """兼容 `openclaw gateway restart` 的命令行"""
+    if args.action != "restart":
+        print(f"unsupported: gateway {args.action}", file=sys.stderr)
+        return 1
+    req = urllib.request.Request(f"http://127.0.0.1:{args.port}/__restart?after={args.after}", data=b"", method="POST")
+    try:
+        with urllib.request.urlopen(req, timeout=5):
+            pass
+    except OSError as e:
+        print(f"restart failed: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Stub OpenClaw gateway")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_serve = sub.add_parser("serve", help="启动替身 Gateway")
+    p_serve.add_argument("--port", type=int, default=DEFAULT_PORT)
+    p_serve.add_argument("--restart-delay", type=float, default=2.0, help="模拟重启的不可用时长（秒）")
+    p_serve.add_argument("--default-latency", type=float, default=0.05, help="模型调用默认延迟（秒）")
+    p_serve.add_argument("--model-latency", action="append", metavar="MODEL=SECONDS", help="指定模型的延迟")
+    p_serve.add_argument("--model-error", action="append", metavar="MODEL=RATE", help="指定模型的错误率")
+    p_serve.add_argument("--config", help="报告该配置文件中的模型（模拟热加载）")
+    p_serve.add_argument("--anonymous", action="store_true", help="探测响应不带 pid/startedAt/restarts")
+
+    p_gw = sub.add_parser("gateway", help="兼容 openclaw gateway 子命令")
+    p_gw.add_argument("action")
+    p_gw.add_argument("--port", type=int, default=DEFAULT_PORT)
+    p_gw.add_argument("--after", type=float, default=float(os.environ.get("STUB_RESTART_AFTER", "0")),
+                      help="命令退出后多久才开始重启（秒，默认取 STUB_RESTART_AFTER）")
+
+    args = parser.parse_args()
+    if args.command == "serve":
+        return serve(args)
+    return gateway(args)
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())